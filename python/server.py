@@ -1,25 +1,37 @@
-import os
 import argparse
-from http.server import HTTPServer, SimpleHTTPRequestHandler
-
+import os
+import sys
 
-def run(
-        server_class = HTTPServer,
-        handler_class = SimpleHTTPRequestHandler,
-        port = 8888,
-        directory = None
-        ):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
 
-    if directory:
-        os.chdir(directory)
-    server_address = ('', port)
-    httpd = server_class(server_address, handler_class)
-    print(f"Serving HTTP on http://localhost:{port} from directory '{directory}'...")
-    httpd.serve_forever()
+from fileserver import CACHE_SIZE, MMAP_THRESHOLD, FileCache, run  # noqa: E402
+from stream import memory_site  # noqa: E402
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('--dir', type=str,help="Directory to serve files from",default='.')
     parser.add_argument('--port', type=int,help="Port to serve HTTP on", default=8888)
+    parser.add_argument(
+        '--cache-size',
+        type=int,
+        help="Bytes of small files held in memory",
+        default=CACHE_SIZE,
+    )
+    parser.add_argument(
+        '--mmap-threshold',
+        type=int,
+        help="Files of at least this many bytes are memory mapped",
+        default=MMAP_THRESHOLD,
+    )
+    parser.add_argument(
+        '--memory',
+        action='store_true',
+        help="Build the site of the current directory into memory and serve it, "
+        "without writing to disk. --dir and the cache options are ignored",
+    )
     args = parser.parse_args()
-    run(port=args.port, directory=args.dir)
+    if args.memory:
+        run(port=args.port, site=memory_site())
+    else:
+        cache = FileCache(args.cache_size, args.mmap_threshold)
+        run(directory=args.dir, port=args.port, cache=cache)
@@ -0,0 +1,217 @@
+""" Archives of a generated site
+
+A streaming build can write a site straight into an archive instead of a
+directory, see archive_site in stream.py. Every page and static file becomes
+an entry as soon as it is ready, and nothing but the archive is written to
+disk. The format follows the extension of the archive: .tar, .tar.gz or
+.tgz, and .zip.
+
+Archives are reproducible: every entry gets the same timestamp, owner and
+permissions, and a gzip header holds no name nor date, so building the same
+site twice gives the same bytes. Like a site directory, an archive is
+written under a temporary name and renamed once complete.
+
+Constants
+---------
+
+ARCHIVE_EXTENSIONS : tuple of str
+    The extensions of the supported archive formats.
+
+DEFAULT_MTIME : int
+    The timestamp of the entries when SOURCE_DATE_EPOCH is not set:
+    1980-01-01, the earliest date a zip entry can hold.
+"""
+
+import gzip
+import io
+import os
+import shutil
+import stat
+import tarfile
+import time
+import zipfile
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Optional
+
+ARCHIVE_EXTENSIONS = (".tar", ".tar.gz", ".tgz", ".zip")
+DEFAULT_MTIME = 315532800
+
+
+def is_archive(path: str) -> bool:
+    """tells whether a path names an archive of a supported format"""
+    return path.endswith(ARCHIVE_EXTENSIONS)
+
+
+def default_mtime() -> int:
+    """gives SOURCE_DATE_EPOCH if it is set, and DEFAULT_MTIME otherwise"""
+    return int(os.environ.get("SOURCE_DATE_EPOCH", DEFAULT_MTIME))
+
+
+def _mode(source_path: Optional[str]) -> int:
+    if source_path is not None and os.stat(source_path).st_mode & stat.S_IXUSR:
+        return 0o755
+    return 0o644
+
+
+class SiteArchive(ABC):
+    """An archive being written. Entry names are relative paths, using "/"
+    as separator whatever the platform.
+
+    Attributes
+    ----------
+    path : str
+        The archive, which only exists once close() was called.
+
+    entries : int
+        How many entries were added.
+
+    Methods
+    -------
+    add_bytes(name, data)
+        adds an entry holding data
+
+    add_file(name, source_path)
+        adds an entry holding a copy of a file, read in chunks, and gives its
+        size
+
+    close()
+        completes the archive and moves it to its path
+
+    abort()
+        removes the incomplete archive
+    """
+
+    def __init__(self, path: str, mtime: int):
+        self.path = path
+        self.entries = 0
+        self.mtime = mtime
+        self._temporary = f"{path}.tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def __enter__(self) -> "SiteArchive":
+        return self
+
+    def __exit__(self, exception_type, *_):
+        if exception_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def add_bytes(self, name: str, data: bytes):
+        self._add(name.replace(os.sep, "/"), io.BytesIO(data), len(data), None)
+        self.entries += 1
+
+    def add_file(self, name: str, source_path: str) -> int:
+        with open(source_path, "rb") as source:
+            size = os.fstat(source.fileno()).st_size
+            self._add(name.replace(os.sep, "/"), source, size, source_path)
+        self.entries += 1
+        return size
+
+    def close(self):
+        self._close()
+        os.replace(self._temporary, self.path)
+
+    def abort(self):
+        self._close()
+        if os.path.exists(self._temporary):
+            os.remove(self._temporary)
+
+    @abstractmethod
+    def _add(
+        self, name: str, data: BinaryIO, size: int, source_path: Optional[str]
+    ):
+        """writes an entry, copying size bytes from data"""
+
+    @abstractmethod
+    def _close(self):
+        """completes the temporary file. It may be called more than once"""
+
+
+class _TarArchive(SiteArchive):
+    def __init__(self, path: str, mtime: int, compress: bool):
+        super().__init__(path, mtime)
+        self._file = open(self._temporary, "wb")
+        self._gzip: Optional[gzip.GzipFile] = None
+        output: BinaryIO = self._file
+        if compress:
+            self._gzip = gzip.GzipFile(
+                filename="", mode="wb", fileobj=self._file, mtime=mtime
+            )
+            output = self._gzip  # type: ignore[assignment]
+        self._tar = tarfile.open(fileobj=output, mode="w", format=tarfile.PAX_FORMAT)
+
+    def _add(
+        self, name: str, data: BinaryIO, size: int, source_path: Optional[str]
+    ):
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = self.mtime
+        info.mode = _mode(source_path)
+        info.uid = info.gid = 0
+        info.uname = info.gname = ""
+        self._tar.addfile(info, data)
+
+    def _close(self):
+        if self._file.closed:
+            return
+        self._tar.close()
+        if self._gzip is not None:
+            self._gzip.close()
+        self._file.close()
+
+
+class _ZipArchive(SiteArchive):
+    def __init__(self, path: str, mtime: int):
+        super().__init__(path, mtime)
+        self._zip = zipfile.ZipFile(self._temporary, "w", zipfile.ZIP_DEFLATED)
+        self._date_time = time.gmtime(max(mtime, DEFAULT_MTIME))[:6]
+
+    def _add(
+        self, name: str, data: BinaryIO, size: int, source_path: Optional[str]
+    ):
+        info = zipfile.ZipInfo(name, date_time=self._date_time)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.create_system = 3  # Unix, so that the permissions are read
+        info.external_attr = (stat.S_IFREG | _mode(source_path)) << 16
+        info.file_size = size
+        with self._zip.open(info, "w") as entry:
+            shutil.copyfileobj(data, entry)
+
+    def _close(self):
+        if self._zip.fp is not None:
+            self._zip.close()
+
+
+def open_archive(path: str, mtime: Optional[int] = None) -> SiteArchive:
+    """starts writing an archive, in the format given by its extension
+
+    Parameters
+    ----------
+    path : str
+        The archive to write. It is replaced once the archive is closed
+
+    mtime : int, optional
+        The timestamp of every entry. Defaults to default_mtime()
+
+    Returns
+    -------
+    archive : SiteArchive
+        the archive, to be used as a context manager
+
+    Raises
+    ------
+    ValueError
+        if the extension is not one of ARCHIVE_EXTENSIONS
+    """
+    if mtime is None:
+        mtime = default_mtime()
+    if path.endswith(".zip"):
+        return _ZipArchive(path, mtime)
+    if path.endswith((".tar.gz", ".tgz")):
+        return _TarArchive(path, mtime, compress=True)
+    if path.endswith(".tar"):
+        return _TarArchive(path, mtime, compress=False)
+    raise ValueError(
+        f"Unsupported archive {path}, expected one of {', '.join(ARCHIVE_EXTENSIONS)}"
+    )
@@ -0,0 +1,315 @@
+""" A compact, array backed representation of HTML documents
+
+An ArenaDocument stores a tree of HTML nodes as parallel arrays indexed by node
+number instead of as LeafNode and ParentNode objects. Tag names are stored as
+ids into a table shared by every document, the tree shape as parent, first
+child and next sibling indices, and every leaf value as the start and end
+offsets of its text in one buffer shared by the whole document. Properties are
+rare, so they live in a dictionary keyed by node number.
+
+Node 0 is always the root of the document. Documents are built by appending
+nodes and are immutable once finished. Finishing a document shrinks its arrays
+to their exact size and to 16 bit items when indices and offsets fit.
+"""
+
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from block_md import block_to_htmlnode, markdown_to_blocks
+from htmlnode import HTMLNode, LeafNode, ParentNode, cached_opening_tag, escape_text
+from toc import TableOfContents
+
+_NONE = -1
+
+_tag_names: List[Optional[str]] = [None]
+_tag_ids: Dict[Optional[str], int] = {None: 0}
+
+
+def _tag_id(tag: Optional[str]) -> int:
+    tag_id = _tag_ids.get(tag)
+    if tag_id is None:
+        tag_id = len(_tag_names)
+        _tag_names.append(tag)
+        _tag_ids[tag] = tag_id
+    return tag_id
+
+
+class ArenaDocument:
+    """A HTML document stored in parallel arrays.
+
+    Attributes
+    ----------
+    tags : array of int
+        The tag id of every node.
+
+    parents, first_children, next_siblings : array of int
+        The tree shape. -1 stands for no node.
+
+    text_starts, text_ends : array of int
+        The offsets of the value of every leaf node in the text buffer. Parent
+        nodes have a start of -1.
+
+    props : dict of int to tuple
+        The properties of the nodes that have any, as tuples of pairs.
+
+    text : str
+        The buffer holding every leaf value of the document.
+
+    Methods
+    -------
+    append_leaf(parent, tag, value, props)
+        appends a leaf node as last child of a node
+
+    append_parent(parent, tag, props)
+        appends a parent node as last child of a node
+
+    append_node(parent, node)
+        appends a tree of HTML nodes as last child of a node
+
+    finish()
+        joins the text buffer and drops the building state
+
+    to_html()
+        gives the HTML of the document in a single iterative pass
+
+    to_node()
+        gives the document as LeafNode and ParentNode objects
+    """
+
+    def __init__(self, root_tag: Optional[str] = "div", root_props=None):
+        self.tags = array("H")
+        self.parents = array("i")
+        self.first_children = array("i")
+        self.next_siblings = array("i")
+        self.text_starts = array("i")
+        self.text_ends = array("i")
+        self.props: Dict[int, Tuple[Tuple[str, str], ...]] = {}
+        self.text = ""
+        self._last_children: Optional[array] = array("i")
+        self._text_parts: List[str] = []
+        self._text_length = 0
+        self._append(_NONE, root_tag, None, root_props)
+
+    def __len__(self) -> int:
+        return len(self.tags)
+
+    def _append(self, parent: int, tag: Optional[str], value: Optional[str], props):
+        if self._last_children is None:
+            raise ValueError("Can not append to a finished document")
+        index = len(self.tags)
+        self.tags.append(_tag_id(tag))
+        self.parents.append(parent)
+        self.first_children.append(_NONE)
+        self.next_siblings.append(_NONE)
+        self._last_children.append(_NONE)
+        if value is None:
+            self.text_starts.append(_NONE)
+            self.text_ends.append(_NONE)
+        else:
+            self.text_starts.append(self._text_length)
+            self._text_length += len(value)
+            self.text_ends.append(self._text_length)
+            self._text_parts.append(value)
+        if props is not None:
+            self.props[index] = tuple(props.items())
+        if parent != _NONE:
+            last_child = self._last_children[parent]
+            if last_child == _NONE:
+                self.first_children[parent] = index
+            else:
+                self.next_siblings[last_child] = index
+            self._last_children[parent] = index
+        return index
+
+    def append_leaf(
+        self,
+        parent: int,
+        tag: Optional[str],
+        value: str,
+        props: Optional[Dict[str, str]] = None,
+    ) -> int:
+        """appends a leaf node as last child of a node and gives its index"""
+        return self._append(parent, tag, value, props)
+
+    def append_parent(
+        self,
+        parent: int,
+        tag: str,
+        props: Optional[Dict[str, str]] = None,
+    ) -> int:
+        """appends a parent node as last child of a node and gives its index"""
+        return self._append(parent, tag, None, props)
+
+    def append_node(self, parent: int, node: HTMLNode) -> int:
+        """appends a tree of HTML nodes as last child of a node
+
+        Parameters
+        ----------
+        parent : int
+            The index of the node that receives the tree
+
+        node : HTMLNode
+            The root of a tree made of LeafNode and ParentNode instances
+
+        Returns
+        -------
+        index : int
+            the index of the root of the appended tree
+        """
+        root = _NONE
+        stack: List[Tuple[int, HTMLNode]] = [(parent, node)]
+        while stack:
+            parent, node = stack.pop()
+            if node.children is None:
+                if node.value is None:
+                    raise ValueError("Leaf node should have a value")
+                index = self._append(parent, node.tag, node.value, node.props)
+            else:
+                index = self._append(parent, node.tag, None, node.props)
+                stack.extend((index, child) for child in reversed(node.children))
+            if root == _NONE:
+                root = index
+        return root
+
+    def finish(self) -> "ArenaDocument":
+        """joins the text buffer and drops the state only needed while
+        building. Gives the document itself"""
+        if self._last_children is not None:
+            self.text = "".join(self._text_parts)
+            self._text_parts = []
+            self._last_children = None
+            # Arrays are copied to their exact size, with 16 bit items when the
+            # document is small enough, which most documents are
+            typecode = "h" if max(len(self.tags), len(self.text)) < 2**15 else "i"
+            self.tags = array("H", self.tags)
+            self.parents = array(typecode, self.parents)
+            self.first_children = array(typecode, self.first_children)
+            self.next_siblings = array(typecode, self.next_siblings)
+            self.text_starts = array(typecode, self.text_starts)
+            self.text_ends = array(typecode, self.text_ends)
+        return self
+
+    def value(self, index: int) -> Optional[str]:
+        """gives the value of a leaf node, None for parent nodes"""
+        start = self.text_starts[index]
+        if start == _NONE:
+            return None
+        return self.text[start : self.text_ends[index]]
+
+    def to_html(self) -> str:
+        """gives the HTML of the document. The tree is walked through its
+        sibling and parent indices, without recursion
+
+        Returns
+        -------
+        html : str
+            valid html content
+        """
+        self.finish()
+        tags, text, props = self.tags, self.text, self.props
+        parents, first_children = self.parents, self.first_children
+        next_siblings, text_starts, text_ends = (
+            self.next_siblings,
+            self.text_starts,
+            self.text_ends,
+        )
+        html: List[str] = []
+        index = 0
+        while True:
+            tag = _tag_names[tags[index]]
+            start = text_starts[index]
+            descend = False
+            if start != _NONE:
+                value = escape_text(text[start : text_ends[index]])
+                if tag is None:
+                    html.append(value)
+                else:
+                    opening = cached_opening_tag(tag, props.get(index))
+                    html.append(f"{opening}{value}</{tag}>")
+            elif first_children[index] != _NONE or index == 0:
+                if tag is None:
+                    raise ValueError("Parent node must have a tag")
+                html.append(cached_opening_tag(tag, props.get(index)))
+                descend = first_children[index] != _NONE
+                if not descend:
+                    html.append(f"</{tag}>")
+            if descend:
+                index = first_children[index]
+                continue
+            while index != 0 and next_siblings[index] == _NONE:
+                index = parents[index]
+                html.append(f"</{_tag_names[tags[index]]}>")
+            if index == 0:
+                return "".join(html)
+            index = next_siblings[index]
+
+    def to_node(self) -> HTMLNode:
+        """gives the document as a tree of LeafNode and ParentNode objects
+
+        Returns
+        -------
+        html_node : HTMLNode
+            the root of the tree
+        """
+        self.finish()
+        nodes: List[Optional[HTMLNode]] = [None] * len(self.tags)
+        for index in range(len(self.tags) - 1, -1, -1):
+            tag = _tag_names[self.tags[index]]
+            props = self.props.get(index)
+            node_props = dict(props) if props is not None else None
+            value = self.value(index)
+            if value is not None:
+                nodes[index] = LeafNode(tag, value, node_props)
+                continue
+            children = []
+            child = self.first_children[index]
+            while child != _NONE:
+                children.append(nodes[child])
+                child = self.next_siblings[child]
+            nodes[index] = ParentNode(tag, children, node_props)
+        return nodes[0]  # type: ignore[return-value]
+
+    @classmethod
+    def from_node(cls, node: HTMLNode) -> "ArenaDocument":
+        """builds a document from a tree of LeafNode and ParentNode objects
+
+        Raises
+        ------
+        ValueError
+            if the root of the tree is a leaf node
+        """
+        if node.children is None:
+            raise ValueError("The root of a document must be a parent node")
+        document = cls(node.tag, node.props)
+        for child in node.children:
+            document.append_node(0, child)
+        return document.finish()
+
+
+def markdown_to_arena(
+    markdown: str, toc: Optional[TableOfContents] = None
+) -> ArenaDocument:
+    """
+    converts a markdown text into an ArenaDocument. Each block is converted
+    and appended on its own, so only the nodes of one block exist as objects
+    at any time
+
+    Parameters
+    ----------
+    markdown : str
+        A string representing a markdown text
+
+    toc : TableOfContents, optional
+        Receives the headings of the text, as in markdown_to_html_node
+
+    Returns
+    -------
+    document : ArenaDocument
+        A document equivalent to markdown_to_html_node(markdown)
+    """
+    if toc is None:
+        toc = TableOfContents()
+    document = ArenaDocument("div")
+    for block in markdown_to_blocks(markdown):
+        document.append_node(0, block_to_htmlnode(block, toc))
+    return document.finish()
@@ -0,0 +1,250 @@
+""" Micro benchmarks for the generator. Run from the python directory:
+
+    python src/bench.py classify
+    python src/bench.py intern --pages 2000
+    python src/bench.py arena --pages 2000
+    python src/bench.py discover --pages 100000
+    python src/bench.py parallel --workers 4
+
+Every benchmark prints its timings in a human readable form.
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import timeit
+from typing import Callable, Dict, List, Mapping
+
+import parallel_md
+from arena import ArenaDocument, markdown_to_arena
+from block_md import (
+    BlockClassifier,
+    block_type_code,
+    block_type_heading,
+    block_type_ordered_list,
+    block_type_paragraph,
+    block_type_quote,
+    block_type_unordered_list,
+    default_block_classifier,
+    markdown_to_blocks,
+    markdown_to_html_node,
+)
+from discovery import discover_pages
+from htmlnode import HTMLNode
+from nodefactory import NodeFactory
+from parallel_md import markdown_to_html
+
+_sample_blocks = [
+    "# A heading with **bold** text",
+    "### A smaller heading",
+    "```\nprint('hello, world')\nprint('bye')\n```",
+    "> a quote that spans\n> more than one line\n> and ends here",
+    "* an item\n* another *item*\n* and a third one",
+    "- an item\n- another item",
+    "1. first\n2. second\n3. third\n4. fourth",
+    "A paragraph with a [link](https://boot.dev) and an ![image](/a.png).\n"
+    "It spans a couple of lines with `code` and **bold** words.",
+    "*Emphasis* that starts a paragraph and looks a bit like a list",
+    "1.5 liters is not an ordered list",
+]
+
+
+def synthetic_site(pages: int, blocks: int) -> List[str]:
+    """builds the markdown of a site with the given number of pages sharing a
+    total of the given number of blocks"""
+    per_page = max(1, blocks // pages)
+    return [synthetic_markdown(per_page, seed) for seed in range(pages)]
+
+
+def synthetic_markdown(blocks: int, seed: int = 0) -> str:
+    """builds a markdown document made of the given number of blocks, picked
+    at random from a set of samples that covers every block type"""
+    rng = random.Random(seed)
+    return "\n\n".join(rng.choice(_sample_blocks) for _ in range(blocks))
+
+
+def _legacy_block_to_block_type(block: str) -> str:
+    lines = [line.strip() for line in block.split("\n")]
+    if re.match(r"#{1,6}\s", block):
+        return block_type_heading
+    if block.startswith("```") and block.endswith("```"):
+        return block_type_code
+    if all(line.startswith(">") for line in lines):
+        return block_type_quote
+    if all(line.startswith("* ") for line in lines) or all(
+        line.startswith("- ") for line in lines
+    ):
+        return block_type_unordered_list
+    if all(line.startswith(f"{i + 1}. ") for (i, line) in enumerate(lines)):
+        return block_type_ordered_list
+    return block_type_paragraph
+
+
+def _extended_classifier() -> BlockClassifier:
+    """the default classifier with six more block types, twice the builtin"""
+    classifier = default_block_classifier.copy()
+    classifier.register(
+        "horizontal_rule",
+        "-*_",
+        block_test=lambda block: re.fullmatch(r"([-*_])\1{2,}", block) is not None,
+    )
+    classifier.register("table", "|", line_test=lambda _, line: line.startswith("|"))
+    classifier.register("html", "<", block_test=lambda block: block.endswith(">"))
+    classifier.register(
+        "definition", ":", line_test=lambda _, line: line.startswith(": ")
+    )
+    classifier.register("footnote", "[", block_test=lambda b: b.startswith("[^"))
+    classifier.register("math", "$", block_test=lambda b: b.startswith("$$"))
+    return classifier
+
+
+def _print_duration(label: str, seconds: float):
+    print(f"{label:<32} {seconds * 1000:10.2f} ms")
+
+
+def _time(label: str, function: Callable[[], object]):
+    _print_duration(label, min(timeit.repeat(function, number=1, repeat=5)))
+
+
+def bench_classify(blocks: int):
+    document = synthetic_markdown(blocks)
+    corpus: List[str] = markdown_to_blocks(document)
+    extended = _extended_classifier()
+    for block in corpus:
+        assert _legacy_block_to_block_type(block) == extended.classify(block)
+    legacy_classify = _legacy_block_to_block_type
+    default_classify = default_block_classifier.classify
+    print(f"classifying {len(corpus)} blocks")
+    _time("legacy (6 types)", lambda: [legacy_classify(b) for b in corpus])
+    _time("table driven (6 types)", lambda: [default_classify(b) for b in corpus])
+    _time("table driven (12 types)", lambda: [extended.classify(b) for b in corpus])
+
+
+def _retained_size(trees: List[HTMLNode]) -> int:
+    """the size in bytes of every distinct object reachable from the trees"""
+    seen = set()
+    size = 0
+    stack: List[object] = list(trees)
+    while stack:
+        item = stack.pop()
+        if item is None or id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, HTMLNode):
+            stack.extend(vars(item).values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+        elif isinstance(item, Mapping):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, ArenaDocument):
+            stack.extend(vars(item).values())
+    return size
+
+
+def bench_intern(pages: int, blocks: int):
+    site = synthetic_site(pages, blocks)
+    print(f"{len(site)} pages")
+    for label, factory in [("plain nodes", None), ("interned nodes", NodeFactory())]:
+        print(label)
+        started = time.perf_counter()
+        trees = [markdown_to_html_node(page, factory) for page in site]
+        _print_duration("parse", time.perf_counter() - started)
+        print(f"{'retained memory':<32} {_retained_size(trees) / 2**20:10.2f} MiB")
+        for render in ["first render", "second render"]:
+            started = time.perf_counter()
+            for tree in trees:
+                tree.to_html()
+            _print_duration(render, time.perf_counter() - started)
+        if factory is not None:
+            print(f"{'distinct nodes':<32} {len(factory):10}")
+            print(f"{'shared nodes':<32} {factory.hits:10}")
+        del trees
+
+
+def bench_arena(pages: int, blocks: int):
+    site = synthetic_site(pages, blocks)
+    print(f"{len(site)} pages")
+    for label, build in [
+        ("node objects", markdown_to_html_node),
+        ("arena documents", markdown_to_arena),
+    ]:
+        print(label)
+        started = time.perf_counter()
+        documents = [build(page) for page in site]
+        _print_duration("parse", time.perf_counter() - started)
+        size = _retained_size(documents)
+        print(f"{'retained memory':<32} {size / 2**20:10.2f} MiB")
+        _time("render", lambda: [document.to_html() for document in documents])
+        del documents
+
+
+def _legacy_discover(content_dir: str) -> List[str]:
+    """lists the pages the way generate_pages_recursive used to"""
+    pages = []
+    for file in os.listdir(content_dir):
+        path = os.path.join(content_dir, file)
+        if os.path.isfile(path):
+            pages.append(path)
+        else:
+            pages.extend(_legacy_discover(path))
+    return pages
+
+
+def bench_discover(pages: int):
+    with tempfile.TemporaryDirectory() as content_dir:
+        for index in range(pages):
+            directory = os.path.join(content_dir, f"{index % 100:02}", f"{index % 7}")
+            os.makedirs(directory, exist_ok=True)
+            extension = ".md" if index % 10 else ".png"
+            open(os.path.join(directory, f"{index}{extension}"), "w").close()
+        print(f"{pages} files")
+        _time("listdir and isfile", lambda: _legacy_discover(content_dir))
+        _time("scandir", lambda: list(discover_pages(content_dir)))
+
+
+def bench_parallel(workers: int):
+    # Every size goes through the parallel path, and the pool is started
+    # before anything is timed
+    parallel_md.PARALLEL_THRESHOLD = 0
+    markdown_to_html(synthetic_markdown(100), workers=workers)
+    print(f"converting with {workers} worker processes and serially")
+    for size in (16, 64, 128, 256, 1024):
+        # The sample blocks average 45 characters with their separator
+        document = synthetic_markdown(size * 1024 // 45)
+        print(f"{len(document) // 1024} KiB")
+        _time("  parallel", lambda: markdown_to_html(document, workers=workers))
+        _time("  serial", lambda: markdown_to_html(document, workers=1))
+
+
+_benchmarks: Dict[str, Callable[[argparse.Namespace], None]] = {
+    "classify": lambda args: bench_classify(args.blocks),
+    "intern": lambda args: bench_intern(args.pages, args.blocks),
+    "arena": lambda args: bench_arena(args.pages, args.blocks),
+    "discover": lambda args: bench_discover(args.pages),
+    "parallel": lambda args: bench_parallel(args.workers),
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("benchmark", choices=sorted(_benchmarks))
+    parser.add_argument(
+        "--blocks", type=int, help="Blocks in the synthetic corpus", default=100_000
+    )
+    parser.add_argument(
+        "--pages", type=int, help="Pages in the synthetic site", default=2_000
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Worker processes of the parallel conversion",
+        default=os.cpu_count() or 1,
+    )
+    args = parser.parse_args()
+    _benchmarks[args.benchmark](args)
@@ -7,14 +7,22 @@ BlockType : TypeAlias = Literal[ "paragraph", "heading", "code", "quote", "unord
     TypeAlias representing a block in markdown. A block type can be one of 
     "paragraph", "heading", "code", "quote", "unordered_list", "ordered_list".
 
+Other block types can be added with register_block_type, which pairs a rule of
+the default BlockClassifier with the function converting the block to HTML.
+
 """
 
 import re
-from typing import Dict, List, Literal, Sequence, TypeAlias, Callable
+import textwrap
+from typing import Dict, List, Literal, Optional, Sequence, Tuple, TypeAlias
+from typing import Callable, cast
 from htmlnode import HTMLNode, LeafNode, ParentNode
 from convert import text_node_to_html_node
+from highlight import highlight, is_supported
 from inline_md import text_to_text_nodes
+from nodefactory import NodeFactory
 from textnode import TextNode
+from toc import TableOfContents
 
 BlockType: TypeAlias = Literal[
     "paragraph", "heading", "code", "quote", "ol_list", "ul_list"
@@ -71,6 +79,184 @@ def markdown_to_blocks(markdown: str) -> List[str]:
     return [block.strip() for block in re.split(r"\n{2,}", markdown)]
 
 
+BlockTest: TypeAlias = Callable[[str], bool]
+LineTest: TypeAlias = Callable[[int, str], bool]
+
+
+class BlockRule:
+    """A rule telling whether a markdown block is of some block type.
+
+    Attributes
+    ----------
+    block_type : str
+        The block type the rule recognizes.
+
+    block_test : callable, optional
+        A predicate over the whole block. The rule matches only if it holds.
+
+    line_test : callable, optional
+        A predicate over the index and the stripped content of a line. The rule
+        matches only if it holds for **every** line of the block.
+    """
+
+    def __init__(
+        self,
+        block_type: str,
+        block_test: Optional[BlockTest] = None,
+        line_test: Optional[LineTest] = None,
+    ):
+        self.block_type = block_type
+        self.block_test = block_test
+        self.line_test = line_test
+
+    def __repr__(self) -> str:
+        return f"BlockRule({self.block_type}, {self.block_test}, {self.line_test})"
+
+
+class BlockClassifier:
+    """Infers the type of markdown blocks from a table of rules indexed by the
+    first non blank character of a block. Only the rules registered for that
+    character are tried, and their line tests are all decided in a single pass
+    over the lines of the block. Blocks matching no rule are paragraphs.
+
+    Methods
+    -------
+    register(block_type, first_chars, block_test=None, line_test=None)
+        adds a rule for a block type that starts with one of first_chars
+
+    classify(block)
+        gives the type of a markdown block
+
+    copy()
+        gives a new classifier with the same rules
+    """
+
+    def __init__(self):
+        self._rules: Dict[str, List[BlockRule]] = {}
+
+    def register(
+        self,
+        block_type: str,
+        first_chars: str,
+        block_test: Optional[BlockTest] = None,
+        line_test: Optional[LineTest] = None,
+    ):
+        """adds a rule for a block type. Rules are tried in the order they
+        were registered, so earlier rules take precedence
+
+        Parameters
+        ----------
+        block_type : str
+            The block type the rule recognizes
+
+        first_chars : str
+            Every character a block of this type may start with
+
+        block_test : callable, optional
+            A predicate over the whole block
+
+        line_test : callable, optional
+            A predicate over the index and the stripped content of each line
+
+        Raises
+        ------
+        ValueError
+            if first_chars is empty or both tests are missing
+        """
+        if first_chars == "":
+            raise ValueError("A block rule needs at least one first character")
+        if block_test is None and line_test is None:
+            raise ValueError("A block rule needs a block test or a line test")
+        rule = BlockRule(block_type, block_test, line_test)
+        for char in first_chars:
+            self._rules.setdefault(char, []).append(rule)
+
+    def copy(self) -> "BlockClassifier":
+        classifier = BlockClassifier()
+        classifier._rules = {char: list(rules) for char, rules in self._rules.items()}
+        return classifier
+
+    def classify(self, block: str) -> str:
+        """infers the type of some markdown block based on its contents
+
+        Parameters
+        ----------
+        block : str
+            A string representing a block of markdown text
+
+        Returns
+        -------
+        block_type : str
+            the type of the first matching rule, or "paragraph"
+        """
+        stripped = block.lstrip()
+        rules = self._rules.get(stripped[:1])
+        if rules is None:
+            return block_type_paragraph
+        candidates = [
+            rule
+            for rule in rules
+            if rule.block_test is None or rule.block_test(block)
+        ]
+        if candidates and candidates[0].line_test is None:
+            return candidates[0].block_type
+        for i, line in enumerate(block.split("\n")):
+            if not candidates:
+                break
+            line = line.strip()
+            candidates = [
+                rule
+                for rule in candidates
+                if rule.line_test is None or rule.line_test(i, line)
+            ]
+        if candidates:
+            return candidates[0].block_type
+        return block_type_paragraph
+
+
+def _is_heading(block: str) -> bool:
+    return re.match(r"#{1,6}\s", block) is not None
+
+
+def _is_code(block: str) -> bool:
+    return block.startswith("```") and block.endswith("```")
+
+
+def _is_quote_line(_: int, line: str) -> bool:
+    return line.startswith(">")
+
+
+def _is_star_list_line(_: int, line: str) -> bool:
+    return line.startswith("* ")
+
+
+def _is_dash_list_line(_: int, line: str) -> bool:
+    return line.startswith("- ")
+
+
+def _is_ordered_list_line(i: int, line: str) -> bool:
+    return line.startswith(f"{i + 1}. ")
+
+
+default_block_classifier = BlockClassifier()
+""" default_block_classifier : BlockClassifier
+    The classifier used by markdown_to_html_node. New block types are added to
+    it through register_block_type.
+"""
+default_block_classifier.register(block_type_heading, "#", block_test=_is_heading)
+default_block_classifier.register(block_type_code, "`", block_test=_is_code)
+default_block_classifier.register(block_type_quote, ">", line_test=_is_quote_line)
+default_block_classifier.register(
+    block_type_unordered_list, "*", line_test=_is_star_list_line
+)
+default_block_classifier.register(
+    block_type_unordered_list, "-", line_test=_is_dash_list_line
+)
+default_block_classifier.register(
+    block_type_ordered_list, "1", line_test=_is_ordered_list_line
+)
+
+
 def block_to_block_type(block: str) -> BlockType:
     """infers the type of some markdown block based on its contents
 
@@ -85,20 +271,7 @@ def block_to_block_type(block: str) -> BlockType:
     block_type : BlockType
         the type of block infered from the content of the block
     """
-    lines = [line.strip() for line in block.split("\n")]
-    if re.match(r"#{1,6}\s", block):
-        return block_type_heading
-    if block.startswith("```") and block.endswith("```"):
-        return block_type_code
-    if all(line.startswith(">") for line in lines):
-        return block_type_quote
-    if all(line.startswith("* ") for line in lines) or all(
-        line.startswith("- ") for line in lines
-    ):
-        return block_type_unordered_list
-    if all(line.startswith(f"{i + 1}. ") for (i, line) in enumerate(lines)):
-        return block_type_ordered_list
-    return block_type_paragraph
+    return cast(BlockType, default_block_classifier.classify(block))
 
 
 def text_nodes_to_html_children(text_nodes: Sequence[TextNode]) -> Sequence[HTMLNode]:
@@ -158,10 +331,15 @@ html_node : HTMLNode
 
 # TODO: remove possibility of returning an empty list
 def _paragraph_node_preprocessor(paragraph: str) -> List[str]:
-    single_line = " ".join(
-        [line.strip() for line in paragraph.split("\n") if line.strip() != ""]
-    )
-    return [single_line]
+    # A paragraph that is a single stripped line is not copied. Otherwise its
+    # stripped lines are joined once; a regular expression around the
+    # newlines would rescan every long run of spaces from each of its
+    # positions
+    paragraph = paragraph.strip()
+    if "\n" not in paragraph:
+        return [paragraph]
+    lines = (line.strip() for line in paragraph.split("\n"))
+    return [" ".join(line for line in lines if line != "")]
 
 
 def _paragraph_node_conveter(lines: List[str]) -> HTMLNode:
@@ -255,7 +433,9 @@ html_node : HTMLNode
 # NOTE: Using function composition here would require creating an adapter for
 # the create_text_to_html_converter interface which would not be justifiable for
 # only one use case.
-def heading_block_to_htmlnode(heading: str) -> HTMLNode:
+def heading_block_to_htmlnode(
+    heading: str, toc: Optional[TableOfContents] = None
+) -> HTMLNode:
     """
     converts a heading block to a html node
 
@@ -264,6 +444,9 @@ def heading_block_to_htmlnode(heading: str) -> HTMLNode:
     heading : str
         A string representing a heading block. It will have only one line
 
+    toc : TableOfContents, optional
+        If given, the heading is recorded in it and gets the id it assigns
+
     Returns
     -------
     html_node : HTMLNode
@@ -274,13 +457,32 @@ def heading_block_to_htmlnode(heading: str) -> HTMLNode:
     if heading_level > 6 or heading_level < 1:
         raise ValueError("Invalid heading level")
     heading_content = heading.strip("# ")
-    html_nodes = _flattened_nodes_list([heading_content])
-    return ParentNode(tag="h" + str(heading_level), children=html_nodes)
+    text_nodes = text_to_text_nodes(heading_content)
+    html_nodes = text_nodes_to_html_children(text_nodes)
+    tag = "h" + str(heading_level)
+    if toc is None:
+        return ParentNode(tag=tag, children=html_nodes)
+    heading_id = toc.add(heading_level, "".join(node.text for node in text_nodes))
+    return ParentNode(tag=tag, children=html_nodes, props={"id": heading_id})
+
+
+def _split_code_fence(code: str) -> Tuple[Optional[str], str]:
+    inner = code.strip().removeprefix("```").removesuffix("```")
+    info, newline, body = inner.partition("\n")
+    info = info.strip()
+    if newline == "" or re.fullmatch(r"[\w+#.-]*", info) is None:
+        # Not an info string, the first line is already code
+        info, body = "", inner
+    lines = [line.rstrip() for line in textwrap.dedent(body).split("\n")]
+    return (info if info != "" else None), "\n".join(lines).strip("\n")
 
 
 def code_block_to_htmlnode(code: str) -> HTMLNode:
     """
-    converts a markdown code block into a HTML node
+    converts a markdown code block into a HTML node. If the opening fence has
+    a language tag, the code is given a 'language-*' class, and if there is a
+    lexer for the language, its tokens are wrapped in spans with 'tok-*'
+    classes
 
     Parameters
     ----------
@@ -292,13 +494,24 @@ def code_block_to_htmlnode(code: str) -> HTMLNode:
     html_node : HTMLNode
         A html node representing the code block
     """
-    value = "\n".join(
-        line.strip() for line in code.lstrip("` \n").rstrip("` \n").split("\n")
-    )
-    return ParentNode(tag="pre", children=[LeafNode("code", value=value)])
+    language, value = _split_code_fence(code)
+    if language is None:
+        return ParentNode(tag="pre", children=[LeafNode("code", value=value)])
+    props = {"class": f"language-{language}"}
+    if not is_supported(language) or value == "":
+        return ParentNode(tag="pre", children=[LeafNode("code", value, props)])
+    tokens = [
+        (
+            LeafNode(None, text)
+            if token_type is None
+            else LeafNode("span", text, {"class": f"tok-{token_type}"})
+        )
+        for token_type, text in highlight(language, value)
+    ]
+    return ParentNode(tag="pre", children=[ParentNode("code", tokens, props)])
 
 
-_map_block_to_transformer: Dict[BlockType, Callable[[str], HTMLNode]] = {
+_map_block_to_transformer: Dict[str, Callable[[str], HTMLNode]] = {
     "paragraph": paragraph_block_to_htmlnode,
     "code": code_block_to_htmlnode,
     "ol_list": ol_block_to_htmlnode,
@@ -308,23 +521,94 @@ _map_block_to_transformer: Dict[BlockType, Callable[[str], HTMLNode]] = {
 }
 
 
-def markdown_to_html_node(markdown: str) -> HTMLNode:
+def register_block_type(
+    block_type: str,
+    transformer: Callable[[str], HTMLNode],
+    first_chars: str,
+    block_test: Optional[BlockTest] = None,
+    line_test: Optional[LineTest] = None,
+):
+    """
+    adds a new block type to markdown_to_html_node. Blocks are matched by the
+    default classifier after every rule registered before, and converted by
+    the given transformer
+
+    Parameters
+    ----------
+    block_type : str
+        The name of the new block type
+
+    transformer : callable
+        Converts a block of the new type into a HTML node
+
+    first_chars : str
+        Every character a block of this type may start with
+
+    block_test : callable, optional
+        A predicate over the whole block
+
+    line_test : callable, optional
+        A predicate over the index and the stripped content of each line
+    """
+    default_block_classifier.register(block_type, first_chars, block_test, line_test)
+    _map_block_to_transformer[block_type] = transformer
+
+
+def block_to_htmlnode(block: str, toc: Optional[TableOfContents] = None) -> HTMLNode:
+    """
+    converts a single markdown block into a HTML node, using the transformer
+    of its block type
+
+    Parameters
+    ----------
+    block : str
+        A string representing a block of markdown text
+
+    toc : TableOfContents, optional
+        If given, a heading block is recorded in it and gets an id
+
+    Returns
+    -------
+    html_node : HTMLNode
+        A html node representing the block
+    """
+    block_type = default_block_classifier.classify(block)
+    if toc is not None and block_type == block_type_heading:
+        return heading_block_to_htmlnode(block.strip(), toc)
+    return _map_block_to_transformer[block_type](block.strip())
+
+
+def markdown_to_html_node(
+    markdown: str,
+    factory: Optional[NodeFactory] = None,
+    toc: Optional[TableOfContents] = None,
+) -> HTMLNode:
     """
-    converts a markdown text into a HTML node
+    converts a markdown text into a HTML node. Every heading gets an id, unique
+    within the text, and is recorded in a table of contents in the same pass
 
     Parameters
     ----------
     markdown : str
         A string representing a markdown text
 
+    factory : NodeFactory, optional
+        If given, the resulting tree is made of nodes interned by the factory,
+        sharing identical subtrees with every other tree it interned
+
+    toc : TableOfContents, optional
+        Receives the headings of the text. Pass an empty one to read them
+        back, for instance to render it with TableOfContents.to_html
+
     Returns
     -------
     html_node : HTMLNode
         A html node representing the markdown text
     """
+    if toc is None:
+        toc = TableOfContents()
     markdown_blocks = markdown_to_blocks(markdown)
-    html_blocks = [
-        _map_block_to_transformer[block_to_block_type(block)](block.strip())
-        for block in markdown_blocks
-    ]
+    html_blocks = [block_to_htmlnode(block, toc) for block in markdown_blocks]
+    if factory is not None:
+        return factory.parent(tag="div", children=html_blocks)
     return ParentNode(tag="div", children=html_blocks)
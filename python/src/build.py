@@ -0,0 +1,240 @@
+""" Builds a whole site: copies the static files and generates every page
+
+Pages are given the navigation values of the site tree built by the planner,
+and sections without an index.md get a generated index page. Pages and
+generated indexes are rendered with the layout of their directory, if one
+declares a layout, or else with the site template. Layouts include the
+partials of the site template.
+
+Builds are incremental. A planner compares the sources with the stat cache of
+the previous build into the same destination, and only the outputs of new and
+changed sources are written. Outputs whose source was removed are deleted.
+
+Builds write into a staging directory and publish it atomically once they are
+over, see staging.py. A killed build is resumed by the next one. A build that
+has no output to write nor delete publishes nothing and only refreshes the
+stat cache. The manifest of the published site, see manifest.py, and the
+metrics of the build, see metrics.py, are then written next to the stat
+cache.
+"""
+
+import hashlib
+import os
+from typing import Callable, Iterable, Optional
+
+from discovery import DEFAULT_EXCLUDE, DEFAULT_INCLUDE
+from highlight import cache_counts
+from manifest import hash_tree, load_manifest, manifest_path, save_manifest
+from metrics import BuildMetrics, metrics_path, write_metrics
+from page import PageCache, generate_page, render_page, write_page
+from planner import (
+    BuildPlan,
+    StatCache,
+    default_stat_cache_path,
+    file_digest,
+    plan_build,
+)
+from staging import begin
+from template import default_partials_dir
+from tree import copy_files, scan_tree
+
+
+def build_site(
+    content_dir: str = "./content",
+    template_path: str = "./template.html",
+    static_dir: str = "./static",
+    dest_dir: str = "./public",
+    cache: Optional[PageCache] = None,
+    log: Callable[[str], None] = print,
+    dry_run: bool = False,
+    stat_cache_path: Optional[str] = None,
+    include: Iterable[str] = DEFAULT_INCLUDE,
+    exclude: Iterable[str] = DEFAULT_EXCLUDE,
+    metrics: Optional[BuildMetrics] = None,
+) -> BuildPlan:
+    """builds a site into dest_dir
+
+    Parameters
+    ----------
+    content_dir : str
+        The directory holding the markdown pages
+
+    template_path : str
+        The template of the pages whose directory has no layout. Its
+        partials directory holds the partials of every layout
+
+    static_dir : str
+        The directory whose files are copied as they are
+
+    dest_dir : str
+        The directory receiving the site. It becomes a symbolic link to the
+        published version of the site. On a full build the new version starts
+        empty
+
+    cache : PageCache, optional
+        Templates and pages converted by previous builds. Passing the same
+        cache to successive builds avoids converting unchanged pages again
+
+    log : callable
+        Receives the progress messages of the build
+
+    dry_run : bool
+        If True, the plan is logged and nothing is written
+
+    stat_cache_path : str, optional
+        The SQLite stat cache to plan with. Defaults to one per dest_dir
+        under the cache directory. The manifest of the site and the metrics
+        of the build are written next to it, see manifest_path and
+        metrics_path
+
+    include, exclude : iterable of str
+        The globs selecting the pages of the content directory. See
+        discover_pages
+
+    metrics : BuildMetrics, optional
+        Receives the metrics of the build, for instance to write them in
+        other formats with write_metrics
+
+    Returns
+    -------
+    plan : BuildPlan
+        the plan the build followed
+    """
+    if cache is None:
+        cache = PageCache()
+    if stat_cache_path is None:
+        stat_cache_path = default_stat_cache_path(dest_dir)
+    if metrics is None:
+        metrics = BuildMetrics()
+    hits, misses = cache.hits, cache.misses
+    highlight_hits, highlight_misses = cache_counts()
+    with StatCache(stat_cache_path) as stat_cache:
+        with metrics.stage("plan"):
+            plan = plan_build(
+                content_dir,
+                template_path,
+                static_dir,
+                dest_dir,
+                stat_cache,
+                include,
+                exclude,
+            )
+        if dry_run:
+            for line in plan.describe():
+                log(line)
+            return plan
+
+        # An incremental build without any output to write keeps the
+        # published site, instead of linking all of it into a new version
+        up_to_date = not (plan.full or plan.new or plan.changed or plan.deleted)
+        if up_to_date:
+            metrics.add("outputs_skipped", plan.unchanged)
+        else:
+            _write_outputs(plan, dest_dir, template_path, cache, log, metrics)
+
+        with metrics.stage("record"):
+            stat_cache.forget(plan.removed_sources)
+            stat_cache.record([*plan.actions(), *plan.refreshed])
+            stat_cache.commit()
+    path = manifest_path(stat_cache_path)
+    if not up_to_date or not os.path.exists(path):
+        with metrics.stage("manifest"):
+            save_manifest(hash_tree(dest_dir, load_manifest(path)), path)
+    metrics.cache("pages", cache.hits - hits, cache.misses - misses)
+    highlighted = cache_counts()
+    metrics.cache(
+        "highlight",
+        highlighted[0] - highlight_hits,
+        highlighted[1] - highlight_misses,
+    )
+    metrics.finish()
+    write_metrics(metrics, metrics_path(stat_cache_path))
+    return plan
+
+
+def _write_outputs(
+    plan: BuildPlan,
+    dest_dir: str,
+    template_path: str,
+    cache: PageCache,
+    log: Callable[[str], None],
+    metrics: BuildMetrics,
+):
+    """writes the outputs of a plan into a staging directory and publishes it"""
+    site = plan.site
+    assert site is not None
+    context = _build_context(template_path, plan)
+    partials_dir = default_partials_dir(template_path)
+    with begin(dest_dir, context, seed=not plan.full) as staging:
+        if staging.resumed:
+            log(f"Resuming an interrupted build, {staging.resumed} outputs done")
+        for dest in plan.deleted:
+            log(f"Removing {dest}")
+            staging.remove(dest)
+        metrics.add("outputs_deleted", len(plan.deleted))
+        pending = [
+            action
+            for action in plan.actions()
+            if not staging.is_done(action.dest, action.digest)
+        ]
+        planned = len(plan.new) + len(plan.changed)
+        metrics.add("outputs_skipped", plan.unchanged + planned - len(pending))
+        statics = [action for action in pending if action.kind == "static"]
+        with metrics.stage("copy"):
+            copied = copy_files(
+                (action.source, staging.target(action.dest)) for action in statics
+            )
+            for action in statics:
+                staging.mark_done(action.dest, action.digest)
+        metrics.add("files_copied", len(statics))
+        metrics.add("bytes_read", copied)
+        metrics.add("bytes_written", copied)
+        with metrics.stage("pages"):
+            for action in pending:
+                if action.kind == "static":
+                    continue
+                layout = action.layout or template_path
+                target = staging.target(action.dest)
+                if action.kind == "page":
+                    log(
+                        f"Generating page from {action.source} to "
+                        f"{action.dest} using {layout}"
+                    )
+                    page = generate_page(
+                        action.source,
+                        layout,
+                        target,
+                        cache,
+                        lambda _: None,
+                        site.navigation(action.source),
+                        partials_dir,
+                    )
+                    metrics.add_page(action.source, target, page)
+                elif action.kind == "index":
+                    log(f"Generating section index {action.dest}")
+                    page = render_page(
+                        site.index_document(action.source),
+                        cache.template(layout, partials_dir),
+                        site.navigation(action.source),
+                    )
+                    write_page(target, page)
+                    metrics.add_page("", target, page)
+                    metrics.add("indexes_built")
+                staging.mark_done(action.dest, action.digest)
+        with metrics.stage("publish"):
+            staging.publish()
+
+
+def _build_context(template_path: str, plan: BuildPlan) -> str:
+    """gives a digest of what every output depends on besides its own source:
+    the templates, the navigation of the site and whether the build is full"""
+    digest = hashlib.sha256(f"full={plan.full}\n".encode("utf-8"))
+    templates = [template_path, *plan.layouts]
+    partials_dir = default_partials_dir(template_path)
+    if os.path.isdir(partials_dir):
+        templates.extend(sorted(entry.path for _, entry in scan_tree(partials_dir)))
+    for path in templates:
+        digest.update(f"{path}\0{file_digest(path)}\n".encode("utf-8"))
+    if plan.site is not None:
+        digest.update(plan.site.signature().encode("utf-8"))
+    return digest.hexdigest()
@@ -0,0 +1,181 @@
+""" A long running build server and its client
+
+The server listens on a Unix socket and keeps imported modules, templates and
+converted pages warm between builds. Clients send one JSON request per line
+and receive the progress of the build as JSON events, one per line, ending
+with a "done" or an "error" event.
+
+    python src/daemon.py serve &
+    python src/daemon.py build
+    python src/daemon.py stop
+
+Requests
+--------
+
+{"command": "build", "content": ..., "template": ..., "static": ..., "dest": ...}
+    builds a site. Every path must be absolute. With "dry_run": true, only
+    logs the build plan
+
+{"command": "ping"}
+    answers with a "done" event
+
+{"command": "stop"}
+    stops the server after answering
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Dict, Iterator
+
+from build import build_site
+from page import PageCache
+
+DEFAULT_SOCKET = os.path.join(os.environ.get("SSG_CACHE_DIR", ".cache"), "ssg.sock")
+
+
+class BuildRequestHandler(socketserver.StreamRequestHandler):
+    """Answers the requests of one client connection"""
+
+    server: "BuildServer"
+
+    def send(self, event: str, **fields):
+        fields["event"] = event
+        self.wfile.write(json.dumps(fields).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                command = request.get("command")
+                if command == "build":
+                    self.build(request)
+                elif command == "ping":
+                    self.send("done", seconds=0.0)
+                elif command == "stop":
+                    self.send("done", seconds=0.0)
+                    # shutdown() waits for serve_forever to return, which
+                    # only happens once this handler is over
+                    threading.Thread(target=self.server.shutdown).start()
+                    return
+                else:
+                    self.send("error", message=f"Unknown command: {command}")
+            except BrokenPipeError:
+                return
+            except Exception as error:
+                self.send(
+                    "error",
+                    message=f"{type(error).__name__}: {error}",
+                    traceback=traceback.format_exc(),
+                )
+
+    def build(self, request: Dict[str, Any]):
+        for key in ["content", "template", "static", "dest"]:
+            if not os.path.isabs(request.get(key, "")):
+                raise ValueError(f"'{key}' must be an absolute path")
+        started = time.perf_counter()
+        hits, misses = self.server.cache.hits, self.server.cache.misses
+        build_site(
+            request["content"],
+            request["template"],
+            request["static"],
+            request["dest"],
+            cache=self.server.cache,
+            log=lambda message: self.send("log", message=message),
+            dry_run=bool(request.get("dry_run", False)),
+        )
+        self.send(
+            "done",
+            seconds=time.perf_counter() - started,
+            cache_hits=self.server.cache.hits - hits,
+            cache_misses=self.server.cache.misses - misses,
+        )
+
+
+class BuildServer(socketserver.UnixStreamServer):
+    """A Unix socket server that runs one build at a time and shares a single
+    PageCache between all of them"""
+
+    def __init__(self, socket_path: str):
+        self.cache = PageCache()
+        self.socket_path = socket_path
+        super().__init__(socket_path, BuildRequestHandler)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+def serve(socket_path: str = DEFAULT_SOCKET):
+    """runs a build server until it receives a stop request"""
+    os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+    if os.path.exists(socket_path):
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                probe.connect(socket_path)
+        except ConnectionRefusedError:
+            # Left behind by a server that did not stop cleanly
+            os.remove(socket_path)
+        else:
+            raise RuntimeError(f"A server is already listening on {socket_path}")
+    with BuildServer(socket_path) as server:
+        print(f"Build server listening on {socket_path}")
+        server.serve_forever(poll_interval=0.1)
+
+
+def request(socket_path: str, payload: Dict[str, Any]) -> Iterator[Dict]:
+    """sends a request to a build server and yields its events until the
+    request is over"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        client.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+        with client.makefile("rb") as events:
+            for line in events:
+                event = json.loads(line)
+                yield event
+                if event["event"] in ("done", "error"):
+                    return
+    raise ConnectionError("The build server closed the connection")
+
+
+def _run_client(socket_path: str, payload: Dict[str, Any]) -> int:
+    for event in request(socket_path, payload):
+        if event["event"] == "log":
+            print(event["message"])
+        elif event["event"] == "error":
+            print(event.get("traceback", event["message"]), file=sys.stderr)
+            return 1
+        else:
+            print(f"Done in {event['seconds'] * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["serve", "build", "ping", "stop"])
+    parser.add_argument(
+        "--socket", type=str, help="Unix socket of the server", default=DEFAULT_SOCKET
+    )
+    parser.add_argument("--content", type=str, default="./content")
+    parser.add_argument("--template", type=str, default="./template.html")
+    parser.add_argument("--static", type=str, default="./static")
+    parser.add_argument("--dest", type=str, default="./public")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args.socket)
+    else:
+        payload: Dict[str, Any] = {"command": args.command}
+        if args.command == "build":
+            for key in ["content", "template", "static", "dest"]:
+                payload[key] = os.path.abspath(getattr(args, key))
+            payload["dry_run"] = args.dry_run
+        sys.exit(_run_client(args.socket, payload))
@@ -0,0 +1,202 @@
+""" Finds the pages of a site
+
+Discovery walks the content directory once, iteratively, with os.scandir, and
+yields a PageJob for every file selected by the include and exclude globs. The
+order is deterministic: the files of a directory come first, sorted by name,
+followed by its subdirectories, also sorted by name.
+
+Only directories are stat'ed during the walk, to recognise a directory that
+was already visited through a symbolic link. Files are never stat'ed here, and
+the stat of their directory entry is kept for later stages.
+
+Glob patterns are matched with fnmatch against the path of a file relative to
+the content directory, using "/" as separator. A pattern without a "/" is
+matched against the name of the file alone. An exclude pattern matching a
+directory skips the whole directory.
+
+A directory may declare the layout of its pages with a LAYOUT_NAME file,
+which is a template. Subdirectories inherit the layout of their parent unless
+they declare their own. Layouts are resolved once per directory, while it is
+walked, and every PageJob carries the layout of its directory.
+
+Constants
+---------
+
+DEFAULT_INCLUDE : tuple of str
+    Markdown files.
+
+DEFAULT_EXCLUDE : tuple of str
+    Hidden files and directories, such as editor backups and .git.
+
+LAYOUT_NAME : str
+    The name of the file declaring the layout of a directory.
+"""
+
+import fnmatch
+import os
+import re
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+DEFAULT_INCLUDE = ("*.md",)
+DEFAULT_EXCLUDE = (".*",)
+LAYOUT_NAME = "_layout.html"
+
+Matcher = Callable[[str, str], bool]
+
+
+class PageJob:
+    """A markdown file to turn into a page.
+
+    Attributes
+    ----------
+    source : str
+        The path of the markdown file.
+
+    relative : str
+        The path of the markdown file relative to the content directory.
+
+    entry : os.DirEntry
+        The directory entry of the markdown file, which caches its stat.
+
+    layout : str, optional
+        The layout of the page, declared by its directory or the closest
+        directory above it. None if no directory declares one.
+
+    Methods
+    -------
+    dest(dest_dir)
+        gives the path of the page in a destination directory
+
+    stat()
+        gives the stat of the markdown file, following symbolic links
+    """
+
+    __slots__ = ("source", "relative", "entry", "layout")
+
+    def __init__(
+        self,
+        source: str,
+        relative: str,
+        entry: os.DirEntry,
+        layout: Optional[str] = None,
+    ):
+        self.source = source
+        self.relative = relative
+        self.entry = entry
+        self.layout = layout
+
+    def dest(self, dest_dir: str) -> str:
+        return page_dest(dest_dir, self.relative)
+
+    def stat(self) -> os.stat_result:
+        return self.entry.stat()
+
+    def __repr__(self) -> str:
+        return f"PageJob({self.source})"
+
+
+def page_dest(dest_dir: str, relative: str) -> str:
+    """gives the path of the page generated from a markdown file"""
+    return os.path.join(dest_dir, relative.removesuffix(".md") + ".html")
+
+
+def _compile_globs(patterns: Iterable[str]) -> Optional[Matcher]:
+    """turns glob patterns into a single function telling whether a relative
+    path or a name matches any of them"""
+    path_patterns: List[str] = []
+    name_patterns: List[str] = []
+    for pattern in patterns:
+        pattern = pattern.replace(os.sep, "/").strip("/")
+        if "/" in pattern:
+            path_patterns.append(fnmatch.translate(pattern))
+        else:
+            name_patterns.append(fnmatch.translate(pattern))
+    if not path_patterns and not name_patterns:
+        return None
+    path_regex = re.compile("|".join(path_patterns)) if path_patterns else None
+    name_regex = re.compile("|".join(name_patterns)) if name_patterns else None
+
+    def matches(relative: str, name: str) -> bool:
+        return bool(
+            (name_regex is not None and name_regex.match(name))
+            or (path_regex is not None and path_regex.match(relative))
+        )
+
+    return matches
+
+
+def discover_pages(
+    content_dir: str,
+    include: Iterable[str] = DEFAULT_INCLUDE,
+    exclude: Iterable[str] = DEFAULT_EXCLUDE,
+    follow_symlinks: bool = True,
+    layouts: Optional[Dict[str, Optional[str]]] = None,
+) -> Iterator[PageJob]:
+    """yields the pages under a directory
+
+    Parameters
+    ----------
+    content_dir : str
+        The directory holding the markdown pages
+
+    include : iterable of str
+        Globs selecting the files that are pages
+
+    exclude : iterable of str
+        Globs of files and directories to leave out, even if they are
+        included
+
+    follow_symlinks : bool
+        If True, symbolic links to directories are walked, once. A link to
+        a directory that is already being walked, or was walked, is skipped
+
+    layouts : dict, optional
+        If given, receives the layout of every directory walked, keyed by its
+        path relative to the content directory. The content directory itself
+        is keyed by an empty string
+
+    Yields
+    ------
+    job : PageJob
+        every page, in a deterministic order
+    """
+    if not os.path.isdir(content_dir):
+        raise FileNotFoundError(f"{content_dir} does not exist")
+    is_included = _compile_globs(include)
+    is_excluded = _compile_globs(exclude)
+    if is_included is None:
+        return
+
+    root_stat = os.stat(content_dir)
+    visited: Set[Tuple[int, int]] = {(root_stat.st_dev, root_stat.st_ino)}
+    # Directories are pushed in reverse order, so they are popped sorted
+    stack: List[Tuple[str, str, Optional[str]]] = [(content_dir, "", None)]
+    while stack:
+        directory, relative_dir, layout = stack.pop()
+        with os.scandir(directory) as scanner:
+            entries = sorted(scanner, key=lambda entry: entry.name)
+        for entry in entries:
+            if entry.name == LAYOUT_NAME and entry.is_file():
+                layout = entry.path
+                break
+        if layouts is not None:
+            layouts[relative_dir.replace("/", os.sep)] = layout
+        subdirectories = []
+        for entry in entries:
+            relative = (
+                f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+            )
+            if is_excluded is not None and is_excluded(relative, entry.name):
+                continue
+            if entry.is_dir(follow_symlinks=follow_symlinks):
+                stat = entry.stat()
+                key = (stat.st_dev, stat.st_ino)
+                if key in visited:
+                    continue
+                visited.add(key)
+                subdirectories.append((entry.path, relative, layout))
+            elif entry.is_file() and is_included(relative, entry.name):
+                yield PageJob(
+                    entry.path, relative.replace("/", os.sep), entry, layout
+                )
+        stack.extend(reversed(subdirectories))
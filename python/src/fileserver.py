@@ -0,0 +1,544 @@
+""" A static file server with a file cache and range requests
+
+The handler serves files from a FileCache instead of reading them on every
+request. Small files are held in memory and large files are memory mapped,
+so a popular page costs one stat, to check the cached copy is current, and a
+write. Every file response accepts ranges: a single range is answered with
+a 206 and a Content-Range header, several ranges with a multipart/byteranges
+body. HEAD requests only stat the file.
+
+Files are never modified in place by a build: it writes a new version of the
+site and swaps the published link (see staging.py), which changes the
+identity of every path. A mapped file that is truncated in place would fault
+the server when read.
+
+For previews, MemoryFileHandler serves a site built into memory instead, see
+memsite.py: nothing is written to disk, and requests are answered with the
+same ranges and validators without any file system call.
+
+Constants
+---------
+
+CACHE_SIZE : int
+    How many bytes of small files the cache holds by default. The least
+    recently used files are dropped first.
+
+MMAP_THRESHOLD : int
+    Files of at least this many bytes are memory mapped instead of read.
+
+MAPPED_FILES : int
+    How many mapped files the cache holds by default.
+
+MAX_RANGES : int
+    Requests with more ranges are answered with the whole file.
+"""
+
+import json
+import mmap
+import os
+import posixpath
+import re
+import secrets
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from functools import partial
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import unquote, urlsplit
+
+from memsite import MemoryFile, MemorySite
+
+CACHE_SIZE = 64 * 1024 * 1024
+MMAP_THRESHOLD = 1024 * 1024
+MAPPED_FILES = 64
+MAX_RANGES = 16
+
+_range_pattern = re.compile(r"^\s*(\d*)\s*-\s*(\d*)\s*$")
+
+Identity = Tuple[int, int, int, int]
+Range = Tuple[int, int]
+
+
+def _identity(status: os.stat_result) -> Identity:
+    return status.st_dev, status.st_ino, status.st_size, status.st_mtime_ns
+
+
+class CachedFile:
+    """A file, as served.
+
+    Attributes
+    ----------
+    data : bytes or mmap, optional
+        The content of the file. None for a file that was only stat-ed.
+
+    size : int
+        The size of the file in bytes.
+
+    etag : str
+        A strong validator of the file, derived from its identity.
+
+    last_modified : str
+        The modification time of the file, as an HTTP date.
+
+    mtime : float
+        The modification time of the file, in seconds.
+    """
+
+    __slots__ = ("data", "size", "etag", "last_modified", "mtime", "identity")
+
+    def __init__(
+        self, data: Optional[Union[bytes, mmap.mmap]], status: os.stat_result
+    ):
+        self.data = data
+        self.identity = _identity(status)
+        self.size = status.st_size
+        self.etag = '"{:x}-{:x}-{:x}"'.format(
+            status.st_ino, status.st_mtime_ns, status.st_size
+        )
+        self.mtime = status.st_mtime
+        self.last_modified = formatdate(status.st_mtime, usegmt=True)
+
+    @property
+    def mapped(self) -> bool:
+        return isinstance(self.data, mmap.mmap)
+
+
+# A file as answered by CachedFileHandler, from the disk or from memory
+Served = Union[CachedFile, MemoryFile]
+
+
+class FileCache:
+    """Files held in memory or mapped, checked against the disk on every use.
+
+    Attributes
+    ----------
+    max_bytes : int
+        How many bytes of small files are held.
+
+    mmap_threshold : int
+        The size from which files are mapped.
+
+    max_mapped : int
+        How many mapped files are held.
+
+    hits, misses : int
+        How many lookups found a current copy, and how many loaded the file.
+
+    hit_bytes, miss_bytes : int
+        How many bytes were served from a cached copy, and how many from a
+        file that had to be loaded.
+
+    evictions : int
+        How many files were dropped to make room.
+
+    Methods
+    -------
+    get(path)
+        gives a file with its content, and whether it was cached
+
+    info(path)
+        gives a file without reading it, for a HEAD request
+
+    count(hit, sent)
+        records bytes served from a file given by get
+
+    stats()
+        gives every counter in a dictionary
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = CACHE_SIZE,
+        mmap_threshold: int = MMAP_THRESHOLD,
+        max_mapped: int = MAPPED_FILES,
+    ):
+        self.max_bytes = max_bytes
+        self.mmap_threshold = mmap_threshold
+        self.max_mapped = max_mapped
+        self._memory: "OrderedDict[str, CachedFile]" = OrderedDict()
+        self._mapped: "OrderedDict[str, CachedFile]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.hit_bytes = 0
+        self.miss_bytes = 0
+        self.evictions = 0
+
+    def _cached(self, path: str, identity: Identity) -> Optional[CachedFile]:
+        """gives the current cached copy of a file. Must hold the lock"""
+        for files in (self._memory, self._mapped):
+            cached = files.get(path)
+            if cached is not None:
+                if cached.identity == identity:
+                    files.move_to_end(path)
+                    return cached
+                self._drop(files, path)
+        return None
+
+    def _drop(self, files: "OrderedDict[str, CachedFile]", path: str):
+        # A mapping is not closed: a response may still be sending from it.
+        # It is unmapped once nothing refers to it.
+        cached = files.pop(path)
+        if files is self._memory:
+            self.size -= cached.size
+
+    def _load(self, path: str) -> CachedFile:
+        with open(path, "rb") as handle:
+            status = os.fstat(handle.fileno())
+            if status.st_size >= max(self.mmap_threshold, 1):
+                data: Union[bytes, mmap.mmap] = mmap.mmap(
+                    handle.fileno(), 0, access=mmap.ACCESS_READ
+                )
+            else:
+                data = handle.read()
+        return CachedFile(data, status)
+
+    def get(self, path: str) -> Tuple[CachedFile, bool]:
+        identity = _identity(os.stat(path))
+        with self._lock:
+            cached = self._cached(path, identity)
+            if cached is not None:
+                self.hits += 1
+                return cached, True
+            self.misses += 1
+        loaded = self._load(path)
+        with self._lock:
+            if loaded.mapped:
+                self._mapped[path] = loaded
+                while len(self._mapped) > self.max_mapped:
+                    self._drop(self._mapped, next(iter(self._mapped)))
+                    self.evictions += 1
+            elif loaded.size <= self.max_bytes:
+                if path in self._memory:
+                    self._drop(self._memory, path)
+                self._memory[path] = loaded
+                self.size += loaded.size
+                while self.size > self.max_bytes:
+                    self._drop(self._memory, next(iter(self._memory)))
+                    self.evictions += 1
+        return loaded, False
+
+    def info(self, path: str) -> CachedFile:
+        status = os.stat(path)
+        with self._lock:
+            cached = self._cached(path, _identity(status))
+        return cached if cached is not None else CachedFile(None, status)
+
+    def count(self, hit: bool, sent: int):
+        with self._lock:
+            if hit:
+                self.hit_bytes += sent
+            else:
+                self.miss_bytes += sent
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_bytes": self.hit_bytes,
+                "miss_bytes": self.miss_bytes,
+                "evictions": self.evictions,
+                "cached_files": len(self._memory),
+                "cached_bytes": self.size,
+                "mapped_files": len(self._mapped),
+            }
+
+
+def parse_ranges(header: str, size: int) -> Optional[List[Range]]:
+    """parses a Range header for a file of the given size
+
+    Returns
+    -------
+    ranges : list of tuple of int and int, optional
+        the first and last byte of every satisfiable range, in the order of
+        the header. An empty list if no range is satisfiable. None if the
+        header is invalid or has more than MAX_RANGES ranges, in which case
+        the whole file is served
+    """
+    unit, _, specs = header.partition("=")
+    if unit.strip().lower() != "bytes" or not specs.strip():
+        return None
+    ranges: List[Range] = []
+    for spec in specs.split(","):
+        if not spec.strip():
+            continue
+        match = _range_pattern.match(spec)
+        if match is None:
+            return None
+        first, last = match.groups()
+        if not first:
+            if not last:
+                return None
+            length = int(last)
+            if length > 0 and size > 0:
+                ranges.append((max(0, size - length), size - 1))
+            continue
+        start = int(first)
+        end = int(last) if last else size - 1
+        if last and end < start:
+            return None
+        if start < size:
+            ranges.append((start, min(end, size - 1)))
+    if len(ranges) > MAX_RANGES:
+        return None
+    return ranges
+
+
+class CachedFileHandler(SimpleHTTPRequestHandler):
+    """Serves the files of a directory from a FileCache. Directories without
+    an index, redirects and missing files are handled by
+    SimpleHTTPRequestHandler"""
+
+    # Every response has a length, so connections are kept alive. Headers
+    # and body are separate writes: with Nagle's algorithm, the body of a
+    # kept alive connection waits for the client's delayed ACK
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def __init__(self, *args, cache: FileCache, **kwargs):
+        # The request is handled by the base constructor
+        self.cache = cache
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        self.serve_file(send_body=True)
+
+    def do_HEAD(self):
+        self.serve_file(send_body=False)
+
+    def file_path(self) -> Optional[str]:
+        """gives the file a request is for, or None if it is not a file"""
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            if not urlsplit(self.path).path.endswith("/"):
+                return None
+            path = os.path.join(path, "index.html")
+        return path if os.path.isfile(path) else None
+
+    def serve_file(self, send_body: bool):
+        path = self.file_path()
+        if path is None:
+            super().do_GET() if send_body else super().do_HEAD()
+            return
+        try:
+            if send_body:
+                served, hit = self.cache.get(path)
+            else:
+                served, hit = self.cache.info(path), False
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return
+        self.send_served(served, hit, self.guess_type(path), send_body)
+
+    def send_served(
+        self, served: Served, hit: bool, content_type: str, send_body: bool
+    ):
+        """answers a request for a file, with a part of it if ranges were
+        requested, or with a 304 if the client has it"""
+        if self.not_modified(served):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", served.etag)
+            self.end_headers()
+            return
+
+        ranges = None
+        header = self.headers.get("Range")
+        if header is not None and self.if_range_matches(served):
+            ranges = parse_ranges(header, served.size)
+        if ranges == []:
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header("Content-Range", f"bytes */{served.size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if ranges is None:
+            self.send_response(HTTPStatus.OK)
+            self.send_file_headers(served, content_type, served.size)
+            chunks: List[Union[bytes, Range]] = [(0, served.size - 1)]
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{served.size}")
+            self.send_file_headers(served, content_type, end - start + 1)
+            chunks = [ranges[0]]
+        else:
+            boundary = secrets.token_hex(12)
+            chunks = _multipart(ranges, served.size, content_type, boundary)
+            length = sum(
+                len(chunk) if isinstance(chunk, bytes) else chunk[1] - chunk[0] + 1
+                for chunk in chunks
+            )
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            self.send_file_headers(
+                served, f"multipart/byteranges; boundary={boundary}", length
+            )
+        self.end_headers()
+        if send_body:
+            assert served.data is not None
+            # Counted before writing, so the counters are current once the
+            # client has the response
+            sent = sum(
+                chunk[1] - chunk[0] + 1
+                for chunk in chunks
+                if not isinstance(chunk, bytes)
+            )
+            self.count(hit, sent)
+            with memoryview(served.data) as view:
+                for chunk in chunks:
+                    if isinstance(chunk, bytes):
+                        self.wfile.write(chunk)
+                    elif chunk[1] >= chunk[0]:
+                        self.wfile.write(view[chunk[0] : chunk[1] + 1])
+
+    def count(self, hit: bool, sent: int):
+        self.cache.count(hit, sent)
+
+    def send_file_headers(self, served: Served, content_type: str, length: int):
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", served.etag)
+        self.send_header("Last-Modified", served.last_modified)
+
+    def not_modified(self, served: Served) -> bool:
+        tags = self.headers.get("If-None-Match")
+        if tags is not None:
+            return tags.strip() == "*" or served.etag in (
+                tag.strip() for tag in tags.split(",")
+            )
+        return _not_modified_since(self.headers.get("If-Modified-Since"), served)
+
+    def if_range_matches(self, served: Served) -> bool:
+        """tells whether the ranges of a request apply to the current file"""
+        validator = self.headers.get("If-Range")
+        if validator is None:
+            return True
+        validator = validator.strip()
+        if validator.startswith('"'):
+            return validator == served.etag
+        return validator == served.last_modified
+
+
+class MemoryFileHandler(CachedFileHandler):
+    """Serves the files of a MemorySite. A request costs no file system call:
+    its path is looked up in the site, and the response is written from the
+    content, size and ETag computed when the site was built. Like
+    SimpleHTTPRequestHandler, a directory is redirected to its path with a
+    trailing slash and answered with its index.html"""
+
+    def __init__(self, *args, site: MemorySite, **kwargs):
+        self.site = site
+        # The directory is never read, but the base constructor asks for the
+        # working directory unless it is given one
+        SimpleHTTPRequestHandler.__init__(self, *args, directory=os.curdir, **kwargs)
+
+    def serve_file(self, send_body: bool):
+        parts = urlsplit(self.path)
+        name = posixpath.normpath(unquote(parts.path)).lstrip("/")
+        if name == ".":
+            name = ""
+        if self.site.is_directory(name):
+            if not parts.path.endswith("/"):
+                self.send_response(HTTPStatus.MOVED_PERMANENTLY)
+                location = parts._replace(scheme="", netloc="", path=parts.path + "/")
+                self.send_header("Location", location.geturl())
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            name = posixpath.join(name, "index.html")
+        served = self.site.get(name)
+        if served is None:
+            self.site.count(False, 0)
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return
+        self.send_served(served, True, self.guess_type(name), send_body)
+
+    def count(self, hit: bool, sent: int):
+        self.site.count(hit, sent)
+
+
+def _not_modified_since(header: Optional[str], served: Served) -> bool:
+    if header is None:
+        return False
+    try:
+        since = parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return False
+    return int(served.mtime) <= since
+
+
+def _multipart(
+    ranges: List[Range], size: int, content_type: str, boundary: str
+) -> List[Union[bytes, Range]]:
+    """gives the parts of a multipart/byteranges body: headers as bytes and
+    ranges of the file"""
+    chunks: List[Union[bytes, Range]] = []
+    for start, end in ranges:
+        headers = (
+            f"\r\n--{boundary}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+        )
+        chunks.append(headers.encode("latin-1"))
+        chunks.append((start, end))
+    chunks.append(f"\r\n--{boundary}--\r\n".encode("latin-1"))
+    return chunks
+
+
+def make_server(
+    directory: str,
+    port: int = 8888,
+    cache: Optional[FileCache] = None,
+    handler_class=CachedFileHandler,
+    server_class=ThreadingHTTPServer,
+) -> ThreadingHTTPServer:
+    """creates a server for the files of a directory. Files are resolved
+    against the directory on every request, so a published link that is
+    swapped by a build is followed"""
+    handler = partial(
+        handler_class, directory=directory, cache=cache or FileCache()
+    )
+    return server_class(("", port), handler)
+
+
+def make_memory_server(
+    site: MemorySite,
+    port: int = 8888,
+    handler_class=MemoryFileHandler,
+    server_class=ThreadingHTTPServer,
+) -> ThreadingHTTPServer:
+    """creates a server for the files of a site held in memory"""
+    return server_class(("", port), partial(handler_class, site=site))
+
+
+def run(
+    directory: str = ".",
+    port: int = 8888,
+    cache: Optional[FileCache] = None,
+    site: Optional[MemorySite] = None,
+):
+    """serves a directory, or a site held in memory if one is given, until
+    interrupted, then prints the cache counters"""
+    counters: Union[FileCache, MemorySite]
+    if site is not None:
+        counters = site
+        server = make_memory_server(site, port)
+        print(f"Serving HTTP on http://localhost:{port} from memory...")
+    else:
+        counters = cache = cache or FileCache()
+        server = make_server(directory, port, cache)
+        print(
+            f"Serving HTTP on http://localhost:{port} from directory '{directory}'..."
+        )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(counters.stats()))
@@ -0,0 +1,149 @@
+""" Functions for reading the front matter of markdown pages
+
+A front matter is a header at the very top of a markdown file, delimited by two
+lines holding only '---' (three dashes). Every other line of the header is a
+``key: value`` pair. Blank lines and lines starting with '#' are ignored.
+
+    ---
+    title: The Unparalleled Majesty of "The Lord of the Rings"
+    date: 2024-07-01
+    tags: tolkien, books
+    ---
+
+Constants
+---------
+
+FRONT_MATTER_DELIMITER : str = "---"
+    The line that opens and closes a front matter header.
+
+MAX_FRONT_MATTER_SIZE : int = 64 * 1024
+    The maximum size, in bytes, that a front matter header may have. Readers
+    stop looking for the closing delimiter after this many bytes so a file
+    without one is never read whole.
+"""
+
+from typing import Dict, Iterable, Iterator, List, TextIO, Tuple
+
+from discovery import discover_pages
+
+FRONT_MATTER_DELIMITER = "---"
+MAX_FRONT_MATTER_SIZE = 64 * 1024
+
+
+def _parse_front_matter_lines(lines: Iterable[str]) -> Dict[str, str]:
+    metadata: Dict[str, str] = {}
+    for line in lines:
+        line = line.strip()
+        if line == "" or line.startswith("#"):
+            continue
+        key, sep, value = line.partition(":")
+        if sep == "" or key.strip() == "":
+            raise ValueError(f"Invalid front matter line: {line}")
+        metadata[key.strip()] = value.strip()
+    return metadata
+
+
+def split_front_matter(markdown: str) -> Tuple[Dict[str, str], str]:
+    """separates the front matter of a markdown text from its body
+
+    Parameters
+    ----------
+    markdown : str
+        A string representing markdown text, with or without a front matter
+
+    Returns
+    -------
+    metadata : dict of str to str
+        the key/value pairs declared in the front matter. Empty if the text
+        has no front matter
+
+    body : str
+        the markdown text that follows the front matter
+
+    Raises
+    ------
+    ValueError
+        if the front matter is not closed or has an invalid line
+    """
+    first_line, newline, rest = markdown.partition("\n")
+    if first_line.rstrip() != FRONT_MATTER_DELIMITER:
+        return {}, markdown
+    lines: List[str] = []
+    while newline != "":
+        line, newline, rest = rest.partition("\n")
+        if line.rstrip() == FRONT_MATTER_DELIMITER:
+            return _parse_front_matter_lines(lines), rest
+        lines.append(line)
+    raise ValueError("Unclosed front matter")
+
+
+def read_front_matter(path: str) -> Dict[str, str]:
+    """reads the front matter of a markdown file. Only the bytes of the header
+    are read, the body of the file is never touched
+
+    Parameters
+    ----------
+    path : str
+        The path of a markdown file
+
+    Returns
+    -------
+    metadata : dict of str to str
+        the key/value pairs declared in the front matter. Empty if the file
+        has no front matter
+
+    Raises
+    ------
+    ValueError
+        if the front matter is not closed within MAX_FRONT_MATTER_SIZE bytes
+        or has an invalid line
+    """
+    with open(path, "r", encoding="utf-8") as handle:
+        return read_header(handle, path)[0]
+
+
+def read_header(handle: TextIO, path: str) -> Tuple[Dict[str, str], str]:
+    """reads the front matter of an open markdown file, which is left at the
+    start of its body. See read_front_matter
+
+    Returns
+    -------
+    metadata : dict of str to str
+        the key/value pairs declared in the front matter
+
+    start : str
+        the start of the body that was read: the first line of a file without
+        front matter, and an empty string otherwise
+    """
+    first_line = handle.readline(MAX_FRONT_MATTER_SIZE)
+    if first_line.rstrip() != FRONT_MATTER_DELIMITER:
+        return {}, first_line
+    lines: List[str] = []
+    read = len(first_line)
+    while read < MAX_FRONT_MATTER_SIZE:
+        line = handle.readline(MAX_FRONT_MATTER_SIZE - read)
+        if line == "":
+            break
+        if line.rstrip() == FRONT_MATTER_DELIMITER:
+            return _parse_front_matter_lines(lines), ""
+        read += len(line)
+        lines.append(line)
+    raise ValueError(f"Unclosed front matter in {path}")
+
+
+def scan_front_matter(content_dir: str) -> Iterator[Tuple[str, Dict[str, str]]]:
+    """reads the front matter of every markdown file under a directory without
+    parsing any page. Useful for building listings and indexes
+
+    Parameters
+    ----------
+    content_dir : str
+        The directory holding the markdown pages
+
+    Yields
+    ------
+    path, metadata : tuple of str and dict of str to str
+        the path of each markdown file and its front matter
+    """
+    for job in discover_pages(content_dir):
+        yield job.source, read_front_matter(job.source)
@@ -0,0 +1,283 @@
+""" Build time syntax highlighting for fenced code blocks
+
+A small set of regular expression lexers splits code into tokens. Every token
+is a pair of a token type and its text, where the token type is None for
+plain text. The tokens of every snippet are cached in memory and on disk, keyed
+by the language, a hash of the code and the highlighter version, so repeated
+snippets are tokenized once across builds.
+
+The disk cache is the highlight directory of the cache directory, given by
+the SSG_CACHE_DIR environment variable like the stat cache of the planner.
+It defaults to .cache, relative to the working directory: run the build
+from the python directory, or set SSG_CACHE_DIR, to share one cache. See
+set_cache_dir to move or disable it.
+
+Constants
+---------
+
+HIGHLIGHTER_VERSION : int
+    The version of the lexers. It must be increased whenever a lexer changes
+    so that stale cache entries are ignored.
+
+MEMORY_CACHE_SIZE : int
+    How many snippets the memory cache keeps. The least recently used ones
+    are dropped first, so memory does not grow with the size of the site.
+
+Token : TypeAlias = Tuple[Optional[str], str]
+    A token type and the text it covers. Token types are "keyword", "builtin",
+    "string", "comment" and "number".
+"""
+
+import hashlib
+import json
+import os
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional, Pattern, Tuple, TypeAlias
+
+HIGHLIGHTER_VERSION = 2
+MEMORY_CACHE_SIZE = 1024
+
+Token: TypeAlias = Tuple[Optional[str], str]
+
+
+def _lexer(
+    keywords: str,
+    builtins: str = "",
+    comment: str = r"//[^\n]*|/\*(?:[^*]|\*(?!/))*(?:\*/)?",
+    string: str = r'"(?:\\.|[^"\\\n])*"?' + r"|'(?:\\.|[^'\\\n])*'?",
+) -> Pattern[str]:
+    patterns = [
+        ("comment", comment),
+        ("string", string),
+        ("keyword", r"\b(?:" + "|".join(keywords.split()) + r")\b"),
+        ("number", r"\b(?:0[xXbBoO][0-9a-fA-F_]+|\d[\d_]*(?:\.\d+)?(?:[eE][-+]?\d+)?)"),
+    ]
+    if builtins != "":
+        patterns.append(("builtin", r"\b(?:" + "|".join(builtins.split()) + r")\b"))
+    return re.compile(
+        "|".join(f"(?P<{name}>{pattern})" for name, pattern in patterns), re.DOTALL
+    )
+
+
+_python = _lexer(
+    "and as assert async await break class continue def del elif else except "
+    "False finally for from global if import in is lambda None nonlocal not or "
+    "pass raise return True try while with yield match case",
+    "print len range open str int float list dict set tuple isinstance super "
+    "self Exception ValueError TypeError",
+    comment=r"#[^\n]*",
+    string=r'"""(?:\\.|(?!""")[^\\])*(?:""")?'
+    + r"|'''(?:\\.|(?!''')[^\\])*(?:''')?"
+    + r'|[rbfRBF]{0,2}"(?:\\.|[^"\\\n])*"?'
+    + r"|[rbfRBF]{0,2}'(?:\\.|[^'\\\n])*'?",
+)
+_javascript = _lexer(
+    "async await break case catch class const continue default delete do else "
+    "export extends false finally for from function if import in instanceof let "
+    "new null return static super switch this throw true try typeof undefined "
+    "var void while yield interface type enum implements",
+    "console document window Array Object String Number Promise JSON Math",
+    string=r'"(?:\\.|[^"\\\n])*"?' + r"|'(?:\\.|[^'\\\n])*'?|`(?:\\.|[^`\\])*`?",
+)
+_rust = _lexer(
+    "as async await break const continue crate dyn else enum extern false fn for "
+    "if impl in let loop match mod move mut pub ref return self Self static "
+    "struct super trait true type unsafe use where while",
+    "Option Some None Result Ok Err String Vec Box println format vec",
+    string=r'"(?:\\.|[^"\\])*"?',
+)
+_go = _lexer(
+    "break case chan const continue default defer else fallthrough for func go "
+    "goto if import interface map package range return select struct switch "
+    "type var true false nil",
+    "append cap len make new panic recover print println error string int",
+    string=r'"(?:\\.|[^"\\\n])*"?|`[^`]*`?',
+)
+_c = _lexer(
+    "auto break case char const continue default do double else enum extern "
+    "float for goto if inline int long register return short signed sizeof "
+    "static struct switch typedef union unsigned void volatile while class "
+    "namespace public private protected template typename new delete true false "
+    "nullptr",
+    "printf malloc free NULL std",
+)
+_bash = _lexer(
+    "if then else elif fi case esac for while until do done in function return "
+    "local export",
+    "echo cd ls cat grep sed awk python pip git exit set source",
+    comment=r"(?<![\w$])#[^\n]*",
+    string=r'"(?:\\.|[^"\\])*"?' + r"|'[^']*'?",
+)
+_json = _lexer("true false null", comment=r"(?!)")
+_css = _lexer(
+    "important",
+    comment=r"/\*(?:[^*]|\*(?!/))*(?:\*/)?",
+    string=r'"(?:\\.|[^"\\\n])*"?' + r"|'(?:\\.|[^'\\\n])*'?|#[0-9a-fA-F]{3,8}\b",
+)
+
+_lexers: Dict[str, Pattern[str]] = {
+    "python": _python,
+    "py": _python,
+    "javascript": _javascript,
+    "js": _javascript,
+    "typescript": _javascript,
+    "ts": _javascript,
+    "rust": _rust,
+    "rs": _rust,
+    "go": _go,
+    "c": _c,
+    "cpp": _c,
+    "c++": _c,
+    "java": _c,
+    "bash": _bash,
+    "sh": _bash,
+    "shell": _bash,
+    "json": _json,
+    "css": _css,
+}
+
+_memory_cache: "OrderedDict[Tuple[str, str], List[Token]]" = OrderedDict()
+# Snippets found in either cache, and snippets tokenized
+_counts = {"hits": 0, "misses": 0}
+_cache_dir: Optional[str] = os.path.join(
+    os.environ.get("SSG_CACHE_DIR", ".cache"), "highlight"
+)
+
+
+def set_cache_dir(path: Optional[str]) -> Optional[str]:
+    """sets the directory of the disk cache, and gives the previous one. None
+    disables the disk cache"""
+    global _cache_dir
+    previous, _cache_dir = _cache_dir, path
+    _memory_cache.clear()
+    return previous
+
+
+def cache_dir() -> Optional[str]:
+    """gives the directory of the disk cache, or None if it is disabled"""
+    return _cache_dir
+
+
+def cache_counts() -> Tuple[int, int]:
+    """gives how many snippets were found in the memory or disk cache, and how
+    many were tokenized, since the process started"""
+    return _counts["hits"], _counts["misses"]
+
+
+def is_supported(language: str) -> bool:
+    """tells whether there is a lexer for a language"""
+    return language.lower() in _lexers
+
+
+def tokenize(language: str, code: str) -> List[Token]:
+    """splits code into tokens using the lexer of the language, bypassing the
+    caches
+
+    Parameters
+    ----------
+    language : str
+        The name of a supported language, as written after an opening fence
+
+    code : str
+        The code to tokenize
+
+    Returns
+    -------
+    tokens : list of Token
+        the tokens of the code. Joining their texts gives back the code
+
+    Raises
+    ------
+    ValueError
+        if the language is not supported
+    """
+    lexer = _lexers.get(language.lower())
+    if lexer is None:
+        raise ValueError(f"Unsupported language: {language}")
+    tokens: List[Token] = []
+    position = 0
+    for match in lexer.finditer(code):
+        if match.start() > position:
+            tokens.append((None, code[position : match.start()]))
+        tokens.append((match.lastgroup, match.group()))
+        position = match.end()
+    if position < len(code):
+        tokens.append((None, code[position:]))
+    return tokens
+
+
+def _cache_path(language: str, code_hash: str) -> Optional[str]:
+    if _cache_dir is None:
+        return None
+    return os.path.join(
+        _cache_dir,
+        f"v{HIGHLIGHTER_VERSION}",
+        language,
+        code_hash[:2],
+        code_hash + ".json",
+    )
+
+
+def _read_cached(path: str) -> Optional[List[Token]]:
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            return [(token_type, text) for token_type, text in json.load(handle)]
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cached(path: str, tokens: List[Token]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as handle:
+        json.dump(tokens, handle, separators=(",", ":"))
+    os.replace(temporary_path, path)
+
+
+def highlight(language: str, code: str) -> List[Token]:
+    """splits code into tokens, reading them from the caches when the same
+    code was already highlighted by this version of the highlighter
+
+    Parameters
+    ----------
+    language : str
+        The name of a supported language, as written after an opening fence
+
+    code : str
+        The code to highlight
+
+    Returns
+    -------
+    tokens : list of Token
+        the tokens of the code
+
+    Raises
+    ------
+    ValueError
+        if the language is not supported
+    """
+    language = language.lower()
+    key = (language, code)
+    tokens = _memory_cache.get(key)
+    if tokens is not None:
+        _memory_cache.move_to_end(key)
+        _counts["hits"] += 1
+        return tokens
+    code_hash = hashlib.sha256(code.encode("utf-8")).hexdigest()
+    path = _cache_path(language, code_hash)
+    tokens = _read_cached(path) if path is not None else None
+    if tokens is None:
+        _counts["misses"] += 1
+        tokens = tokenize(language, code)
+        if path is not None:
+            try:
+                _write_cached(path, tokens)
+            except OSError:
+                pass
+    else:
+        _counts["hits"] += 1
+    _memory_cache[key] = tokens
+    if len(_memory_cache) > MEMORY_CACHE_SIZE:
+        _memory_cache.popitem(last=False)
+    return tokens
@@ -4,9 +4,47 @@ this context is either one the two specialized classes that inherit from it:
 a ParentNode or a LeafNode. A LeafNode is a HTML node without any child nodes. 
 In contrast, the ParentNode is a node that has at least one HTMLNode as child.
 A ParentNode may have one or more instances of ParentNode as children.
+
+Values and properties are escaped when nodes are converted to HTML, so a node
+holding text with '<' or '"' characters still gives valid HTML.
 """
 
-from typing import Dict, Optional, Sequence
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple
+
+_text_escapes = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+_attribute_escapes = str.maketrans(
+    {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;"}
+)
+
+
+def escape_text(text: str) -> str:
+    """escapes the characters of a text that have a meaning in HTML content.
+    Texts without any of them are returned as they are"""
+    if "&" not in text and "<" not in text and ">" not in text:
+        return text
+    return text.translate(_text_escapes)
+
+
+def escape_attribute(value: str) -> str:
+    """escapes the characters of a text that have a meaning in a double quoted
+    HTML attribute value. Texts without any of them are returned as they are"""
+    if "&" not in value and "<" not in value and ">" not in value and '"' not in value:
+        return value
+    return value.translate(_attribute_escapes)
+
+
+def _join_props(props: Tuple[Tuple[str, str], ...]) -> str:
+    return " ".join([f'{prop}="{escape_attribute(value)}"' for (prop, value) in props])
+
+
+@lru_cache(maxsize=4096)
+def cached_opening_tag(tag: str, props: Optional[Tuple[Tuple[str, str], ...]]) -> str:
+    """gives the opening HTML tag for a tag name and a tuple of its properties.
+    Results are cached for every combination of tag and properties"""
+    if props is None:
+        return f"<{tag}>"
+    return f"<{tag} {_join_props(props)}>"
 
 
 class HTMLNode:
@@ -33,6 +71,9 @@ class HTMLNode:
         Joins the properties of the HTML node into a string with html valid
         properties declaration.
 
+    opening_tag()
+        Gives the opening HTML tag of the node, with its properties.
+
 
     """
 
@@ -59,7 +100,25 @@ class HTMLNode:
         """
         if self.props is None:
             return ""
-        return " ".join([f'{prop}="{value}"' for (prop, value) in self.props.items()])
+        return _join_props(tuple(self.props.items()))
+
+    def opening_tag(self) -> str:
+        """Gives the opening HTML tag of the node, with its properties. Opening
+        tags are cached for every combination of tag and properties, except
+        for tags with an id or a href, which are rarely repeated and would
+        only push the others out of the cache.
+
+        Returns
+        -------
+        opening_tag : str
+            the opening tag
+        """
+        if self.props is None:
+            return cached_opening_tag(self.tag, None)
+        props = tuple(self.props.items())
+        if "id" in self.props or "href" in self.props:
+            return f"<{self.tag} {_join_props(props)}>"
+        return cached_opening_tag(self.tag, props)
 
     # dummy implementation just to pass static typing
     def to_html(self) -> str:
@@ -72,7 +131,14 @@ class HTMLNode:
         return (
             self.tag == other.tag
             and self.value == other.value
-            and self.children == other.children
+            and (
+                self.children == other.children
+                or (
+                    self.children is not None
+                    and other.children is not None
+                    and list(self.children) == list(other.children)
+                )
+            )
             and self.props == other.props
         )
 
@@ -124,9 +190,9 @@ class LeafNode(HTMLNode):
         if self.value is None:
             raise ValueError("Leaf node should have a value")
         if self.tag is None:
-            return self.value
+            return escape_text(self.value)
         else:
-            return f"<{self.tag}{' '+self.props_to_html() if self.props is not None else ''}>{self.value}</{self.tag}>"
+            return f"{self.opening_tag()}{escape_text(self.value)}</{self.tag}>"
 
     def __repr__(self) -> str:
         return f"LeafNode({self.tag}, {self.value}, {self.children}, {self.props})"
@@ -184,10 +250,7 @@ class ParentNode(HTMLNode):
             if child.children is not None and len(child.children) == 0:
                 continue
             inner_html += child.to_html()
-        return (
-            f"<{self.tag}{' '+self.props_to_html() if self.props is not None else ''}>{inner_html}"
-            f"</{self.tag}>"
-        )
+        return f"{self.opening_tag()}{inner_html}</{self.tag}>"
 
     def __repr__(self) -> str:
         return f"ParentNode({self.tag}, {self.value}, {self.children}, {self.props})"
@@ -1,17 +1,19 @@
 import re
-from typing import Callable, List, Tuple, TypeVar
+from typing import Callable, List, Pattern, Tuple
 from textnode import TextNode, TextType
 
 
-T = TypeVar("T")
+# Every splitter works on the spans of the text nodes it receives: new nodes
+# are spans of the same source string, so no substring is created until the
+# text of a node is read.
 
 
 # NOTE: This may be too much abstraction for only two cases of reuse. This
 # implementation is just showcasing a way to use function composition to
-# extract the list of nodes from a string and use recursion to aggregate them.
+# find the items of a text node and turn each of them into a node.
 def _create_nodes_splitter(
-    extractor: Callable[[str], List[T]],
-    aggregator: Callable[[str, List[T]], List[TextNode]],
+    pattern: Pattern[str],
+    node_constructor: Callable[[TextNode, re.Match], TextNode],
 ):
 
     def split_nodes(nodes: List[TextNode]) -> List[TextNode]:
@@ -20,104 +22,96 @@ def _create_nodes_splitter(
             if node.text_type != "text":
                 new_nodes.append(node)
                 continue
-            items = extractor(node.text)
-            has_items = len(items) > 0
-            if not has_items:
+            source = node.source
+            position = node.start
+            for match in pattern.finditer(source, node.start, node.end):
+                if match.start() > position:
+                    new_nodes.append(
+                        TextNode.span(source, position, match.start(), "text")
+                    )
+                new_nodes.append(node_constructor(node, match))
+                position = match.end()
+            if position == node.start:
                 new_nodes.append(node)
-                continue
-            new_nodes.extend(aggregator(node.text, items))
+            elif position < node.end:
+                new_nodes.append(TextNode.span(source, position, node.end, "text"))
 
         return new_nodes
 
     return split_nodes
 
 
-# NOTE: Again, this may be too much abstraction for little reuse. This
-# implementation is just showcasing a way to use function composition
-# and recursion
-def _create_aggregator(
-    sep_constructor: Callable[[T], str], node_constructor: Callable[[T], TextNode]
-):
-
-    def aggregate(text: str, aggregates: List[T]) -> List[TextNode]:
-        if text == "":
-            return []
-        if len(aggregates) == 0:
-            return [TextNode(text, "text")]
-        agg = aggregates[0]
-        sep = sep_constructor(agg)
-        [text_before, text_after] = text.split(sep, 1)
-
-        nodes = [TextNode(text_before, "text"), node_constructor(agg)]
-        nodes.extend(aggregate(text_after, aggregates[1:]))
-
-        return nodes
-
-    return aggregate
-
-
-def _img_info_to_sep(img_info: Tuple[str, str]) -> str:
-    return f"![{img_info[0]}]({img_info[1]})"
-
-
-def _img_info_to_text_node(img_info: Tuple[str, str]) -> TextNode:
-    return TextNode(img_info[0], "image", img_info[1])
+def _match_to_text_node(text_type: TextType):
+    def node_constructor(node: TextNode, match: re.Match) -> TextNode:
+        return TextNode.span(
+            node.source, match.start(1), match.end(1), text_type, match.group(2)
+        )
 
-
-def _link_info_to_sep(link_info: Tuple[str, str]) -> str:
-    return f"[{link_info[0]}]({link_info[1]})"
-
-
-def _link_info_to_text_node(link_info: Tuple[str, str]) -> TextNode:
-    return TextNode(link_info[0], "link", link_info[1])
-
-
-aggregate_split_images = _create_aggregator(_img_info_to_sep, _img_info_to_text_node)
-aggregate_split_links = _create_aggregator(_link_info_to_sep, _link_info_to_text_node)
+    return node_constructor
 
 
 def _split_nodes_delimiter(
     old_nodes: List[TextNode], delimiter: str, text_type: TextType
 ):
+    # Delimiters pair up from the left. An unpaired last delimiter, and a pair
+    # with nothing between its delimiters, stay in the text as written, so
+    # every input parses and a node is scanned once whatever it holds.
     new_nodes = []
     for node in old_nodes:
         if node.text_type != "text":
             new_nodes.append(node)
             continue
-        splited = node.text.split(delimiter)
-        if len(splited) % 2 == 0:
-            raise ValueError("Invalid markdown syntax. Unclosed formatting delimiter")
-        for i, text in enumerate(splited):
-            if text == "":
+        source, end, size = node.source, node.end, len(delimiter)
+        boundaries = []
+        position = source.find(delimiter, node.start, end)
+        while position != -1:
+            boundaries.append(position)
+            position = source.find(delimiter, position + size, end)
+        text_start = node.start
+        for i in range(0, len(boundaries) - 1, 2):
+            opening, closing = boundaries[i], boundaries[i + 1]
+            if closing == opening + size:
                 continue
-            new_nodes.extend(
-                [TextNode(text, "text") if i % 2 == 0 else TextNode(text, text_type)]
-            )
+            if opening > text_start:
+                new_nodes.append(TextNode.span(source, text_start, opening, "text"))
+            new_nodes.append(TextNode.span(source, opening + size, closing, text_type))
+            text_start = closing + size
+        if text_start == node.start:
+            new_nodes.append(node)
+        elif text_start < end:
+            new_nodes.append(TextNode.span(source, text_start, end, "text"))
     return new_nodes
 
 
+# The text of a link or an image cannot hold brackets and its URL cannot hold
+# parentheses, except balanced pairs one level deep. A failed match then stops
+# at the next bracket or parenthesis, instead of scanning to the end of the
+# line, so a paragraph full of unmatched brackets is still parsed in linear
+# time.
+_link_text = r"(?!\])[^\[\]\n]*(?:\[[^\[\]\n]*\][^\[\]\n]*)*"
+_link_url = r"(?!\))[^()\n]*(?:\([^()\n]*\)[^()\n]*)*"
+_image_pattern = re.compile(rf"!\[({_link_text})\]\(({_link_url})\)")
+_link_pattern = re.compile(rf"(?<!!)\[({_link_text})\]\(({_link_url})\)")
+
+
 def _extract_markdown_images(text: str) -> List[Tuple[str, str]]:
-    pattern = re.compile(r"!\[(.+?)\]\((.+?)\)")
-    return re.findall(pattern, text)
+    return re.findall(_image_pattern, text)
 
 
 def _extract_markdown_links(text: str) -> List[Tuple[str, str]]:
-    pattern = re.compile(r"(?<!\!)\[(.+?)\]\((.+?)\)")
-    return re.findall(pattern, text)
+    return re.findall(_link_pattern, text)
 
 
 _split_nodes_image = _create_nodes_splitter(
-    _extract_markdown_images, aggregate_split_images
-)
-_split_nodes_link = _create_nodes_splitter(
-    _extract_markdown_links, aggregate_split_links
+    _image_pattern, _match_to_text_node("image")
 )
+_split_nodes_link = _create_nodes_splitter(_link_pattern, _match_to_text_node("link"))
 
 
 def text_to_text_nodes(text: str) -> List[TextNode]:
     """
     Takes a text string with inline markdown and splits it into a list o
-    TextNodes.
+    TextNodes. Every node is a span of the given text.
     """
 
     # The order of the splitting by delimiter matter since there are some
@@ -0,0 +1,346 @@
+""" A load generator for the file server. Run from the python directory:
+
+    python src/loadtest.py run --dir public --duration 10 --concurrency 16
+    python src/loadtest.py run --url http://localhost:8888 --dir public
+    python src/loadtest.py run --no-keep-alive --output after.json
+    python src/loadtest.py compare before.json after.json
+
+Without --url, a server is started for the directory on a free port, in its
+own process so that it does not share an interpreter lock with the clients.
+Requests only ever go to the local host. Every client thread picks URLs at
+random from the files of the generated site; --skew favours the first URLs,
+like a site where a few pages get most of the traffic.
+
+A run prints a JSON report: its settings, the number of requests, requests
+per second, latency percentiles in milliseconds and errors by kind, which are
+HTTP statuses from 400 and exception names. compare prints the relative
+change of every rate and latency between two reports.
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import quote, urlsplit
+
+from tree import scan_tree
+
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+
+
+def site_urls(root: str) -> List[str]:
+    """gives the URL of every file of a generated site, sorted. The index of
+    a directory is also given by the URL of the directory"""
+    urls = []
+    for relative, _ in scan_tree(root):
+        url = "/" + quote(relative.replace(os.sep, "/"))
+        urls.append(url)
+        if url.endswith("/index.html"):
+            urls.append(url.removesuffix("index.html"))
+    return sorted(urls)
+
+
+def percentile(ordered: Sequence[float], rank: float) -> float:
+    """gives the nearest-rank percentile of sorted values, or 0 if there are
+    none"""
+    if not ordered:
+        return 0.0
+    index = max(0, math.ceil(rank / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+class _Client(threading.Thread):
+    """sends requests on one connection until the deadline"""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        urls: List[str],
+        weights: Optional[List[float]],
+        keep_alive: bool,
+        deadline: float,
+        seed: int,
+    ):
+        super().__init__(daemon=True)
+        self.host = host
+        self.port = port
+        self.urls = urls
+        self.weights = weights
+        self.keep_alive = keep_alive
+        self.deadline = deadline
+        self.rng = random.Random(seed)
+        self.latencies: List[float] = []
+        self.errors: Dict[str, int] = {}
+        self.bytes = 0
+
+    def error(self, kind: str):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def run(self):
+        headers = {} if self.keep_alive else {"Connection": "close"}
+        connection = None
+        while time.perf_counter() < self.deadline:
+            url = self.rng.choices(self.urls, cum_weights=self.weights)[0]
+            if connection is None:
+                connection = http.client.HTTPConnection(self.host, self.port)
+            started = time.perf_counter()
+            try:
+                connection.request("GET", url, headers=headers)
+                response = connection.getresponse()
+                self.bytes += len(response.read())
+            except (OSError, http.client.HTTPException) as error:
+                self.error(type(error).__name__)
+                connection.close()
+                connection = None
+                continue
+            self.latencies.append(time.perf_counter() - started)
+            if response.status >= 400:
+                self.error(str(response.status))
+            if not self.keep_alive or response.will_close:
+                connection.close()
+                connection = None
+        if connection is not None:
+            connection.close()
+
+
+def _cumulative_weights(count: int, skew: float) -> Optional[List[float]]:
+    """weights the URLs like a Zipf distribution of the given exponent"""
+    if skew <= 0:
+        return None
+    weights, total = [], 0.0
+    for rank in range(1, count + 1):
+        total += 1 / rank**skew
+        weights.append(total)
+    return weights
+
+
+def run_load(
+    url: str,
+    urls: List[str],
+    duration: float = 10.0,
+    concurrency: int = 8,
+    keep_alive: bool = True,
+    skew: float = 0.0,
+    seed: int = 0,
+) -> Dict:
+    """sends requests to a local server for a duration
+
+    Parameters
+    ----------
+    url : str
+        The root URL of the server, on the local host
+
+    urls : list of str
+        The paths to request
+
+    duration : float
+        How long to send requests for, in seconds
+
+    concurrency : int
+        How many clients send requests at the same time
+
+    keep_alive : bool
+        If True, a client reuses its connection. Otherwise it opens one per
+        request
+
+    skew : float
+        The exponent of the Zipf distribution URLs are picked with. 0 picks
+        them uniformly
+
+    seed : int
+        The seed of the URL choices
+
+    Returns
+    -------
+    report : dict
+        the settings and results of the run
+
+    Raises
+    ------
+    ValueError
+        if the server is not on the local host, or there are no URLs
+    """
+    parts = urlsplit(url)
+    if parts.hostname not in LOCAL_HOSTS:
+        raise ValueError(f"Load tests only run against the local host, not {url}")
+    if not urls:
+        raise ValueError("There are no URLs to request")
+    prefix = parts.path.rstrip("/")
+    paths = [prefix + path for path in urls]
+    weights = _cumulative_weights(len(paths), skew)
+    started = time.perf_counter()
+    deadline = started + duration
+    clients = [
+        _Client(
+            parts.hostname,
+            parts.port or 80,
+            paths,
+            weights,
+            keep_alive,
+            deadline,
+            seed + index,
+        )
+        for index in range(concurrency)
+    ]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for client in clients for latency in client.latencies)
+    errors: Dict[str, int] = {}
+    for client in clients:
+        for kind, count in client.errors.items():
+            errors[kind] = errors.get(kind, 0) + count
+    failed = sum(count for kind, count in errors.items() if not kind.isdigit())
+    requests = len(latencies) + failed
+    return {
+        "settings": {
+            "url": url,
+            "urls": len(urls),
+            "duration": duration,
+            "concurrency": concurrency,
+            "keep_alive": keep_alive,
+            "skew": skew,
+            "seed": seed,
+        },
+        "requests": requests,
+        "elapsed": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 1),
+        "bytes_per_second": round(sum(c.bytes for c in clients) / elapsed),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+            "max": round(latencies[-1] * 1000 if latencies else 0.0, 3),
+        },
+        "errors": dict(sorted(errors.items())),
+    }
+
+
+def compare(before: Dict, after: Dict) -> Dict[str, float]:
+    """gives the relative change of the rates and latencies of two reports.
+    A positive change is an increase"""
+
+    def change(old: float, new: float) -> float:
+        return round((new - old) / old, 4) if old else 0.0
+
+    changes = {
+        key: change(before[key], after[key])
+        for key in ("requests_per_second", "bytes_per_second")
+    }
+    for key, value in after["latency_ms"].items():
+        changes[f"latency_{key}"] = change(before["latency_ms"][key], value)
+    changes["errors"] = sum(after["errors"].values()) - sum(
+        before["errors"].values()
+    )
+    return changes
+
+
+def _free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def _wait_for(port: int, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def _start_server(directory: str) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    server = os.path.join(os.path.dirname(os.path.dirname(__file__)), "server.py")
+    process = subprocess.Popen(
+        [sys.executable, server, "--dir", directory, "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_for(port)
+    except OSError:
+        process.kill()
+        raise
+    return process, f"http://127.0.0.1:{port}"
+
+
+def _run(args: argparse.Namespace):
+    urls = site_urls(args.dir)
+    process = None
+    url = args.url
+    if url is None:
+        process, url = _start_server(args.dir)
+    try:
+        report = run_load(
+            url,
+            urls,
+            args.duration,
+            args.concurrency,
+            args.keep_alive,
+            args.skew,
+            args.seed,
+        )
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(output + "\n")
+    print(output)
+
+
+def _compare(args: argparse.Namespace):
+    with open(args.before, "r") as handle:
+        before = json.load(handle)
+    with open(args.after, "r") as handle:
+        after = json.load(handle)
+    print(json.dumps(compare(before, after), indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Load a server and report")
+    run.add_argument("--dir", help="The generated site", default="./public")
+    run.add_argument(
+        "--url", help="A running local server. Started for --dir if not given"
+    )
+    run.add_argument("--duration", type=float, help="Seconds", default=10.0)
+    run.add_argument("--concurrency", type=int, help="Clients", default=8)
+    run.add_argument(
+        "--no-keep-alive",
+        dest="keep_alive",
+        action="store_false",
+        help="Open a connection per request",
+    )
+    run.add_argument(
+        "--skew", type=float, help="Zipf exponent of the URL mix", default=0.0
+    )
+    run.add_argument("--seed", type=int, help="Seed of the URL mix", default=0)
+    run.add_argument("--output", help="Also write the report to a file")
+    run.set_defaults(function=_run)
+    diff = commands.add_parser("compare", help="Compare two reports")
+    diff.add_argument("before")
+    diff.add_argument("after")
+    diff.set_defaults(function=_compare)
+    args = parser.parse_args()
+    args.function(args)
@@ -1,10 +1,95 @@
-from page import generate_pages_recursive
-from tree import copy_file_tree
+import argparse
+
+from archive import is_archive
+from build import build_site
+from discovery import DEFAULT_EXCLUDE, DEFAULT_INCLUDE
+from metrics import BuildMetrics, write_metrics
+from stream import archive_site, stream_site
 
 
 def main():
-    copy_file_tree("./static", "./public")
-    generate_pages_recursive("./content", "./template.html", "public")
+    parser = argparse.ArgumentParser()
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print the new, changed and deleted outputs without building",
+    )
+    mode.add_argument(
+        "--stream",
+        action="store_true",
+        help="Rebuild the whole site with a memory use that does not grow "
+        "with its size",
+    )
+    mode.add_argument(
+        "--archive",
+        metavar="PATH",
+        help="Stream the whole site into a .tar, .tar.gz, .tgz or .zip archive "
+        "instead of the public directory",
+    )
+    parser.add_argument(
+        "--include",
+        action="append",
+        metavar="GLOB",
+        help="Only build the content files matching GLOB. Defaults to *.md",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        metavar="GLOB",
+        help="Leave out the content files and directories matching GLOB. "
+        "Defaults to hidden ones",
+    )
+    parser.add_argument(
+        "--metrics",
+        action="append",
+        default=[],
+        metavar="PATH",
+        help="Also write the metrics of the build to PATH, in the Prometheus "
+        "text format if it ends with .prom and as JSON otherwise",
+    )
+    args = parser.parse_args()
+    include = args.include or DEFAULT_INCLUDE
+    exclude = args.exclude or DEFAULT_EXCLUDE
+    metrics = BuildMetrics()
+    if args.archive:
+        if not is_archive(args.archive):
+            parser.error(f"--archive: unsupported archive {args.archive}")
+        archive_site(
+            "./content",
+            "./template.html",
+            "./static",
+            args.archive,
+            include=include,
+            exclude=exclude,
+            metrics=metrics,
+        )
+    elif args.stream:
+        stream_site(
+            "./content",
+            "./template.html",
+            "./static",
+            "./public",
+            include=include,
+            exclude=exclude,
+            metrics=metrics,
+        )
+    else:
+        build_site(
+            "./content",
+            "./template.html",
+            "./static",
+            "./public",
+            dry_run=args.dry_run,
+            include=include,
+            exclude=exclude,
+            metrics=metrics,
+        )
+        if args.dry_run:
+            return
+    for path in args.metrics:
+        write_metrics(metrics, path)
 
 
-main()
+if __name__ == "__main__":
+    main()
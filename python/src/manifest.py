@@ -0,0 +1,265 @@
+""" Merkle trees of a built site. Run from the python directory:
+
+    python src/manifest.py hash public --output public.json
+    python src/manifest.py diff deployed.json public.json
+
+A manifest holds a node for every file and directory of a site. The hash of
+a file is the sha256 of its contents, and the hash of a directory is the
+sha256 of the names, kinds and hashes of its entries. Hashes only depend on
+contents and names, so the root hash of two identical builds is the same on
+any machine, and two manifests are compared by descending only into the
+directories whose hashes differ: a diff costs time in proportion to the
+changes, not to the size of the site.
+
+Every build writes the manifest of the published site next to its stat cache.
+A file whose stat did not change since the previous manifest is not read
+again, so the manifest of an incremental build mostly costs a stat per file.
+
+    {"version": 1, "root": {"hash": ..., "entries": {
+        "index.html": {"hash": ..., "size": 1024, "stat": [inode, mtime_ns]},
+        "blog": {"hash": ..., "entries": {...}}
+    }}}
+
+Constants
+---------
+
+MANIFEST_VERSION : int
+    The version of the manifest format. Manifests of another version are
+    not reused.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from planner import file_digest
+from tree import scan_tree
+
+MANIFEST_VERSION = 1
+
+Node = Dict[str, Any]
+Manifest = Dict[str, Any]
+
+
+def manifest_path(stat_cache_path: str) -> str:
+    """gives the manifest written next to a stat cache"""
+    return os.path.splitext(stat_cache_path)[0] + ".manifest.json"
+
+
+def _is_directory(node: Node) -> bool:
+    return "entries" in node
+
+
+def _files(prefix: str, node: Node) -> Iterator[Tuple[str, Node]]:
+    """yields every file under a node with its path"""
+    stack = [(prefix, node)]
+    while stack:
+        path, current = stack.pop()
+        if _is_directory(current):
+            for name, child in current["entries"].items():
+                stack.append((f"{path}/{name}" if path else name, child))
+        else:
+            yield path, current
+
+
+def hash_tree(root: str, previous: Optional[Manifest] = None) -> Manifest:
+    """gives the manifest of a directory
+
+    Parameters
+    ----------
+    root : str
+        The directory, usually a built site
+
+    previous : dict, optional
+        An earlier manifest of the same directory. Files whose inode, size
+        and mtime did not change keep their hash and are not read
+
+    Returns
+    -------
+    manifest : dict
+        the Merkle tree of the directory
+    """
+    known: Dict[str, Node] = {}
+    if previous is not None and previous.get("version") == MANIFEST_VERSION:
+        known = dict(_files("", previous["root"]))
+    tree: Node = {"entries": {}}
+    for relative, entry in scan_tree(root):
+        parts = relative.split(os.sep)
+        stat = entry.stat()
+        stat_key = [stat.st_ino, stat.st_mtime_ns]
+        old = known.get("/".join(parts))
+        if (
+            old is not None
+            and old["size"] == stat.st_size
+            and old["stat"] == stat_key
+        ):
+            digest = old["hash"]
+        else:
+            digest = file_digest(entry.path)
+        directory = tree
+        for part in parts[:-1]:
+            directory = directory["entries"].setdefault(part, {"entries": {}})
+        directory["entries"][parts[-1]] = {
+            "hash": digest,
+            "size": stat.st_size,
+            "stat": stat_key,
+        }
+    # Directories are hashed after their entries, without recursion
+    stack: List[Tuple[Node, bool]] = [(tree, False)]
+    while stack:
+        node, entries_hashed = stack.pop()
+        if entries_hashed:
+            digest = hashlib.sha256()
+            for name in sorted(node["entries"]):
+                child = node["entries"][name]
+                kind = "d" if _is_directory(child) else "f"
+                digest.update(f"{name}\0{kind}\0{child['hash']}\n".encode("utf-8"))
+            node["hash"] = digest.hexdigest()
+            node["entries"] = dict(sorted(node["entries"].items()))
+            continue
+        stack.append((node, True))
+        for child in node["entries"].values():
+            if _is_directory(child):
+                stack.append((child, False))
+    root = {"hash": tree["hash"], "entries": tree["entries"]}
+    return {"version": MANIFEST_VERSION, "root": root}
+
+
+def load_manifest(path: str) -> Optional[Manifest]:
+    """reads a manifest, or gives None if it does not exist or cannot be
+    read"""
+    try:
+        with open(path, "r") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def save_manifest(manifest: Manifest, path: str):
+    """writes a manifest, replacing any previous one atomically"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as handle:
+        json.dump(manifest, handle, separators=(",", ":"))
+    os.replace(temporary, path)
+
+
+class ManifestDiff:
+    """The files that differ between two manifests, by path relative to the
+    root of the site, using "/" as separator.
+
+    Attributes
+    ----------
+    added, changed, removed : list of str
+        The files only in the new manifest, in both with different hashes,
+        and only in the old manifest.
+
+    Methods
+    -------
+    describe()
+        yields a line for every file that differs, then a summary
+    """
+
+    def __init__(self):
+        self.added: List[str] = []
+        self.changed: List[str] = []
+        self.removed: List[str] = []
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+    def describe(self) -> Iterator[str]:
+        for path in self.added:
+            yield f"added: {path}"
+        for path in self.changed:
+            yield f"changed: {path}"
+        for path in self.removed:
+            yield f"removed: {path}"
+        yield (
+            f"{len(self.added)} added, {len(self.changed)} changed, "
+            f"{len(self.removed)} removed"
+        )
+
+
+def diff_manifests(old: Manifest, new: Manifest) -> ManifestDiff:
+    """compares two manifests. Directories with the same hash are skipped
+    without looking at their entries"""
+    diff = ManifestDiff()
+    stack = [("", old["root"], new["root"])]
+    while stack:
+        prefix, before, after = stack.pop()
+        if before["hash"] == after["hash"]:
+            continue
+        old_entries, new_entries = before["entries"], after["entries"]
+        for name in old_entries.keys() | new_entries.keys():
+            path = f"{prefix}/{name}" if prefix else name
+            old_node, new_node = old_entries.get(name), new_entries.get(name)
+            if old_node is None:
+                diff.added.extend(file for file, _ in _files(path, new_node))
+            elif new_node is None:
+                diff.removed.extend(file for file, _ in _files(path, old_node))
+            elif _is_directory(old_node) and _is_directory(new_node):
+                stack.append((path, old_node, new_node))
+            elif _is_directory(old_node) or _is_directory(new_node):
+                diff.removed.extend(file for file, _ in _files(path, old_node))
+                diff.added.extend(file for file, _ in _files(path, new_node))
+            elif old_node["hash"] != new_node["hash"]:
+                diff.changed.append(path)
+    diff.added.sort()
+    diff.changed.sort()
+    diff.removed.sort()
+    return diff
+
+
+def _hash(args: argparse.Namespace):
+    previous = load_manifest(args.output) if args.output else None
+    manifest = hash_tree(args.dir, previous)
+    if args.output:
+        save_manifest(manifest, args.output)
+    print(manifest["root"]["hash"])
+
+
+def _diff(args: argparse.Namespace):
+    manifests = []
+    for path in (args.old, args.new):
+        manifest = load_manifest(path)
+        if manifest is None:
+            sys.exit(f"Cannot read the manifest {path}")
+        manifests.append(manifest)
+    diff = diff_manifests(*manifests)
+    if args.json:
+        print(
+            json.dumps(
+                {
+                    "added": diff.added,
+                    "changed": diff.changed,
+                    "removed": diff.removed,
+                }
+            )
+        )
+    else:
+        for line in diff.describe():
+            print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+    hash_command = commands.add_parser(
+        "hash", help="Print the root hash of a directory"
+    )
+    hash_command.add_argument("dir", help="The directory to hash")
+    hash_command.add_argument(
+        "--output", help="Write the manifest, reusing the hashes it holds"
+    )
+    hash_command.set_defaults(function=_hash)
+    diff_command = commands.add_parser("diff", help="Compare two manifests")
+    diff_command.add_argument("old")
+    diff_command.add_argument("new")
+    diff_command.add_argument("--json", action="store_true", help="Print JSON")
+    diff_command.set_defaults(function=_diff)
+    args = parser.parse_args()
+    args.function(args)
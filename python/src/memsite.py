@@ -0,0 +1,155 @@
+""" A generated site held in memory
+
+A preview does not need its site on disk: memory_site in stream.py renders
+every page and reads every static file into a MemorySite, a mapping of
+relative paths to contents, and fileserver.py serves it without a single
+file system call per request. Everything a response needs is computed once,
+when a file is added: its size, a strong ETag, the sha256 of its contents,
+and its Last-Modified date, the time the site was built.
+
+A MemorySite has the add_bytes and add_file methods of a SiteArchive (see
+archive.py), so the build that writes an archive fills it the same way.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from email.utils import formatdate
+from typing import Dict, Iterator, Optional
+
+
+class MemoryFile:
+    """A file of a site held in memory. It has the attributes of a
+    CachedFile, so fileserver.py answers a request for it the same way.
+
+    Attributes
+    ----------
+    data : bytes
+        The content of the file.
+
+    size : int
+        The size of the file in bytes.
+
+    etag : str
+        A strong validator of the file, the sha256 of its content.
+
+    last_modified : str
+        The modification time of the file, as an HTTP date.
+
+    mtime : float
+        The modification time of the file, in seconds.
+    """
+
+    __slots__ = ("data", "size", "etag", "last_modified", "mtime")
+
+    def __init__(self, data: bytes, mtime: float, last_modified: str):
+        self.data = data
+        self.size = len(data)
+        self.etag = f'"{hashlib.sha256(data).hexdigest()}"'
+        self.mtime = mtime
+        self.last_modified = last_modified
+
+
+class MemorySite:
+    """The files of a site, by relative path with "/" as separator whatever
+    the platform. Files are added while the site is built and only read
+    afterwards, from any number of threads.
+
+    Attributes
+    ----------
+    mtime : float
+        When the site was built, the modification time of every file.
+
+    entries : int
+        How many files were added.
+
+    size : int
+        The bytes of all the files.
+
+    hits, misses : int
+        How many requests found a file, and how many did not.
+
+    hit_bytes : int
+        How many bytes were served.
+
+    Methods
+    -------
+    add_bytes(name, data)
+        adds a file holding data, replacing any file of the same name
+
+    add_file(name, source_path)
+        adds a copy of a file and gives its size
+
+    get(name)
+        gives a file, or None if the site has no such file
+
+    is_directory(name)
+        tells whether some file is under a directory
+
+    count(hit, sent)
+        records a request and the bytes sent for it
+
+    stats()
+        gives every counter in a dictionary
+    """
+
+    def __init__(self, mtime: Optional[float] = None):
+        self.mtime = time.time() if mtime is None else mtime
+        self._last_modified = formatdate(self.mtime, usegmt=True)
+        self._files: Dict[str, MemoryFile] = {}
+        self._directories: set[str] = {""}
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.hit_bytes = 0
+
+    @property
+    def entries(self) -> int:
+        return len(self._files)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._files)
+
+    def add_bytes(self, name: str, data: bytes):
+        name = name.replace(os.sep, "/")
+        replaced = self._files.get(name)
+        if replaced is not None:
+            self.size -= replaced.size
+        self._files[name] = MemoryFile(data, self.mtime, self._last_modified)
+        self.size += len(data)
+        directory = name.rpartition("/")[0]
+        while directory not in self._directories:
+            self._directories.add(directory)
+            directory = directory.rpartition("/")[0]
+
+    def add_file(self, name: str, source_path: str) -> int:
+        with open(source_path, "rb") as source:
+            data = source.read()
+        self.add_bytes(name, data)
+        return len(data)
+
+    def get(self, name: str) -> Optional[MemoryFile]:
+        return self._files.get(name)
+
+    def is_directory(self, name: str) -> bool:
+        return name in self._directories
+
+    def count(self, hit: bool, sent: int):
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.hit_bytes += sent
+            else:
+                self.misses += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "bytes": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_bytes": self.hit_bytes,
+            }
@@ -0,0 +1,250 @@
+""" Machine readable metrics of a build
+
+build_site and stream_site fill a BuildMetrics as they go: the duration of
+every stage, how many outputs were built and skipped, the bytes read from
+sources and written to the site, an estimate of the HTML elements of the
+written pages, the hits and misses of the caches and the peak memory of the
+process. Everything is counted from values the build already has at hand, so
+collecting metrics costs a few additions and a stat per output.
+
+Every build writes its metrics as JSON next to its stat cache, see
+metrics_path. write_metrics also writes them in the Prometheus text
+exposition format, for the textfile collector of node_exporter:
+
+    {"version": 1, "timestamp": 1700000000.0, "duration_seconds": 1.2,
+     "stages": {"plan": 0.1, ...}, "counts": {"pages_built": 10, ...},
+     "caches": {"pages": {"hits": 0, "misses": 10, "hit_ratio": 0.0}, ...},
+     "peak_memory_bytes": 41943040}
+
+Constants
+---------
+
+METRICS_VERSION : int
+    The version of the JSON format.
+
+PROMETHEUS_PREFIX : str
+    The prefix of the name of every Prometheus metric.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+METRICS_VERSION = 1
+PROMETHEUS_PREFIX = "ssg_build"
+
+_count_descriptions = {
+    "pages_built": "Pages and section indexes written by the last build.",
+    "indexes_built": "Section indexes written by the last build.",
+    "outputs_skipped": "Outputs the last build found up to date.",
+    "outputs_deleted": "Outputs of removed sources deleted by the last build.",
+    "files_copied": "Static files copied by the last build.",
+    "bytes_read": "Bytes of the sources read by the last build.",
+    "bytes_written": "Bytes written to the site by the last build.",
+    "html_elements": "Approximate HTML elements of the pages written by the "
+    "last build, counted from their tags.",
+}
+
+
+def metrics_path(stat_cache_path: str) -> str:
+    """gives the metrics file written next to a stat cache"""
+    return os.path.splitext(stat_cache_path)[0] + ".metrics.json"
+
+
+def html_elements(html: str) -> int:
+    """gives an approximate number of HTML elements of a page: the '<' that
+    do not open a closing tag, a comment or a doctype. The text and
+    attributes of markdown are escaped, but the text of templates is not, so
+    a '<' in an inline script, or in a conditional comment, is miscounted"""
+    return html.count("<") - html.count("</") - html.count("<!")
+
+
+def peak_memory() -> int:
+    """gives the peak resident memory of the process in bytes, or 0 where it
+    is not known"""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux gives kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class BuildMetrics:
+    """The metrics of one build. Counts may be added to from several threads.
+
+    Attributes
+    ----------
+    timestamp : float
+        When the build started, in seconds since the epoch.
+
+    duration : float
+        How long the build took in seconds, once finish() was called.
+
+    stages : dict of str to float
+        The time spent in every stage of the build, in seconds.
+
+    counts : dict of str to int
+        Outputs built and skipped, bytes read and written, and HTML elements.
+
+    caches : dict of str to tuple of int and int
+        The hits and misses of every cache during the build.
+
+    peak_memory : int
+        The peak resident memory of the process in bytes. It covers the
+        whole life of the process, earlier builds included.
+
+    Methods
+    -------
+    stage(name)
+        a context manager adding the time spent in it to a stage
+
+    add(name, amount=1)
+        adds to a count
+
+    add_page(source, dest, html)
+        counts a page written to dest from the source file, if any
+
+    cache(name, hits, misses)
+        records the hits and misses of a cache
+
+    finish()
+        records the duration of the build and the peak memory
+
+    to_dict()
+        gives the JSON value of the metrics
+
+    to_prometheus()
+        gives the metrics in the Prometheus text exposition format
+    """
+
+    def __init__(self):
+        self.timestamp = time.time()
+        self.duration = 0.0
+        self.stages: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self.caches: Dict[str, Tuple[int, int]] = {}
+        self.peak_memory = 0
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def add(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+    def add_page(self, source: str, dest: str, html: str):
+        self.add("pages_built")
+        if source:
+            self.add("bytes_read", os.path.getsize(source))
+        self.add("bytes_written", os.path.getsize(dest))
+        self.add("html_elements", html_elements(html))
+
+    def cache(self, name: str, hits: int, misses: int):
+        self.caches[name] = (hits, misses)
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._started
+        self.peak_memory = peak_memory()
+
+    def to_dict(self) -> Dict[str, Any]:
+        caches = {}
+        for name, (hits, misses) in sorted(self.caches.items()):
+            total = hits + misses
+            caches[name] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": round(hits / total, 4) if total else 0.0,
+            }
+        return {
+            "version": METRICS_VERSION,
+            "timestamp": round(self.timestamp, 3),
+            "duration_seconds": round(self.duration, 6),
+            "stages": {name: round(value, 6) for name, value in self.stages.items()},
+            "counts": dict(sorted(self.counts.items())),
+            "caches": caches,
+            "peak_memory_bytes": self.peak_memory,
+        }
+
+    def to_prometheus(self) -> str:
+        values = self.to_dict()
+        lines: List[str] = []
+
+        def gauge(name: str, description: str, samples: List[Tuple[str, Any]]):
+            name = f"{PROMETHEUS_PREFIX}_{name}"
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                lines.append(f"{name}{labels} {value}")
+
+        gauge(
+            "timestamp_seconds",
+            "When the last build started.",
+            [("", values["timestamp"])],
+        )
+        gauge(
+            "duration_seconds",
+            "How long the last build took.",
+            [("", values["duration_seconds"])],
+        )
+        gauge(
+            "stage_duration_seconds",
+            "How long every stage of the last build took.",
+            [
+                (f'{{stage="{name}"}}', value)
+                for name, value in values["stages"].items()
+            ],
+        )
+        for name, value in values["counts"].items():
+            description = _count_descriptions.get(name, name.replace("_", " "))
+            gauge(name, description, [("", value)])
+        for key, description in [
+            ("hits", "Cache hits during the last build."),
+            ("misses", "Cache misses during the last build."),
+            ("hit_ratio", "The share of cache lookups that hit."),
+        ]:
+            gauge(
+                f"cache_{key}",
+                description,
+                [
+                    (f'{{cache="{name}"}}', cache[key])
+                    for name, cache in values["caches"].items()
+                ],
+            )
+        gauge(
+            "peak_memory_bytes",
+            "The peak resident memory of the build process.",
+            [("", values["peak_memory_bytes"])],
+        )
+        return "\n".join(lines) + "\n"
+
+
+def write_metrics(metrics: BuildMetrics, path: str):
+    """writes metrics atomically, so that a collector never reads a partial
+    file. A path ending in .prom gets the Prometheus text exposition format,
+    any other one JSON"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if path.endswith(".prom"):
+        content = metrics.to_prometheus()
+    else:
+        content = json.dumps(metrics.to_dict(), indent=2) + "\n"
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as handle:
+        handle.write(content)
+    os.replace(temporary, path)
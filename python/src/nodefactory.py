@@ -0,0 +1,174 @@
+""" Hash consing of HTML nodes
+
+A NodeFactory keeps a single instance of every distinct LeafNode and ParentNode
+it is asked for. Interned nodes are immutable, so structurally identical
+subtrees of one or many documents can share the same objects, and each interned
+node serializes itself once and keeps the resulting HTML.
+"""
+
+from types import MappingProxyType
+from typing import Dict, Hashable, Mapping, Optional, Sequence, Tuple
+
+from htmlnode import HTMLNode, LeafNode, ParentNode
+
+
+def _props_key(props: Optional[Mapping[str, str]]) -> Optional[Tuple]:
+    if props is None:
+        return None
+    return tuple(props.items())
+
+
+def _frozen_props(props: Optional[Mapping[str, str]]):
+    if props is None:
+        return None
+    return MappingProxyType(dict(props))
+
+
+class _Interned:
+    def __setattr__(self, name, value):
+        if "_html" in self.__dict__:
+            raise AttributeError("Interned nodes are immutable")
+        object.__setattr__(self, name, value)
+
+    def to_html(self) -> str:
+        html = self._html
+        if html is None:
+            html = super().to_html()  # type: ignore[misc]
+            object.__setattr__(self, "_html", html)
+        return html
+
+
+class InternedLeafNode(_Interned, LeafNode):
+    """An immutable LeafNode created by a NodeFactory. Its HTML is computed on
+    the first call of to_html and reused afterwards."""
+
+    def __init__(
+        self,
+        tag: Optional[str] = None,
+        value: Optional[str] = None,
+        props: Optional[Mapping[str, str]] = None,
+    ):
+        super().__init__(tag=tag, value=value, props=_frozen_props(props))
+        object.__setattr__(self, "_html", None)
+
+
+class InternedParentNode(_Interned, ParentNode):
+    """An immutable ParentNode created by a NodeFactory. Its children are
+    interned nodes and its HTML is computed on the first call of to_html and
+    reused afterwards."""
+
+    def __init__(
+        self,
+        tag: Optional[str] = None,
+        children: Optional[Sequence[HTMLNode]] = None,
+        props: Optional[Mapping[str, str]] = None,
+    ):
+        super().__init__(
+            tag=tag,
+            children=tuple(children) if children is not None else None,
+            props=_frozen_props(props),
+        )
+        object.__setattr__(self, "_html", None)
+
+
+class NodeFactory:
+    """Creates interned HTML nodes. Asking twice for nodes with the same
+    structure gives the same instance.
+
+    Attributes
+    ----------
+    hits : int
+        How many requested nodes already existed.
+
+    misses : int
+        How many requested nodes had to be created.
+
+    Methods
+    -------
+    leaf(tag, value, props)
+        gives the interned leaf node with the given contents
+
+    parent(tag, children, props)
+        gives the interned parent node with the given contents
+
+    intern(node)
+        gives the interned equivalent of a tree of HTML nodes
+
+    clear()
+        forgets every interned node
+    """
+
+    def __init__(self):
+        self._nodes: Dict[Hashable, HTMLNode] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def leaf(
+        self,
+        tag: Optional[str] = None,
+        value: Optional[str] = None,
+        props: Optional[Mapping[str, str]] = None,
+    ) -> LeafNode:
+        key = ("leaf", tag, value, _props_key(props))
+        node = self._nodes.get(key)
+        if node is None:
+            self.misses += 1
+            node = InternedLeafNode(tag, value, props)
+            self._nodes[key] = node
+        else:
+            self.hits += 1
+        return node  # type: ignore[return-value]
+
+    def parent(
+        self,
+        tag: Optional[str] = None,
+        children: Optional[Sequence[HTMLNode]] = None,
+        props: Optional[Mapping[str, str]] = None,
+    ) -> ParentNode:
+        if children is not None:
+            children = [
+                child if isinstance(child, _Interned) else self.intern(child)
+                for child in children
+            ]
+        children_key = None if children is None else tuple(map(id, children))
+        key = ("parent", tag, children_key, _props_key(props))
+        node = self._nodes.get(key)
+        if node is None:
+            self.misses += 1
+            node = InternedParentNode(tag, children, props)
+            self._nodes[key] = node
+        else:
+            self.hits += 1
+        return node  # type: ignore[return-value]
+
+    def intern(self, node: HTMLNode) -> HTMLNode:
+        """gives the interned equivalent of a tree of HTML nodes
+
+        Parameters
+        ----------
+        node : HTMLNode
+            The root of a tree made of LeafNode and ParentNode instances
+
+        Returns
+        -------
+        interned : HTMLNode
+            An interned node equal to the given node
+
+        Raises
+        ------
+        TypeError
+            if the tree has nodes other than LeafNode and ParentNode
+        """
+        if isinstance(node, LeafNode):
+            return self.leaf(node.tag, node.value, node.props)
+        if isinstance(node, ParentNode):
+            return self.parent(node.tag, node.children, node.props)
+        raise TypeError(f"Can not intern {type(node).__name__}")
+
+    def clear(self):
+        self._nodes.clear()
+        self.hits = 0
+        self.misses = 0
@@ -1,6 +1,18 @@
 import os
-import pathlib
-from block_md import markdown_to_blocks, markdown_to_html_node
+from typing import Callable, Dict, Iterable, Optional, Tuple, TypeAlias
+from block_md import markdown_to_blocks
+from discovery import DEFAULT_EXCLUDE, DEFAULT_INCLUDE, discover_pages
+from frontmatter import split_front_matter
+from htmlnode import escape_attribute
+from parallel_md import markdown_to_html
+from template import Template, default_partials_dir, load_template
+from toc import TableOfContents
+
+Document: TypeAlias = Tuple[Dict[str, str], str, str, str]
+""" Document : TypeAlias = Tuple[Dict[str, str], str, str, str]
+    A converted markdown page: its front matter, its title, its HTML and the
+    HTML of its table of contents.
+"""
 
 
 def extract_title(markdown: str) -> str:
@@ -10,44 +22,177 @@ def extract_title(markdown: str) -> str:
     return first_block[2:]
 
 
-def generate_page(from_path: str, template_path: str, dest_path: str):
-    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+def _file_key(path: str) -> Tuple[int, int, int]:
+    stat = os.stat(path)
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+_TemplateKeys: TypeAlias = Tuple[Tuple[int, int, int], ...]
+
+
+def _template_keys(path: str, template: Template) -> _TemplateKeys:
+    return tuple(_file_key(file) for file in (path, *template.dependencies))
+
+
+class PageCache:
+    """Keeps templates and converted markdown between builds that run in the
+    same process. Entries are keyed by the (inode, size, mtime_ns) of their
+    file, so a changed file is read again, and an unchanged one costs a single
+    stat.
+
+    Methods
+    -------
+    template(path, partials_dir=None)
+        gives a compiled template file, see load_template. It is compiled
+        again if the file or any partial it includes changed
+
+    document(path)
+        gives the metadata, title, HTML content and table of contents of a
+        markdown file
+    """
+
+    def __init__(self):
+        self._templates: Dict[
+            Tuple[str, Optional[str]], Tuple[_TemplateKeys, Template]
+        ] = {}
+        self._documents: Dict[str, Tuple[Tuple[int, int, int], Document]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def template(self, path: str, partials_dir: Optional[str] = None) -> Template:
+        cached = self._templates.get((path, partials_dir))
+        if cached is not None:
+            try:
+                keys = _template_keys(path, cached[1])
+            except FileNotFoundError:
+                keys = None
+            if cached[0] == keys:
+                self.hits += 1
+                return cached[1]
+        self.misses += 1
+        template = load_template(path, partials_dir)
+        self._templates[(path, partials_dir)] = (
+            _template_keys(path, template),
+            template,
+        )
+        return template
+
+    def document(self, path: str) -> Document:
+        key = _file_key(path)
+        cached = self._documents.get(path)
+        if cached is not None and cached[0] == key:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        with open(path, "r") as handle:
+            document = convert_markdown(handle.read())
+        self._documents[path] = (key, document)
+        return document
+
+
+def convert_markdown(markdown: str) -> Document:
+    """converts the markdown of a page into its metadata, title, HTML and
+    table of contents, in a single pass over its blocks
+
+    Parameters
+    ----------
+    markdown : str
+        A string representing the markdown of a page, with or without front
+        matter
+
+    Returns
+    -------
+    metadata, title, html, toc : tuple of dict of str to str, str, str and str
+        the front matter, the title, the HTML content and the HTML of the
+        table of contents of the page. The table of contents is empty if the
+        page has no headings
+
+    Raises
+    ------
+    ValueError
+        if the page has no title
+    """
+    metadata, from_contents = split_front_matter(markdown)
+    title = metadata.get("title") or extract_title(from_contents)
+    toc = TableOfContents()
+    html = markdown_to_html(from_contents, toc=toc)
+    return metadata, title, html, toc.to_html()
+
+
+def render_page(
+    document: Document,
+    template: Template,
+    navigation: Optional[Dict[str, str]] = None,
+) -> str:
+    """fills a compiled template with a converted page, and the navigation
+    values of the page if given. Navigation values are HTML and are not
+    escaped. The title and front matter values are escaped for a double
+    quoted attribute, where a template may place them as well as in text"""
+    metadata, title, html, toc = document
+    context = {key: escape_attribute(value) for key, value in metadata.items()}
+    if navigation is not None:
+        context.update(navigation)
+    context["Title"] = escape_attribute(title)
+    context["Content"] = html
+    context["TOC"] = toc
+    return template.render(context)
+
+
+def generate_page(
+    from_path: str,
+    template_path: str,
+    dest_path: str,
+    cache: Optional[PageCache] = None,
+    log: Callable[[str], None] = print,
+    navigation: Optional[Dict[str, str]] = None,
+    partials_dir: Optional[str] = None,
+) -> str:
+    """renders a markdown file with a template file into dest_path, and gives
+    the page. The partials of the template are read from partials_dir, see
+    load_template"""
+    log(f"Generating page from {from_path} to {dest_path} using {template_path}")
     if not os.path.exists(from_path):
         raise FileNotFoundError(f"{from_path} does not exist")
     if not os.path.exists(template_path):
         raise FileNotFoundError(f"{template_path} does not exist")
 
-    template_handle = open(template_path, "r")
-    template = template_handle.read()
-    template_handle.close()
+    if cache is None:
+        cache = PageCache()
+    template = cache.template(template_path, partials_dir)
+    page = render_page(cache.document(from_path), template, navigation)
+    write_page(dest_path, page)
+    return page
 
-    from_handle = open(from_path, "r")
-    content = from_handle.read()
-    title = extract_title(content)
-    from_contents = content
-    from_handle.close()
-
-    template = template.replace("{{ Title }}", title)
-    template = template.replace(
-        "{{ Content }}", markdown_to_html_node(from_contents).to_html()
-    )
 
+def write_page(dest_path: str, page: str):
+    """writes a rendered page, creating its directory if needed"""
     if not os.path.exists(os.path.dirname(dest_path)):
         os.makedirs(os.path.dirname(dest_path))
-    dest_handle = open(dest_path, "w")
-    dest_handle.write(template)
-
-
-def generate_pages_recursive(content_dir: str, template_path: str, dest_dir: str):
-    content_base = pathlib.Path(content_dir)
-    dest_base = pathlib.Path(dest_dir)
-    for file in os.listdir(content_dir):
-        prev_path = pathlib.Path(content_base, file)
-        if os.path.isfile(prev_path):
-            new_path = dest_base / (file.removesuffix(".md") + ".html")
-            generate_page(str(prev_path), template_path, str(new_path))
-        else:
-            generate_pages_recursive(
-                str(content_base / file), template_path, str(dest_base / file)
-            )
-    return
+    with open(dest_path, "w") as dest_handle:
+        dest_handle.write(page)
+
+
+def generate_pages_recursive(
+    content_dir: str,
+    template_path: str,
+    dest_dir: str,
+    cache: Optional[PageCache] = None,
+    log: Callable[[str], None] = print,
+    include: Iterable[str] = DEFAULT_INCLUDE,
+    exclude: Iterable[str] = DEFAULT_EXCLUDE,
+):
+    """generates a page for every markdown file found by discover_pages.
+    Pages are rendered with the layout of their directory, or with the
+    template if there is none. Layouts use the partials of the template"""
+    if cache is None:
+        cache = PageCache()
+    partials_dir = default_partials_dir(template_path)
+    for job in discover_pages(content_dir, include, exclude):
+        generate_page(
+            job.source,
+            job.layout or template_path,
+            job.dest(dest_dir),
+            cache,
+            log,
+            partials_dir=partials_dir,
+        )
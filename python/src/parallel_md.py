@@ -0,0 +1,153 @@
+""" Conversion of huge markdown documents in parallel
+
+A pool over pages does not help a page that is one huge document, since its
+time is spent in a single conversion. From PARALLEL_THRESHOLD characters,
+the blocks of a document are split into chunks of about CHUNK_SIZE
+characters, which worker processes convert to HTML, and the HTML of the
+blocks is joined in order.
+
+Headings are converted in the calling process, in document order, because
+the id of a heading depends on every heading before it. The HTML of any
+other block only depends on the block, so the result is the same as the HTML
+of markdown_to_html_node.
+
+Workers are started by the first parallel conversion and kept for the
+following ones, in a pool for every number of workers asked for. They are
+started from a fork server, or spawned where there is none, and never forked
+from the calling process: conversions run from the render threads of a
+streaming build, and a process forked while other threads hold locks would
+inherit them locked. Workers import the modules afresh, so they only know
+the block types registered when modules are imported, and they would read
+the disk cache directory of highlight.py from the environment: they are
+given the one of the calling process instead, and a pool is kept for every
+cache directory as well.
+
+Constants
+---------
+
+PARALLEL_THRESHOLD : int
+    The size in characters from which a document is converted in parallel,
+    four chunks. Sending a chunk to a worker and its HTML back adds 10 to
+    20% to its conversion, so a document of a single chunk is only slower.
+    Run python src/bench.py parallel to compare both paths on a machine.
+
+CHUNK_SIZE : int
+    The size in characters of the blocks sent to a worker at once.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import highlight
+from block_md import (
+    block_to_htmlnode,
+    block_type_heading,
+    default_block_classifier,
+    heading_block_to_htmlnode,
+    markdown_to_blocks,
+    markdown_to_html_node,
+)
+from htmlnode import HTMLNode
+from toc import TableOfContents
+
+PARALLEL_THRESHOLD = 256 * 1024
+CHUNK_SIZE = 64 * 1024
+
+_executors: Dict[Tuple[int, Optional[str]], ProcessPoolExecutor] = {}
+_executor_lock = threading.Lock()
+
+
+def default_workers() -> int:
+    """gives the number of worker processes used when none is given"""
+    return os.cpu_count() or 1
+
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    # A pool is never shut down here, another thread may be submitting to it
+    cache_dir = highlight.cache_dir()
+    if cache_dir is not None:
+        # Workers may not share the working directory of the caller
+        cache_dir = os.path.abspath(cache_dir)
+    with _executor_lock:
+        executor = _executors.get((workers, cache_dir))
+        if executor is None:
+            methods = multiprocessing.get_all_start_methods()
+            method = "forkserver" if "forkserver" in methods else "spawn"
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context(method),
+                initializer=highlight.set_cache_dir,
+                initargs=(cache_dir,),
+            )
+            _executors[workers, cache_dir] = executor
+        return executor
+
+
+def _block_html(node: HTMLNode) -> str:
+    # A block without children is left out, as ParentNode.to_html does
+    if node.children is not None and len(node.children) == 0:
+        return ""
+    return node.to_html()
+
+
+def _convert_blocks(blocks: List[str]) -> List[str]:
+    return [_block_html(block_to_htmlnode(block)) for block in blocks]
+
+
+def markdown_to_html(
+    markdown: str,
+    toc: Optional[TableOfContents] = None,
+    workers: Optional[int] = None,
+) -> str:
+    """converts a markdown text into the HTML of markdown_to_html_node, in
+    worker processes if the text is large enough
+
+    Parameters
+    ----------
+    markdown : str
+        A string representing a markdown text
+
+    toc : TableOfContents, optional
+        Receives the headings of the text, as in markdown_to_html_node
+
+    workers : int, optional
+        The number of worker processes. Defaults to default_workers(). With
+        a single one the text is converted in the calling process
+
+    Returns
+    -------
+    html : str
+        the HTML of the markdown text
+    """
+    if toc is None:
+        toc = TableOfContents()
+    workers = workers or default_workers()
+    if workers < 2 or len(markdown) < PARALLEL_THRESHOLD:
+        return markdown_to_html_node(markdown, toc=toc).to_html()
+
+    executor = _get_executor(workers)
+    blocks = markdown_to_blocks(markdown)
+    pieces = [""] * len(blocks)
+    pending: List[Tuple[List[int], Future]] = []
+    indexes: List[int] = []
+    chunk: List[str] = []
+    size = 0
+    for index, block in enumerate(blocks):
+        if default_block_classifier.classify(block) == block_type_heading:
+            pieces[index] = _block_html(heading_block_to_htmlnode(block.strip(), toc))
+            continue
+        indexes.append(index)
+        chunk.append(block)
+        size += len(block)
+        if size >= CHUNK_SIZE:
+            pending.append((indexes, executor.submit(_convert_blocks, chunk)))
+            indexes, chunk, size = [], [], 0
+    if chunk:
+        pending.append((indexes, executor.submit(_convert_blocks, chunk)))
+    for indexes, future in pending:
+        for index, html in zip(indexes, future.result()):
+            pieces[index] = html
+    return f"<div>{''.join(pieces)}</div>"
@@ -0,0 +1,588 @@
+""" Decides what a build has to do
+
+The planner compares the files of a site with the state they had at the end
+of the previous build, recorded in a SQLite stat cache. A file whose
+(inode, size, mtime_ns) did not change is not read at all. A file whose stat
+changed is hashed, and only counts as changed if its contents did. The result
+is a BuildPlan listing the outputs to create, to update and to delete.
+
+Only the reading, hashing and building of files scale with the number of
+changes. Planning still walks the whole site: every page, static file and
+template is stat'ed on every build, one system call each. Comparing the
+mtimes of directories first would not be enough, since a file written in
+place changes its own mtime and not the one of its directory.
+
+Templates are tracked like other sources. A change to the site template only
+changes the pages rendered with it, a change to a layout only the pages of the
+directories using it, and a change to a partial, which any of them may
+include, every page. A page whose layout is not the one it was built with,
+because a layout was added or removed above it, is changed too.
+
+Constants
+---------
+
+ActionKind : TypeAlias = Literal
+    Whether an output is a page generated from markdown ("page"), a copied
+    file ("static") or a generated section index ("index"). Templates
+    ("template"), layouts ("layout") and the navigation of the site ("site")
+    are only recorded in the stat cache, nothing is built from them.
+"""
+
+import hashlib
+import os
+import sqlite3
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    TypeAlias,
+)
+
+from discovery import DEFAULT_EXCLUDE, DEFAULT_INCLUDE, discover_pages
+from site_tree import SiteTree, read_title
+from template import default_partials_dir
+from tree import scan_tree
+
+ActionKind: TypeAlias = Literal[
+    "page", "static", "index", "template", "layout", "site"
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    source TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    dest TEXT NOT NULL,
+    inode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    layout TEXT NOT NULL DEFAULT ''
+)
+"""
+
+# Columns added after the first schema, with their definition
+_ADDED_COLUMNS = {
+    "title": "TEXT NOT NULL DEFAULT ''",
+    "layout": "TEXT NOT NULL DEFAULT ''",
+}
+
+StatKey: TypeAlias = Tuple[int, int, int]
+Row: TypeAlias = Tuple[str, str, StatKey, str, str, str]
+
+
+def default_stat_cache_path(dest_dir: str) -> str:
+    """gives the stat cache used for builds into dest_dir. Every destination
+    has its own cache"""
+    name = hashlib.sha1(os.path.abspath(dest_dir).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(
+        os.environ.get("SSG_CACHE_DIR", ".cache"), f"build-{name}.sqlite"
+    )
+
+
+def file_digest(path: str) -> str:
+    """gives the sha256 of the contents of a file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Action:
+    """An output of the build and the source it comes from.
+
+    Attributes
+    ----------
+    kind : ActionKind
+        Whether the output is a generated page or a copied file.
+
+    source : str
+        The path of the source file.
+
+    dest : str
+        The path of the output file.
+
+    stat_key : tuple of int
+        The (inode, size, mtime_ns) of the source when it was planned.
+
+    digest : str
+        The sha256 of the source when it was planned.
+
+    title : str
+        The title of a page, empty for other outputs.
+
+    layout : str
+        The layout a page or a generated index is rendered with. Empty for
+        the site template and for other outputs.
+    """
+
+    def __init__(
+        self,
+        kind: ActionKind,
+        source: str,
+        dest: str,
+        stat_key: StatKey,
+        digest: str,
+        title: str = "",
+        layout: str = "",
+    ):
+        self.kind: ActionKind = kind
+        self.source = source
+        self.dest = dest
+        self.stat_key = stat_key
+        self.digest = digest
+        self.title = title
+        self.layout = layout
+
+    def __repr__(self) -> str:
+        return f"Action({self.kind}, {self.source}, {self.dest})"
+
+
+class BuildPlan:
+    """The outputs a build has to create, update and delete.
+
+    Attributes
+    ----------
+    new : list of Action
+        Outputs whose source did not exist in the previous build.
+
+    changed : list of Action
+        Outputs whose source or template changed since the previous build.
+
+    deleted : list of str
+        Outputs whose source was removed since the previous build.
+
+    removed_sources : list of str
+        Sources recorded by the previous build that no longer exist.
+
+    full : bool
+        Whether every output is rebuilt from scratch, because there was no
+        previous build or its output directory is gone.
+
+    unchanged : int
+        How many outputs are up to date.
+
+    refreshed : list of Action
+        Sources whose stat changed but whose contents did not. Nothing is
+        built for them, only their stat is recorded again.
+
+    site : SiteTree, optional
+        The navigation graph of every page, unchanged ones included.
+
+    layouts : list of str
+        The layout files declared in the content directory.
+
+    Methods
+    -------
+    actions()
+        yields the new and changed outputs
+
+    describe()
+        yields a line for every output the build touches
+    """
+
+    def __init__(self):
+        self.new: List[Action] = []
+        self.changed: List[Action] = []
+        self.deleted: List[str] = []
+        self.removed_sources: List[str] = []
+        self.full = False
+        self.refreshed: List[Action] = []
+        self.unchanged = 0
+        self.site: Optional[SiteTree] = None
+        self.layouts: List[str] = []
+
+    def actions(self) -> Iterator[Action]:
+        yield from self.new
+        yield from self.changed
+
+    def describe(self) -> Iterator[str]:
+        if self.full:
+            yield "full build"
+        for action in self.new:
+            yield f"new: {action.dest}"
+        for action in self.changed:
+            yield f"changed: {action.dest}"
+        for dest in self.deleted:
+            yield f"deleted: {dest}"
+        yield (
+            f"{len(self.new)} new, {len(self.changed)} changed, "
+            f"{len(self.deleted)} deleted, {self.unchanged} unchanged"
+        )
+
+
+class StatCache:
+    """The state of every source file at the end of the previous build, kept
+    in a SQLite database. Use it as a context manager.
+
+    Methods
+    -------
+    lookup(source)
+        gives the recorded kind, dest, stat key, digest, title and layout of
+        a source
+
+    sources()
+        gives the recorded sources with their dest
+
+    record(actions)
+        records the state of the sources of some actions
+
+    forget(sources)
+        removes some sources from the cache
+
+    commit()
+        makes the recorded changes durable
+    """
+
+    def __init__(self, path: str):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(_SCHEMA)
+        columns = [
+            row[1] for row in self._connection.execute("PRAGMA table_info(files)")
+        ]
+        for column, definition in _ADDED_COLUMNS.items():
+            if column not in columns:
+                # Written before the column was added
+                self._connection.execute(
+                    f"ALTER TABLE files ADD COLUMN {column} {definition}"
+                )
+        self._rows: Dict[str, Row] = {
+            source: (kind, dest, (inode, size, mtime_ns), digest, title, layout)
+            for source, kind, dest, inode, size, mtime_ns, digest, title, layout in (
+                self._connection.execute(
+                    "SELECT source, kind, dest, inode, size, mtime_ns, digest, "
+                    "title, layout FROM files"
+                )
+            )
+        }
+
+    def __enter__(self) -> "StatCache":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def lookup(self, source: str) -> Optional[Row]:
+        return self._rows.get(source)
+
+    def sources(self) -> Dict[str, str]:
+        return {source: row[1] for source, row in self._rows.items()}
+
+    def record(self, actions: List[Action]):
+        rows = [
+            (a.source, a.kind, a.dest, *a.stat_key, a.digest, a.title, a.layout)
+            for a in actions
+        ]
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO files (source, kind, dest, inode, size, "
+            "mtime_ns, digest, title, layout) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        for action in actions:
+            self._rows[action.source] = (
+                action.kind,
+                action.dest,
+                action.stat_key,
+                action.digest,
+                action.title,
+                action.layout,
+            )
+
+    def forget(self, sources: List[str]):
+        self._connection.executemany(
+            "DELETE FROM files WHERE source = ?", [(source,) for source in sources]
+        )
+        for source in sources:
+            self._rows.pop(source, None)
+
+    def commit(self):
+        self._connection.commit()
+
+    def close(self):
+        self._connection.close()
+
+
+def _stat_key(stat: os.stat_result) -> StatKey:
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def plan_build(
+    content_dir: str,
+    template_path: str,
+    static_dir: str,
+    dest_dir: str,
+    stat_cache: StatCache,
+    include: Iterable[str] = DEFAULT_INCLUDE,
+    exclude: Iterable[str] = DEFAULT_EXCLUDE,
+) -> BuildPlan:
+    """compares the sources of a site with the stat cache. Every source is
+    stat'ed, only those whose stat changed are read
+
+    Parameters
+    ----------
+    content_dir : str
+        The directory holding the markdown pages
+
+    template_path : str
+        The template of the pages without a layout. If it changed, those
+        pages are changed. If any file of its partials directory changed,
+        every page is changed
+
+    static_dir : str
+        The directory whose files are copied as they are
+
+    dest_dir : str
+        The directory receiving the site. If it does not exist, or the stat
+        cache is empty, the plan is a full build where every output is new
+
+    stat_cache : StatCache
+        The state of the sources at the end of the previous build
+
+    include, exclude : iterable of str
+        The globs selecting the pages of the content directory. See
+        discover_pages
+
+    Returns
+    -------
+    plan : BuildPlan
+        the outputs to create, update and delete
+    """
+    if not os.path.exists(content_dir):
+        raise FileNotFoundError(f"{content_dir} does not exist")
+    if not os.path.exists(static_dir):
+        raise FileNotFoundError(f"Path {static_dir} does not exist")
+    if not os.path.exists(template_path):
+        raise FileNotFoundError(f"{template_path} does not exist")
+
+    plan = BuildPlan()
+    plan.full = rebuild_all = not os.path.isdir(dest_dir) or len(stat_cache) == 0
+    # Whether the template of every layout changed. The site template is the
+    # layout None
+    changed_templates: Dict[Optional[str], bool] = {
+        None: _plan_source(
+            plan,
+            stat_cache,
+            "template",
+            template_path,
+            "",
+            os.stat(template_path),
+            rebuild_all,
+        )
+    }
+    seen = {template_path}
+    # The partials are planned like the template. If any of them is new,
+    # changed or removed, every page is changed
+    partials_changed = False
+    partials_dir = default_partials_dir(template_path)
+    if os.path.isdir(partials_dir):
+        for _, entry in scan_tree(partials_dir):
+            seen.add(entry.path)
+            partials_changed |= _plan_source(
+                plan, stat_cache, "template", entry.path, "", entry.stat(), rebuild_all
+            )
+    site_source = f"site:{os.path.abspath(content_dir)}"
+    seen.add(site_source)
+    layouts: Dict[str, Optional[str]] = {}
+    jobs = list(discover_pages(content_dir, include, exclude, layouts=layouts))
+    plan.layouts = sorted({layout for layout in layouts.values() if layout})
+    for layout in plan.layouts:
+        seen.add(layout)
+        changed_templates[layout] = _plan_source(
+            plan, stat_cache, "layout", layout, "", os.stat(layout), rebuild_all
+        )
+    # A removed layout only changes the pages that used it, whose layout is
+    # now another one
+    for source in stat_cache.sources():
+        row = stat_cache.lookup(source)
+        if source not in seen and row is not None and row[0] == "template":
+            partials_changed = True
+    force = rebuild_all or partials_changed
+    pages = []
+    for job in jobs:
+        seen.add(job.source)
+        dest = job.dest(dest_dir)
+        _plan_source(
+            plan,
+            stat_cache,
+            "page",
+            job.source,
+            dest,
+            job.stat(),
+            force or changed_templates[job.layout],
+            job.layout or "",
+        )
+        pages.append((job.source, job.relative, dest, job.layout))
+    plan.site = _plan_site(
+        plan,
+        stat_cache,
+        SiteTree(content_dir, dest_dir, layouts),
+        pages,
+        site_source,
+        force,
+        changed_templates,
+    )
+    for index in plan.site.generated_indexes():
+        seen.add(index.source)
+    for relative, entry in scan_tree(static_dir):
+        seen.add(entry.path)
+        _plan_source(
+            plan,
+            stat_cache,
+            "static",
+            entry.path,
+            os.path.join(dest_dir, relative),
+            entry.stat(),
+            rebuild_all,
+        )
+    # A generated section index replaced by an index.md keeps its output
+    built = {action.dest for action in plan.actions()}
+    for source, dest in stat_cache.sources().items():
+        if source not in seen:
+            plan.removed_sources.append(source)
+            if dest != "" and dest not in built:
+                plan.deleted.append(dest)
+    plan.new.sort(key=lambda action: action.dest)
+    plan.changed.sort(key=lambda action: action.dest)
+    plan.deleted.sort()
+    return plan
+
+
+def _plan_site(
+    plan: BuildPlan,
+    stat_cache: StatCache,
+    site: SiteTree,
+    pages: List[Tuple[str, str, str, Optional[str]]],
+    site_source: str,
+    force: bool,
+    changed_templates: Dict[Optional[str], bool],
+) -> SiteTree:
+    """fills the site tree with the planned pages and adds its generated
+    section indexes to the plan. Titles are only read from the pages that
+    changed. If the navigation changed, every page is changed"""
+    planned = {
+        action.source: action
+        for action in [*plan.new, *plan.changed, *plan.refreshed]
+        if action.kind == "page"
+    }
+    for source, relative, dest, layout in pages:
+        recorded = stat_cache.lookup(source)
+        action = planned.get(source)
+        if recorded is not None and recorded[4] != "" and (
+            action is None or action.digest == recorded[3]
+        ):
+            title = recorded[4]
+        else:
+            title = read_title(source)
+        if action is not None:
+            action.title = title
+        site.add_page(source, relative, dest, title, layout)
+    site.finish()
+
+    signature = site.signature()
+    recorded = stat_cache.lookup(site_source)
+    if recorded is None or recorded[3] != signature:
+        # Recorded like a template, under a source that is not a file
+        site_action = Action("site", site_source, "", (0, 0, 0), signature)
+        plan.refreshed.append(site_action)
+        if not force:
+            _change_unchanged_pages(plan, stat_cache, pages)
+        force = True
+    for index in site.generated_indexes():
+        layout = index.layout or ""
+        action = Action(
+            "index", index.source, index.dest, (0, 0, 0), signature, "", layout
+        )
+        recorded = stat_cache.lookup(index.source)
+        if recorded is None:
+            plan.new.append(action)
+        elif (
+            force
+            or changed_templates[index.layout]
+            or recorded[1] != index.dest
+            or recorded[5] != layout
+        ):
+            plan.changed.append(action)
+        else:
+            plan.unchanged += 1
+    return site
+
+
+def _change_unchanged_pages(
+    plan: BuildPlan,
+    stat_cache: StatCache,
+    pages: List[Tuple[str, str, str, Optional[str]]],
+):
+    """moves every page that is not new nor changed to the changed pages"""
+    built = {action.source for action in plan.actions()}
+    refreshed = {
+        action.source: action for action in plan.refreshed if action.kind == "page"
+    }
+    for source, _, _, _ in pages:
+        if source in built:
+            continue
+        action = refreshed.pop(source, None)
+        if action is None:
+            _, dest, key, digest, title, layout = stat_cache.lookup(  # type: ignore
+                source
+            )
+            action = Action("page", source, dest, key, digest, title, layout)
+        plan.changed.append(action)
+        plan.unchanged -= 1
+    plan.refreshed = [
+        action
+        for action in plan.refreshed
+        if action.kind != "page" or action.source in refreshed
+    ]
+
+
+def _plan_source(
+    plan: BuildPlan,
+    stat_cache: StatCache,
+    kind: ActionKind,
+    path: str,
+    dest: str,
+    stat: os.stat_result,
+    force: bool,
+    layout: str = "",
+) -> bool:
+    """adds a source to the plan and tells whether it changed. Templates and
+    layouts are only recorded, nothing is built from them"""
+    key = _stat_key(stat)
+    recorded = stat_cache.lookup(path)
+    is_template = kind in ("template", "layout")
+    same_output = (
+        recorded is not None and recorded[1] == dest and recorded[5] == layout
+    )
+    if recorded is not None and recorded[2] == key and same_output:
+        if not force:
+            plan.unchanged += not is_template
+            return False
+        digest = recorded[3]
+    else:
+        digest = file_digest(path)
+    action = Action(kind, path, dest, key, digest, "", layout)
+    if is_template:
+        changed = recorded is None or recorded[3] != digest
+        if changed or recorded[2] != key:
+            plan.refreshed.append(action)
+        return changed
+    if recorded is None:
+        plan.new.append(action)
+    elif force or recorded[3] != digest or not same_output:
+        plan.changed.append(action)
+    else:
+        plan.refreshed.append(action)
+        plan.unchanged += 1
+        return False
+    return True
@@ -0,0 +1,63 @@
+""" A test case for the tests that build a site
+
+Every build test writes a small site into a temporary directory, builds it
+and reads the result back. SiteTestCase gives them that directory, which
+is also the cache directory (SSG_CACHE_DIR), so a test never touches the
+stat cache or the metrics of the repository.
+"""
+
+import os
+import tempfile
+import unittest
+from typing import Dict
+from unittest.mock import patch
+
+
+class SiteTestCase(unittest.TestCase):
+    """A test case working in a temporary directory, removed after the test.
+    Subclasses overriding setUp call it first.
+
+    Attributes
+    ----------
+    root : str
+        The temporary directory, also the cache directory.
+
+    Methods
+    -------
+    path(*parts)
+        gives the path of a file under the temporary directory
+
+    write(relative, content)
+        writes a text file under the temporary directory, creating its
+        parent directories
+
+    read_tree(directory)
+        gives the content of every file under a directory, by relative path
+        with "/" as separator
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        environ = patch.dict(os.environ, {"SSG_CACHE_DIR": self.root})
+        environ.start()
+        self.addCleanup(environ.stop)
+
+    def path(self, *parts: str) -> str:
+        return os.path.join(self.root, *parts)
+
+    def write(self, relative: str, content: str):
+        os.makedirs(os.path.dirname(self.path(relative)), exist_ok=True)
+        with open(self.path(relative), "w") as handle:
+            handle.write(content)
+
+    def read_tree(self, directory: str) -> Dict[str, bytes]:
+        files = {}
+        for root, _, names in os.walk(directory):
+            for name in names:
+                path = os.path.join(root, name)
+                relative = os.path.relpath(path, directory)
+                with open(path, "rb") as handle:
+                    files[relative.replace(os.sep, "/")] = handle.read()
+        return files
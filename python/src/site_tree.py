@@ -0,0 +1,373 @@
+""" The navigation graph of a site
+
+A SiteTree is built once, from the pages found by discovery, and holds every
+page and every section (directory) of the content with links between them.
+The navigation of a page, its breadcrumbs and its previous and next pages,
+is then a dictionary lookup instead of a walk over the content directory.
+A streaming build holds less: it adds the pages of one directory at a time
+and forgets every section the walk has left, see stream.py.
+
+Sections without an index.md get a generated index page listing their pages
+and subsections.
+
+Every navigation value is HTML, ready to be inserted in a template:
+
+Breadcrumbs
+    links to the sections above the page, ending with the page title
+
+Prev, Next
+    links to the previous and the next page of the same section, in
+    discovery order, or an empty string
+"""
+
+import hashlib
+import os
+from typing import Dict, Iterator, List, Optional
+
+from frontmatter import read_header
+from htmlnode import HTMLNode, LeafNode, ParentNode
+from page import Document, extract_title
+
+
+def read_title(path: str) -> str:
+    """gives the title of a markdown page: its front matter title, or else its
+    first heading, or else its file name. Only the front matter and the first
+    block of the body are read"""
+    with open(path, "r", encoding="utf-8") as handle:
+        metadata, body = read_header(handle, path)
+        if metadata.get("title"):
+            return metadata["title"]
+        # extract_title only looks at the first block
+        while "\n\n" not in body:
+            line = handle.readline()
+            if line == "":
+                break
+            body += line
+    try:
+        return extract_title(body)
+    except (ValueError, IndexError):
+        return os.path.splitext(os.path.basename(path))[0]
+
+
+def section_source(content_dir: str, relative: str) -> str:
+    """gives the source a generated section index is recorded under. It ends
+    with a separator, so it never names a markdown file"""
+    return os.path.join(content_dir, relative, "")
+
+
+def _url(relative_dest: str) -> str:
+    url = "/" + relative_dest.replace(os.sep, "/")
+    if url.endswith("/index.html"):
+        return url.removesuffix("index.html")
+    return url
+
+
+def _link(url: str, text: str, props: Optional[Dict[str, str]] = None) -> HTMLNode:
+    return LeafNode("a", text, {"href": url, **(props or {})})
+
+
+class SitePage:
+    """A page of the site.
+
+    Attributes
+    ----------
+    source : str
+        The markdown file of the page, or the section source of a generated
+        index.
+
+    dest : str
+        The path of the generated page.
+
+    url : str
+        The URL of the page, relative to the root of the site.
+
+    title : str
+        The title of the page.
+
+    section : Section
+        The section holding the page. The index of a section is held by it.
+
+    layout : str, optional
+        The layout the page is rendered with, or None for the site template.
+    """
+
+    __slots__ = (
+        "source",
+        "dest",
+        "url",
+        "title",
+        "section",
+        "layout",
+        "position",
+        "_navigation",
+    )
+
+    def __init__(
+        self,
+        source: str,
+        dest: str,
+        url: str,
+        title: str,
+        section,
+        layout: Optional[str] = None,
+    ):
+        self.source = source
+        self.dest = dest
+        self.url = url
+        self.title = title
+        self.section: Section = section
+        self.layout = layout
+        # The index of the page in section.pages, or -1 for an index
+        self.position = -1
+        self._navigation: Optional[Dict[str, str]] = None
+
+    def __repr__(self) -> str:
+        return f"SitePage({self.url}, {self.title})"
+
+
+class Section:
+    """A directory of the content.
+
+    Attributes
+    ----------
+    relative : str
+        The path of the directory relative to the content directory. The
+        root section has an empty path.
+
+    url : str
+        The URL of the index of the section.
+
+    parent : Section, optional
+        The section holding this one. None for the root section.
+
+    index : SitePage, optional
+        The index.md page of the section, or its generated index.
+
+    pages : list of SitePage
+        The other pages of the section, in discovery order.
+
+    sections : list of Section
+        The subsections, in discovery order.
+    """
+
+    def __init__(self, relative: str, parent: Optional["Section"]):
+        self.relative = relative
+        self.url = _url(os.path.join(relative, "index.html"))
+        self.parent = parent
+        self.index: Optional[SitePage] = None
+        self.pages: List[SitePage] = []
+        self.sections: List[Section] = []
+        self._breadcrumbs: Optional[List[HTMLNode]] = None
+
+    @property
+    def title(self) -> str:
+        if self.index is not None:
+            return self.index.title
+        if self.relative == "":
+            return "Home"
+        name = os.path.basename(self.relative)
+        return name.replace("-", " ").replace("_", " ").capitalize()
+
+    def breadcrumbs(self) -> List[HTMLNode]:
+        """gives the links to this section and every section above it. They
+        are computed once per section"""
+        if self._breadcrumbs is None:
+            above = [] if self.parent is None else self.parent.breadcrumbs()
+            separator = [LeafNode(None, " / ")] if above else []
+            self._breadcrumbs = [*above, *separator, _link(self.url, self.title)]
+        return self._breadcrumbs
+
+    def __repr__(self) -> str:
+        return f"Section({self.url})"
+
+
+class SiteTree:
+    """Every page and section of a site.
+
+    Attributes
+    ----------
+    layouts : dict of str to str or None
+        The layout of every directory, as given by discover_pages. Generated
+        indexes use the layout of their section.
+
+    Methods
+    -------
+    add_page(source, relative, dest, title, layout=None)
+        adds a page. Pages must be added in discovery order
+
+    finish()
+        generates the index of every section without one
+
+    finish_section(relative)
+        generates the index of a section if it has none, and gives it
+
+    forget_section(relative)
+        drops a section, its pages and its layout once they are rendered.
+        Its parent still lists it, by title and URL. Subsections are
+        forgotten first
+
+    page(source)
+        gives a page by its source
+
+    generated_indexes()
+        yields the generated section indexes
+
+    navigation(source)
+        gives the navigation values of a page
+
+    index_document(source)
+        gives the document of a generated section index
+
+    signature()
+        gives a digest of everything navigation depends on
+    """
+
+    def __init__(
+        self,
+        content_dir: str,
+        dest_dir: str,
+        layouts: Optional[Dict[str, Optional[str]]] = None,
+    ):
+        self.content_dir = content_dir
+        self.dest_dir = dest_dir
+        self.layouts = {} if layouts is None else layouts
+        self.root = Section("", None)
+        self._sections: Dict[str, Section] = {"": self.root}
+        self._pages: Dict[str, SitePage] = {}
+        self._generated: List[SitePage] = []
+
+    def _section(self, relative: str) -> Section:
+        section = self._sections.get(relative)
+        if section is None:
+            parent = self._section(os.path.dirname(relative))
+            section = Section(relative, parent)
+            parent.sections.append(section)
+            self._sections[relative] = section
+        return section
+
+    def add_page(
+        self,
+        source: str,
+        relative: str,
+        dest: str,
+        title: str,
+        layout: Optional[str] = None,
+    ):
+        section = self._section(os.path.dirname(relative))
+        url = _url(os.path.relpath(dest, self.dest_dir))
+        page = SitePage(source, dest, url, title, section, layout)
+        if os.path.basename(relative) == "index.md":
+            section.index = page
+        else:
+            page.position = len(section.pages)
+            section.pages.append(page)
+        self._pages[source] = page
+
+    def finish(self) -> "SiteTree":
+        for relative in self._sections:
+            index = self.finish_section(relative)
+            if index is not None:
+                self._generated.append(index)
+        self._generated.sort(key=lambda page: page.dest)
+        return self
+
+    def finish_section(self, relative: str) -> Optional[SitePage]:
+        section = self._sections[relative]
+        if section.index is not None:
+            return None
+        source = section_source(self.content_dir, relative)
+        dest = os.path.join(self.dest_dir, relative, "index.html")
+        index = SitePage(
+            source,
+            dest,
+            section.url,
+            section.title,
+            section,
+            self.layouts.get(relative),
+        )
+        section.index = index
+        self._pages[source] = index
+        return index
+
+    def forget_section(self, relative: str):
+        section = self._sections.pop(relative)
+        self.layouts.pop(relative, None)
+        for page in section.pages:
+            del self._pages[page.source]
+        if section.index is not None:
+            del self._pages[section.index.source]
+        # Subsections were forgotten before, their parent only listed them.
+        # A section and its index refer to each other, so the cycle is
+        # broken instead of being left to the garbage collector
+        for subsection in section.sections:
+            subsection.index = None
+        section.pages = []
+        section.sections = []
+        # Only the title and URL of the section are needed from now on
+        section._breadcrumbs = None
+        if section.index is not None:
+            section.index._navigation = None
+
+    def page(self, source: str) -> SitePage:
+        return self._pages[source]
+
+    def generated_indexes(self) -> Iterator[SitePage]:
+        yield from self._generated
+
+    def navigation(self, source: str) -> Dict[str, str]:
+        page = self._pages[source]
+        if page._navigation is None:
+            page._navigation = self._navigation(page)
+        return page._navigation
+
+    def _navigation(self, page: SitePage) -> Dict[str, str]:
+        section = page.section
+        if page is section.index:
+            crumbs = section.breadcrumbs()[:-1]
+            previous = following = None
+        else:
+            crumbs = [*section.breadcrumbs(), LeafNode(None, " / ")]
+            position = page.position
+            previous = section.pages[position - 1] if position > 0 else None
+            following = (
+                section.pages[position + 1]
+                if position + 1 < len(section.pages)
+                else None
+            )
+        crumbs = [*crumbs, LeafNode("span", page.title)]
+        breadcrumbs = ParentNode("nav", crumbs, {"class": "breadcrumbs"})
+        return {
+            "Breadcrumbs": breadcrumbs.to_html(),
+            "Prev": _neighbour(previous, "prev"),
+            "Next": _neighbour(following, "next"),
+        }
+
+    def index_document(self, source: str) -> Document:
+        section = self._pages[source].section
+        items = [
+            ParentNode("li", [_link(page.url, page.title)]) for page in section.pages
+        ] + [
+            ParentNode("li", [_link(child.url, child.title)])
+            for child in section.sections
+        ]
+        content = ParentNode(
+            "div",
+            [
+                LeafNode("h1", section.title),
+                ParentNode("ul", items, {"class": "section-index"}),
+            ],
+        )
+        return {}, section.title, content.to_html(), ""
+
+    def signature(self) -> str:
+        digest = hashlib.sha256()
+        for source in sorted(self._pages):
+            page = self._pages[source]
+            digest.update(f"{source}\0{page.url}\0{page.title}\n".encode("utf-8"))
+        return digest.hexdigest()
+
+
+def _neighbour(page: Optional[SitePage], rel: str) -> str:
+    if page is None:
+        return ""
+    return _link(page.url, page.title, {"rel": rel}).to_html()
@@ -0,0 +1,231 @@
+""" Crash safe builds: a staging directory, a journal and an atomic publish
+
+A build never writes into the published site. It writes into a staging
+directory, next to the destination, and records every finished output in a
+journal. Once the build is over, the staging directory becomes a new version
+of the site, and the destination, a symbolic link to the current version, is
+replaced by a link to the new one with a single rename. A reader of the
+destination sees either the previous site or the new one, never a mix.
+
+    public -> .public.builds/1718900000000000000
+    .public.builds/
+        1718900000000000000/    the published site
+        1718800000000000000/    the previous site, kept for in-flight readers
+        staging/                the site being built
+        staging.journal         the outputs finished in staging
+
+An incremental build starts from the published site: its files are hard
+linked into staging, and an output is unlinked before it is written, so the
+published files are never modified. If a build is killed, the next one finds
+the staging directory and its journal and only redoes the outputs that were
+not finished, provided the build context (templates and navigation) did not
+change in between.
+
+The first publish into a destination that is a plain directory moves the
+directory into the versions and replaces it with a link. That step is two
+renames, so it is the only moment a reader may find the destination missing.
+"""
+
+import json
+import os
+import shutil
+import time
+from typing import IO, Optional, Set, Tuple
+
+from tree import link_file_tree, remove_file
+
+_STAGING = "staging"
+
+
+def versions_dir(dest_dir: str) -> str:
+    """gives the directory holding the versions of a destination"""
+    parent, name = os.path.split(os.path.abspath(dest_dir))
+    return os.path.join(parent, f".{name}.builds")
+
+
+def published_dir(dest_dir: str) -> Optional[str]:
+    """gives the directory the destination currently shows, or None if
+    nothing was published"""
+    if not os.path.isdir(dest_dir):
+        return None
+    return os.path.realpath(dest_dir)
+
+
+class Staging:
+    """A staging directory and its journal. Use begin() to create one.
+
+    Attributes
+    ----------
+    dest_dir : str
+        The destination the staging directory is published to.
+
+    root : str
+        The staging directory.
+
+    resumed : int
+        How many finished outputs were found in the journal of an
+        interrupted build.
+
+    Methods
+    -------
+    path(dest)
+        gives the path in staging of an output of the destination
+
+    target(dest)
+        gives the path in staging of an output about to be written
+
+    is_done(dest, digest)
+        tells whether an interrupted build already finished an output
+
+    mark_done(dest, digest)
+        records a finished output in the journal
+
+    publish()
+        makes the staging directory the published site
+    """
+
+    def __init__(self, dest_dir: str):
+        self.dest_dir = os.path.abspath(dest_dir)
+        self.versions = versions_dir(dest_dir)
+        self.root = os.path.join(self.versions, _STAGING)
+        self.journal_path = os.path.join(self.versions, f"{_STAGING}.journal")
+        self._done: Set[Tuple[str, str]] = set()
+        self._journal: Optional[IO[str]] = None
+        self.resumed = 0
+
+    def _relative(self, dest: str) -> str:
+        return os.path.relpath(os.path.abspath(dest), self.dest_dir)
+
+    def path(self, dest: str) -> str:
+        return os.path.join(self.root, self._relative(dest))
+
+    def target(self, dest: str) -> str:
+        """the file in staging may be a hard link to a published file, so it
+        is removed first: writing through it would change the published site"""
+        path = self.path(dest)
+        if os.path.lexists(path):
+            os.remove(path)
+        return path
+
+    def is_done(self, dest: str, digest: str) -> bool:
+        return (self._relative(dest), digest) in self._done
+
+    def mark_done(self, dest: str, digest: str):
+        assert self._journal is not None
+        entry = {"done": self._relative(dest), "digest": digest}
+        self._journal.write(json.dumps(entry) + "\n")
+        self._journal.flush()
+
+    def remove(self, dest: str):
+        remove_file(self.path(dest), self.root)
+
+    def _resume(self, context: Optional[str]) -> bool:
+        """reads the journal of an interrupted build. It is only usable if it
+        was written for the same context"""
+        if context is None or not os.path.isdir(self.root):
+            return False
+        try:
+            with open(self.journal_path, "r") as journal:
+                header = json.loads(journal.readline())
+                if header.get("context") != context:
+                    return False
+                for line in journal:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # The last line of a killed build may be cut short
+                        break
+                    self._done.add((entry["done"], entry["digest"]))
+        except (OSError, ValueError):
+            return False
+        return True
+
+    def _start(self, context: Optional[str], seed: bool):
+        if os.path.exists(self.root):
+            shutil.rmtree(self.root)
+        self._done.clear()
+        published = published_dir(self.dest_dir)
+        if seed and published is not None:
+            link_file_tree(published, self.root)
+        else:
+            os.makedirs(self.root)
+        # The header is only written once staging is complete, so a build
+        # killed while seeding is not resumed
+        with open(self.journal_path, "w") as journal:
+            journal.write(json.dumps({"context": context}) + "\n")
+
+    def publish(self):
+        """renames the staging directory into a new version and points the
+        destination to it, then removes every version but the new one and
+        the previous one"""
+        if self._journal is not None:
+            os.fsync(self._journal.fileno())
+            self._journal.close()
+            self._journal = None
+        version = str(time.time_ns())
+        version_dir = os.path.join(self.versions, version)
+        os.rename(self.root, version_dir)
+        previous = None
+        if os.path.islink(self.dest_dir):
+            previous = os.path.basename(os.path.realpath(self.dest_dir))
+        elif os.path.exists(self.dest_dir):
+            previous = f"{version}-previous"
+            os.rename(self.dest_dir, os.path.join(self.versions, previous))
+        link = os.path.join(self.versions, f"{version}.link")
+        os.symlink(
+            os.path.relpath(version_dir, os.path.dirname(self.dest_dir)), link
+        )
+        os.replace(link, self.dest_dir)
+        os.remove(self.journal_path)
+        for name in os.listdir(self.versions):
+            if name not in (version, previous):
+                path = os.path.join(self.versions, name)
+                if os.path.isdir(path) and not os.path.islink(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+
+    def close(self):
+        """closes the journal without publishing, leaving the staging
+        directory for the next build to resume"""
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def __enter__(self) -> "Staging":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+def begin(dest_dir: str, context: Optional[str] = None, seed: bool = True) -> Staging:
+    """prepares the staging directory of a build
+
+    Parameters
+    ----------
+    dest_dir : str
+        The destination of the build
+
+    context : str, optional
+        A digest of everything the outputs depend on besides their own
+        source. The staging directory of an interrupted build is resumed if
+        it was built with the same context. None never resumes
+
+    seed : bool
+        If True, a new staging directory starts with the files of the
+        published site. Otherwise it starts empty
+
+    Returns
+    -------
+    staging : Staging
+        the staging directory, with its journal open
+    """
+    staging = Staging(dest_dir)
+    os.makedirs(staging.versions, exist_ok=True)
+    if staging._resume(context):
+        staging.resumed = len(staging._done)
+    else:
+        staging._start(context, seed)
+    staging._journal = open(staging.journal_path, "a")
+    return staging
@@ -0,0 +1,499 @@
+""" A build whose memory does not grow with the size of the site
+
+Discovery, conversion, rendering and writing are connected by generators and
+a bounded window of pending renders. Pages are discovered lazily, at most
+max_in_flight of them are read, converted or waiting to be written at any
+time, and nothing is kept once a page is written. The peak memory of a
+streaming build depends on its largest pages and on max_in_flight, not on how
+many pages the site has.
+
+Like other builds, a streaming build writes into a staging directory that is
+published once it is over. It is always a full build: it does not plan with,
+nor update, the stat cache, which would hold a row for every file of the
+site. The stat cache of the destination is removed, so the next incremental
+build is a full one. The metrics of the build are written in place of the
+stat cache, see metrics.py.
+
+Pages get the navigation values of build_site, and sections without an
+index.md get a generated index, from a site tree that never holds the whole
+site. Discovery walks the content depth first, the files of a directory
+before its subdirectories, so a streaming build reads the titles of one
+directory at a time and adds its pages to the tree before any of them is
+rendered. A section is finished, its index generated if it has none, and
+forgotten as soon as the walk leaves it. The tree holds the sections being
+walked, from the root down, with their pages and subsections: its size
+depends on the largest directories, not on the size of the site.
+
+archive_site streams a whole site into a tar or zip archive instead of a
+directory, see archive.py, and memory_site into a MemorySite that
+fileserver.py serves, see memsite.py. Both build the whole site tree first,
+as build_site does, so that the generated indexes come after the pages.
+"""
+
+import os
+from collections import deque
+from itertools import groupby
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+from archive import SiteArchive, open_archive
+from discovery import DEFAULT_EXCLUDE, DEFAULT_INCLUDE, discover_pages
+from memsite import MemorySite
+from metrics import BuildMetrics, html_elements, metrics_path, write_metrics
+from page import Document, convert_markdown, render_page
+from planner import default_stat_cache_path
+from site_tree import SiteTree, read_title
+from staging import begin
+from template import Template, default_partials_dir, load_template
+from tree import copy_file_tree, scan_tree
+
+Item = TypeVar("Item")
+Result = TypeVar("Result")
+
+
+def default_workers() -> int:
+    """gives the number of render threads used when none is given"""
+    return min(8, os.cpu_count() or 1)
+
+
+def bounded_map(
+    function: Callable[[Item], Result],
+    items: Iterable[Item],
+    workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+) -> Iterator[Result]:
+    """maps a function over items in a pool of threads, yielding the results
+    in the order of the items. Unlike Executor.map, items are only pulled
+    from the iterable as results are consumed, so at most max_in_flight
+    items and results exist at any time
+
+    Parameters
+    ----------
+    function : callable
+        The function to apply to every item
+
+    items : iterable
+        The items, read lazily
+
+    workers : int, optional
+        The number of threads. Defaults to default_workers()
+
+    max_in_flight : int, optional
+        How many items may be submitted and not yet yielded. Defaults to
+        twice the number of workers
+    """
+    workers = workers or default_workers()
+    max_in_flight = max(1, max_in_flight or 2 * workers)
+    pending: Deque[Future] = deque()
+    iterator = iter(items)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            for item in iterator:
+                pending.append(executor.submit(function, item))
+                if len(pending) >= max_in_flight:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _read_file(path: str) -> str:
+    with open(path, "r") as handle:
+        return handle.read()
+
+
+def render_pages(
+    pages: Iterable[
+        Union[
+            Tuple[str, str],
+            Tuple[str, str, Template],
+            Tuple[Union[str, Document], str, Template, Dict[str, str]],
+        ]
+    ],
+    template: Template,
+    read: Callable[[str], str] = _read_file,
+    workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+) -> Iterator[Tuple[str, str]]:
+    """converts and renders pages in a pool of threads
+
+    Parameters
+    ----------
+    pages : iterable of tuple of str and str, optionally with a Template
+        The source and destination of every page, read lazily, and the
+        template of the page if it is not template, optionally followed by
+        the navigation values of the page. The source of a generated page,
+        such as a section index, is its document
+
+    template : Template
+        The compiled template of the pages that do not come with one
+
+    read : callable
+        Gives the markdown of a source
+
+    workers, max_in_flight : int, optional
+        See bounded_map
+
+    Yields
+    ------
+    dest, html : tuple of str and str
+        the destination and the rendered HTML of every page, in order
+    """
+
+    def render(page: Tuple) -> Tuple[str, str]:
+        source, dest, *rest = page
+        page_template = rest[0] if rest else template
+        navigation = rest[1] if len(rest) > 1 else None
+        if isinstance(source, str):
+            document = convert_markdown(read(source))
+        else:
+            document = source
+        return dest, render_page(document, page_template, navigation)
+
+    return bounded_map(render, pages, workers, max_in_flight)
+
+
+def _check_sources(content_dir: str, static_dir: str):
+    if not os.path.exists(content_dir):
+        raise FileNotFoundError(f"{content_dir} does not exist")
+    if not os.path.exists(static_dir):
+        raise FileNotFoundError(f"Path {static_dir} does not exist")
+
+
+def _is_within(relative: str, section: str) -> bool:
+    return section == "" or relative == section or relative.startswith(
+        section + os.sep
+    )
+
+
+def _page_jobs(
+    content_dir: str,
+    template: Template,
+    partials_dir: str,
+    dest_dir: str,
+    include: Iterable[str],
+    exclude: Iterable[str],
+    metrics: BuildMetrics,
+) -> Iterator[Tuple[Union[str, Document], str, Template, Dict[str, str]]]:
+    """yields the source, destination, template and navigation of every
+    page, and of every generated section index, keeping only the sections
+    being walked in the site tree"""
+    layouts: Dict[str, Optional[str]] = {}
+    site = SiteTree(content_dir, dest_dir, layouts)
+    # Layouts are compiled as they are met, once each
+    templates: Dict[Optional[str], Template] = {None: template}
+
+    def compiled(layout: Optional[str]) -> Template:
+        if layout not in templates:
+            templates[layout] = load_template(layout, partials_dir)
+        return templates[layout]
+
+    def leave(section: str):
+        index = site.finish_section(section)
+        if index is not None:
+            metrics.add("indexes_built")
+            yield (
+                site.index_document(index.source),
+                index.dest,
+                compiled(index.layout),
+                site.navigation(index.source),
+            )
+        site.forget_section(section)
+
+    # The sections being walked, from the root down
+    walked = [""]
+    pages = discover_pages(content_dir, include, exclude, layouts=layouts)
+    for directory, group in groupby(pages, lambda job: os.path.dirname(job.relative)):
+        while not _is_within(directory, walked[-1]):
+            yield from leave(walked.pop())
+        # The whole directory is added first, for the title of its section
+        # and the next page of each page
+        jobs = list(group)
+        for job in jobs:
+            title = read_title(job.source)
+            dest = job.dest(dest_dir)
+            site.add_page(job.source, job.relative, dest, title, job.layout)
+        # The sections between the last one walked and the directory
+        entered = []
+        while directory != walked[-1]:
+            entered.append(directory)
+            directory = os.path.dirname(directory)
+        walked.extend(reversed(entered))
+        for job in jobs:
+            navigation = site.navigation(job.source)
+            yield job.source, job.dest(dest_dir), compiled(job.layout), navigation
+    while walked:
+        yield from leave(walked.pop())
+
+
+def _site_jobs(
+    content_dir: str,
+    template: Template,
+    partials_dir: str,
+    include: Iterable[str],
+    exclude: Iterable[str],
+) -> Tuple[SiteTree, List[Tuple[str, str, Template]], List[Tuple[str, str, Template]]]:
+    """discovers every page and builds the site tree, as build_site does.
+    Gives the tree, and the source, relative destination and template of
+    every page and of every generated section index"""
+    layouts: Dict[str, Optional[str]] = {}
+    jobs = list(discover_pages(content_dir, include, exclude, layouts=layouts))
+    # Layouts are compiled once each, the site template is the layout None
+    templates: Dict[Optional[str], Template] = {None: template}
+    for layout in layouts.values():
+        if layout not in templates:
+            templates[layout] = load_template(layout, partials_dir)
+
+    site = SiteTree(content_dir, os.curdir, layouts)
+    pages = []
+    for job in jobs:
+        dest = job.dest(os.curdir)
+        title = read_title(job.source)
+        site.add_page(job.source, job.relative, dest, title, job.layout)
+        pages.append((job.source, os.path.normpath(dest), templates[job.layout]))
+    site.finish()
+    indexes = [
+        (index.source, os.path.normpath(index.dest), templates[index.layout])
+        for index in site.generated_indexes()
+    ]
+    return site, pages, indexes
+
+
+def _metered_read(metrics: BuildMetrics) -> Callable[[str], str]:
+    def read(path: str) -> str:
+        markdown = _read_file(path)
+        metrics.add("bytes_read", os.path.getsize(path))
+        return markdown
+
+    return read
+
+
+def stream_site(
+    content_dir: str = "./content",
+    template_path: str = "./template.html",
+    static_dir: str = "./static",
+    dest_dir: str = "./public",
+    log: Callable[[str], None] = print,
+    include: Iterable[str] = DEFAULT_INCLUDE,
+    exclude: Iterable[str] = DEFAULT_EXCLUDE,
+    workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    metrics: Optional[BuildMetrics] = None,
+) -> int:
+    """builds a whole site into dest_dir with bounded memory. The arguments
+    are the ones of build_site, plus the ones of bounded_map
+
+    Returns
+    -------
+    pages : int
+        the number of pages generated, section indexes included
+    """
+    _check_sources(content_dir, static_dir)
+    template = load_template(template_path)
+    if metrics is None:
+        metrics = BuildMetrics()
+    pages = _page_jobs(
+        content_dir,
+        template,
+        default_partials_dir(template_path),
+        dest_dir,
+        include,
+        exclude,
+        metrics,
+    )
+
+    stat_cache_path = default_stat_cache_path(dest_dir)
+    if os.path.exists(stat_cache_path):
+        os.remove(stat_cache_path)
+
+    count = 0
+    with begin(dest_dir, seed=False) as staging:
+        with metrics.stage("copy"):
+            copied = copy_file_tree(static_dir, staging.root)
+        metrics.add("bytes_read", copied)
+        metrics.add("bytes_written", copied)
+        with metrics.stage("pages"):
+            rendered = render_pages(
+                pages, template, _metered_read(metrics), workers, max_in_flight
+            )
+            for dest, html in rendered:
+                log(f"Generating page {dest}")
+                target = staging.path(dest)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(target, "w") as handle:
+                    handle.write(html)
+                metrics.add_page("", target, html)
+                count += 1
+        with metrics.stage("publish"):
+            staging.publish()
+    metrics.finish()
+    write_metrics(metrics, metrics_path(stat_cache_path))
+    return count
+
+
+def _add_site(
+    target: Union[SiteArchive, MemorySite],
+    content_dir: str,
+    template_path: str,
+    static_dir: str,
+    log: Callable[[str], None],
+    include: Iterable[str],
+    exclude: Iterable[str],
+    workers: Optional[int],
+    max_in_flight: Optional[int],
+    metrics: BuildMetrics,
+) -> int:
+    """adds the pages and the generated section indexes, then the static
+    files a page does not replace, to an archive or a memory site, and gives
+    the number of pages. Pages get their navigation, as in build_site"""
+    _check_sources(content_dir, static_dir)
+    template = load_template(template_path)
+    with metrics.stage("plan"):
+        site, pages, indexes = _site_jobs(
+            content_dir,
+            template,
+            default_partials_dir(template_path),
+            include,
+            exclude,
+        )
+    statics = sorted(relative for relative, _ in scan_tree(static_dir))
+    static_names = set(statics)
+    replaced = set()
+
+    def add_page(dest: str, html: str):
+        target.add_bytes(dest, html.encode("utf-8"))
+        if dest in static_names:
+            replaced.add(dest)
+        metrics.add("pages_built")
+        metrics.add("html_elements", html_elements(html))
+
+    # Navigation is computed here, as the jobs are pulled, and not by the
+    # render threads
+    jobs = (
+        (source, dest, page_template, site.navigation(source))
+        for source, dest, page_template in pages
+    )
+    with metrics.stage("pages"):
+        rendered = render_pages(
+            jobs, template, _metered_read(metrics), workers, max_in_flight
+        )
+        for dest, html in rendered:
+            log(f"Generating page {dest}")
+            add_page(dest, html)
+        for source, dest, index_template in indexes:
+            log(f"Generating section index {dest}")
+            document = site.index_document(source)
+            navigation = site.navigation(source)
+            add_page(dest, render_page(document, index_template, navigation))
+            metrics.add("indexes_built")
+    with metrics.stage("copy"):
+        for relative in statics:
+            if relative in replaced:
+                continue
+            size = target.add_file(relative, os.path.join(static_dir, relative))
+            metrics.add("files_copied")
+            metrics.add("bytes_read", size)
+    return len(pages) + len(indexes)
+
+
+def archive_site(
+    content_dir: str = "./content",
+    template_path: str = "./template.html",
+    static_dir: str = "./static",
+    archive_path: str = "./public.tar.gz",
+    log: Callable[[str], None] = print,
+    include: Iterable[str] = DEFAULT_INCLUDE,
+    exclude: Iterable[str] = DEFAULT_EXCLUDE,
+    workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    metrics: Optional[BuildMetrics] = None,
+    mtime: Optional[int] = None,
+) -> int:
+    """builds a whole site into an archive instead of a directory. The
+    archive holds the files build_site would write: pages get their
+    navigation, and sections without an index.md get a generated index.
+    Pages are rendered in parallel and added in the order of discovery, then
+    the generated indexes, then the static files sorted by path, except
+    those a page replaces as it would in a site directory. Like build_site,
+    it keeps the site tree in memory, but no page once it is added. The
+    arguments are the ones of stream_site, plus the timestamp of the
+    entries, see open_archive
+
+    Returns
+    -------
+    pages : int
+        the number of pages generated, section indexes included
+    """
+    if metrics is None:
+        metrics = BuildMetrics()
+    with open_archive(archive_path, mtime) as archive:
+        count = _add_site(
+            archive,
+            content_dir,
+            template_path,
+            static_dir,
+            log,
+            include,
+            exclude,
+            workers,
+            max_in_flight,
+            metrics,
+        )
+    metrics.add("bytes_written", os.path.getsize(archive_path))
+    metrics.finish()
+    write_metrics(metrics, metrics_path(default_stat_cache_path(archive_path)))
+    return count
+
+
+def memory_site(
+    content_dir: str = "./content",
+    template_path: str = "./template.html",
+    static_dir: str = "./static",
+    log: Callable[[str], None] = print,
+    include: Iterable[str] = DEFAULT_INCLUDE,
+    exclude: Iterable[str] = DEFAULT_EXCLUDE,
+    workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    metrics: Optional[BuildMetrics] = None,
+) -> MemorySite:
+    """builds a whole site into memory, for fileserver.py to serve without
+    writing anything to disk. Files are added like the entries of
+    archive_site, whose arguments it takes. The metrics are not written,
+    bytes_written counts the bytes held in memory
+
+    Returns
+    -------
+    site : MemorySite
+        the pages and static files of the site
+    """
+    if metrics is None:
+        metrics = BuildMetrics()
+    site = MemorySite()
+    _add_site(
+        site,
+        content_dir,
+        template_path,
+        static_dir,
+        log,
+        include,
+        exclude,
+        workers,
+        max_in_flight,
+        metrics,
+    )
+    metrics.add("bytes_written", site.size)
+    metrics.finish()
+    return site
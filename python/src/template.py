@@ -0,0 +1,237 @@
+""" Compiled page templates with partials
+
+A template is compiled once into a list of segments: literal text,
+'{{ Name }}' placeholders and '{{> name }}' partials. A partial is another
+template, read from "<name>.html" in the partials directory, which defaults to
+the "partials" directory next to the template. Partials may include partials.
+
+A partial that uses no placeholder is inlined into the literal text around it
+when it is compiled. The output of any other partial is cached, keyed by the
+values of the placeholders it uses, so a header or a footer that only depends
+on values shared by many pages is rendered once, and rendering a page is
+mostly joining rendered fragments.
+
+Constants
+---------
+
+PARTIAL_CACHE_SIZE : int
+    How many outputs every partial keeps. The least recently used ones are
+    dropped first.
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Tuple, Union
+
+PARTIAL_CACHE_SIZE = 256
+
+_tag_pattern = re.compile(r"\{\{\s*(>)?\s*([\w.-]+)\s*\}\}")
+
+
+class _Placeholder:
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+
+Segment = Union[str, _Placeholder, "Partial"]
+
+
+class Template:
+    """A compiled template.
+
+    Attributes
+    ----------
+    names : frozenset of str
+        The placeholders used by the template and its partials.
+
+    dependencies : tuple of str
+        The paths of the partial files the template includes, directly or
+        not.
+
+    Methods
+    -------
+    render(context)
+        replaces every placeholder with its value in the context. Missing
+        placeholders are replaced by an empty string
+    """
+
+    def __init__(self, segments: List[Segment], dependencies: Tuple[str, ...] = ()):
+        self._segments = tuple(segments)
+        names = set()
+        for segment in self._segments:
+            if isinstance(segment, _Placeholder):
+                names.add(segment.name)
+            elif isinstance(segment, Partial):
+                names.update(segment.template.names)
+        self.names: FrozenSet[str] = frozenset(names)
+        self.dependencies = dependencies
+
+    def render(self, context: Dict[str, str]) -> str:
+        parts = []
+        for segment in self._segments:
+            if isinstance(segment, str):
+                parts.append(segment)
+            elif isinstance(segment, _Placeholder):
+                parts.append(context.get(segment.name, ""))
+            else:
+                parts.append(segment.render(context))
+        return "".join(parts)
+
+
+class Partial:
+    """A template included by another one, whose outputs are cached.
+
+    Attributes
+    ----------
+    name : str
+        The name the partial is included with.
+
+    template : Template
+        The compiled partial.
+
+    hits, misses : int
+        How many renders were read from the cache, and how many were not.
+    """
+
+    def __init__(self, name: str, template: Template):
+        self.name = name
+        self.template = template
+        self._names = tuple(sorted(template.names))
+        self._outputs: "OrderedDict[Tuple[str, ...], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, context: Dict[str, str]) -> str:
+        key = tuple(context.get(name, "") for name in self._names)
+        with self._lock:
+            output = self._outputs.get(key)
+            if output is not None:
+                self.hits += 1
+                self._outputs.move_to_end(key)
+                return output
+            self.misses += 1
+        output = self.template.render(context)
+        with self._lock:
+            self._outputs[key] = output
+            if len(self._outputs) > PARTIAL_CACHE_SIZE:
+                self._outputs.popitem(last=False)
+        return output
+
+
+class _Compiler:
+    """compiles a template and the partials it includes, compiling every
+    partial once however many times it is included"""
+
+    def __init__(self, partials_dir: Optional[str]):
+        self.partials_dir = partials_dir
+        self.partials: Dict[str, Union[str, Partial]] = {}
+        self.stack: List[str] = []
+
+    def compile(self, source: str) -> List[Segment]:
+        segments: List[Segment] = []
+        position = 0
+        for match in _tag_pattern.finditer(source):
+            segments.append(source[position : match.start()])
+            if match.group(1):
+                segments.append(self.partial(match.group(2)))
+            else:
+                segments.append(_Placeholder(match.group(2)))
+            position = match.end()
+        segments.append(source[position:])
+        # Adjacent literals, including inlined partials, become one
+        merged: List[Segment] = []
+        for segment in segments:
+            if isinstance(segment, str) and merged and isinstance(merged[-1], str):
+                merged[-1] += segment
+            elif segment != "":
+                merged.append(segment)
+        return merged
+
+    def partial(self, name: str) -> Union[str, Partial]:
+        if name in self.stack:
+            cycle = " -> ".join([*self.stack, name])
+            raise ValueError(f"Partial includes itself: {cycle}")
+        if name in self.partials:
+            return self.partials[name]
+        if self.partials_dir is None:
+            raise ValueError(f"Partial '{name}' used without a partials directory")
+        path = os.path.join(self.partials_dir, f"{name}.html")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Partial {path} does not exist")
+        with open(path, "r") as handle:
+            source = handle.read()
+        self.stack.append(name)
+        segments = self.compile(source)
+        self.stack.pop()
+        partial: Union[str, Partial]
+        if all(isinstance(segment, str) for segment in segments):
+            partial = "".join(segments)  # type: ignore[arg-type]
+        else:
+            partial = Partial(name, Template(segments))
+        self.partials[name] = partial
+        return partial
+
+    def dependencies(self) -> Tuple[str, ...]:
+        if self.partials_dir is None:
+            return ()
+        return tuple(
+            os.path.join(self.partials_dir, f"{name}.html")
+            for name in sorted(self.partials)
+        )
+
+
+def default_partials_dir(template_path: str) -> str:
+    """gives the directory the partials of a template are read from"""
+    return os.path.join(os.path.dirname(os.path.abspath(template_path)), "partials")
+
+
+def compile_template(source: str, partials_dir: Optional[str] = None) -> Template:
+    """compiles a template
+
+    Parameters
+    ----------
+    source : str
+        The text of the template
+
+    partials_dir : str, optional
+        The directory of the partials the template includes
+
+    Raises
+    ------
+    FileNotFoundError
+        if an included partial does not exist
+
+    ValueError
+        if a partial includes itself, directly or not
+    """
+    compiler = _Compiler(partials_dir)
+    segments = compiler.compile(source)
+    return Template(segments, compiler.dependencies())
+
+
+def load_template(path: str, partials_dir: Optional[str] = None) -> Template:
+    """reads and compiles a template file. Its partials are read from
+    partials_dir, which defaults to default_partials_dir(path)"""
+    with open(path, "r") as handle:
+        source = handle.read()
+    if partials_dir is None:
+        partials_dir = default_partials_dir(path)
+    return compile_template(source, partials_dir)
+
+
+@lru_cache(maxsize=64)
+def _compile_without_partials(source: str) -> Template:
+    return compile_template(source)
+
+
+def render_template(template: str, context: Dict[str, str]) -> str:
+    """replaces every '{{ Name }}' placeholder of a template with the value
+    of Name in the context. Placeholders missing from the context are
+    replaced by an empty string"""
+    return _compile_without_partials(template).render(context)
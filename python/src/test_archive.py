@@ -0,0 +1,161 @@
+import os
+import stat
+import tarfile
+import tempfile
+import unittest
+import zipfile
+from typing import Dict
+from unittest.mock import patch
+
+from archive import DEFAULT_MTIME, SiteArchive, open_archive
+from build import build_site
+from site_testcase import SiteTestCase
+from stream import archive_site
+
+
+def _tar_entries(path: str) -> Dict[str, bytes]:
+    with tarfile.open(path) as archive:
+        entries = {}
+        for member in archive.getmembers():
+            data = archive.extractfile(member)
+            assert data is not None
+            entries[member.name] = data.read()
+        return entries
+
+
+def _zip_entries(path: str) -> Dict[str, bytes]:
+    with zipfile.ZipFile(path) as archive:
+        return {name: archive.read(name) for name in archive.namelist()}
+
+
+class TestOpenArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.root = self.dir.name
+        self.script = os.path.join(self.root, "run.sh")
+        with open(self.script, "w") as handle:
+            handle.write("echo run")
+        os.chmod(self.script, 0o755)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write(self, name: str):
+        path = os.path.join(self.root, name)
+        with open_archive(path) as archive:
+            archive.add_bytes(os.path.join("blog", "post.html"), b"<p>post</p>")
+            archive.add_file("run.sh", self.script)
+        return path
+
+    def test_tar(self):
+        for name in ("site.tar", "site.tar.gz", "site.tgz"):
+            with self.subTest(name):
+                path = self.write(name)
+                with tarfile.open(path) as archive:
+                    members = archive.getmembers()
+                self.assertEqual(
+                    [member.name for member in members], ["blog/post.html", "run.sh"]
+                )
+                self.assertEqual({member.mtime for member in members}, {DEFAULT_MTIME})
+                self.assertEqual([member.mode for member in members], [0o644, 0o755])
+                self.assertEqual({member.uname for member in members}, {""})
+                self.assertEqual(_tar_entries(path)["run.sh"], b"echo run")
+
+    def test_zip(self):
+        path = self.write("site.zip")
+        with zipfile.ZipFile(path) as archive:
+            infos = archive.infolist()
+        names = [info.filename for info in infos]
+        self.assertEqual(names, ["blog/post.html", "run.sh"])
+        self.assertEqual({info.date_time for info in infos}, {(1980, 1, 1, 0, 0, 0)})
+        self.assertEqual(
+            [stat.S_IMODE(info.external_attr >> 16) for info in infos], [0o644, 0o755]
+        )
+        self.assertEqual(_zip_entries(path)["blog/post.html"], b"<p>post</p>")
+
+    def test_same_entries_give_the_same_bytes(self):
+        for name in ("site.tar.gz", "site.zip"):
+            with self.subTest(name):
+                with open(self.write(name), "rb") as handle:
+                    first = handle.read()
+                os.utime(self.script, (0, 0))
+                with open(self.write(name), "rb") as handle:
+                    self.assertEqual(handle.read(), first)
+
+    def test_source_date_epoch(self):
+        with patch.dict(os.environ, {"SOURCE_DATE_EPOCH": "1700000000"}):
+            path = self.write("site.tar")
+        with tarfile.open(path) as archive:
+            self.assertEqual(archive.getmember("run.sh").mtime, 1700000000)
+
+    def test_incomplete_archive_is_removed(self):
+        path = os.path.join(self.root, "site.zip")
+        with self.assertRaises(FileNotFoundError):
+            with open_archive(path) as archive:
+                archive.add_bytes("index.html", b"")
+                archive.add_file("missing", os.path.join(self.root, "missing"))
+        self.assertEqual(sorted(os.listdir(self.root)), ["run.sh"])
+
+    def test_raise_if_format_is_unknown(self):
+        self.assertRaises(ValueError, open_archive, os.path.join(self.root, "a.rar"))
+        self.assertRaises(TypeError, SiteArchive, os.path.join(self.root, "a"), 0)
+
+
+class TestArchiveSite(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write("content/index.md", "# Home\n\nWelcome")
+        self.write("content/blog/post.md", "# Post\n\nA **post**")
+        self.write("content/blog/second.md", "# Second")
+        self.write(
+            "content/blog/_layout.html",
+            "<main>{{ Breadcrumbs }}{{ Content }}{{ Prev }}{{ Next }}</main>",
+        )
+        self.write("static/index.css", "body {}")
+        self.write("static/images/a.svg", "<svg/>")
+        # Replaced by the page of the same name, as in a site directory
+        self.write("static/index.html", "static")
+        self.write(
+            "template.html",
+            "<title>{{ Title }}</title>{{ Breadcrumbs }}{{ Content }}{{ Next }}",
+        )
+        self.arguments = [
+            self.path("content"),
+            self.path("template.html"),
+            self.path("static"),
+        ]
+
+    def test_same_files_as_build_site(self):
+        build_site(*self.arguments, self.path("public"), log=lambda _: None)
+        expected = self.read_tree(self.path("public"))
+        self.assertIn(b'rel="prev"', expected["blog/second.html"])
+        readers = [("site.tar.gz", _tar_entries), ("site.zip", _zip_entries)]
+        for name, entries in readers:
+            with self.subTest(name):
+                count = archive_site(
+                    *self.arguments, self.path(name), log=lambda _: None, workers=2
+                )
+                self.assertEqual(count, 4)
+                self.assertEqual(entries(self.path(name)), expected)
+
+    def test_deterministic_order(self):
+        archive_site(*self.arguments, self.path("site.tar"), log=lambda _: None)
+        with tarfile.open(self.path("site.tar")) as archive:
+            names = archive.getnames()
+        self.assertEqual(
+            names,
+            [
+                "index.html",
+                "blog/post.html",
+                "blog/second.html",
+                "blog/index.html",
+                "images/a.svg",
+                "index.css",
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+
+from arena import ArenaDocument, markdown_to_arena
+from block_md import markdown_to_html_node
+from htmlnode import LeafNode, ParentNode
+
+
+class TestArenaDocument(unittest.TestCase):
+
+    def test_build_and_serialize(self):
+        document = ArenaDocument("div")
+        paragraph = document.append_parent(0, "p", {"class": "intro"})
+        document.append_leaf(paragraph, None, "Some ")
+        document.append_leaf(paragraph, "b", "bold & brave")
+        document.append_leaf(0, "img", "", {"src": "/a.png", "alt": "a"})
+        self.assertEqual(
+            document.to_html(),
+            '<div><p class="intro">Some <b>bold &amp; brave</b></p>'
+            '<img src="/a.png" alt="a"></img></div>',
+        )
+
+    def test_text_is_one_buffer(self):
+        document = ArenaDocument("p")
+        document.append_leaf(0, None, "one ")
+        document.append_leaf(0, "b", "two")
+        document.finish()
+        self.assertEqual(document.text, "one two")
+        self.assertEqual(document.value(2), "two")
+        self.assertIsNone(document.value(0))
+
+    def test_empty_root(self):
+        self.assertEqual(ArenaDocument("div").to_html(), "<div></div>")
+
+    def test_empty_parents_are_skipped(self):
+        document = ArenaDocument("div")
+        document.append_parent(0, "ul")
+        document.append_leaf(0, None, "a")
+        self.assertEqual(document.to_html(), "<div>a</div>")
+
+    def test_raise_when_appending_to_finished_document(self):
+        document = ArenaDocument("div").finish()
+        self.assertRaisesRegex(
+            ValueError,
+            "finished document",
+            lambda: document.append_leaf(0, None, "a"),
+        )
+
+    def test_round_trip(self):
+        tree = ParentNode(
+            "div",
+            [
+                ParentNode("ul", [ParentNode("li", [LeafNode("i", "x")])]),
+                LeafNode("a", "link", {"href": "/"}),
+            ],
+        )
+        document = ArenaDocument.from_node(tree)
+        self.assertEqual(len(document), 5)
+        self.assertEqual(document.to_node(), tree)
+        self.assertEqual(document.to_html(), tree.to_html())
+
+    def test_raise_if_root_is_leaf(self):
+        self.assertRaisesRegex(
+            ValueError,
+            "must be a parent node",
+            lambda: ArenaDocument.from_node(LeafNode("b", "x")),
+        )
+
+    def test_deep_tree_does_not_recurse(self):
+        document = ArenaDocument("div")
+        parent = 0
+        for _ in range(5000):
+            parent = document.append_parent(parent, "div")
+        document.append_leaf(parent, None, "deep")
+        html = document.to_html()
+        self.assertTrue(html.startswith("<div>" * 5001 + "deep"))
+
+
+class TestMarkdownToArena(unittest.TestCase):
+
+    def test_same_html_as_nodes(self):
+        markdown = """
+# A heading
+
+A paragraph with **bold**, *italic* and a [link](https://boot.dev).
+
+> a quote
+
+* one
+* two
+
+1. first
+2. second
+
+```
+code < here
+```
+"""
+        document = markdown_to_arena(markdown)
+        expected = markdown_to_html_node(markdown)
+        self.assertEqual(document.to_html(), expected.to_html())
+        self.assertEqual(document.to_node(), expected)
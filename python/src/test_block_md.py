@@ -1,7 +1,10 @@
 import unittest
 import re
+from unittest.mock import patch
 
+import block_md
 from block_md import (
+    BlockClassifier,
     code_block_to_htmlnode,
     heading_block_to_htmlnode,
     markdown_to_blocks,
@@ -17,7 +20,9 @@ from block_md import (
     ul_block_to_htmlnode,
     paragraph_block_to_htmlnode,
     quote_block_to_htmlnode,
+    register_block_type,
 )
+from highlight import set_cache_dir
 from htmlnode import LeafNode, ParentNode
 
 
@@ -115,6 +120,59 @@ class TestBlockToBlockType(unittest.TestCase):
         self.assertEqual(block_type_paragraph, block_to_block_type(input))
 
 
+class TestBlockClassifier(unittest.TestCase):
+
+    def test_empty_classifier_gives_paragraphs(self):
+        self.assertEqual(block_type_paragraph, BlockClassifier().classify("# a"))
+
+    def test_block_test(self):
+        classifier = BlockClassifier()
+        classifier.register("rule", "-", block_test=lambda block: block == "---")
+        self.assertEqual("rule", classifier.classify("---"))
+        self.assertEqual(block_type_paragraph, classifier.classify("--"))
+
+    def test_line_test_on_every_line(self):
+        classifier = BlockClassifier()
+        classifier.register("table", "|", line_test=lambda _, l: l.startswith("|"))
+        self.assertEqual("table", classifier.classify("| a |\n  | b |"))
+        self.assertEqual(block_type_paragraph, classifier.classify("| a |\nb |"))
+
+    def test_earlier_rules_take_precedence(self):
+        classifier = BlockClassifier()
+        classifier.register("first", "+", line_test=lambda _, l: l.startswith("+"))
+        classifier.register("second", "+", block_test=lambda block: True)
+        self.assertEqual("first", classifier.classify("+ a\n+ b"))
+        self.assertEqual("second", classifier.classify("+ a\nb"))
+
+    def test_copy_does_not_change_original(self):
+        classifier = BlockClassifier()
+        copy = classifier.copy()
+        copy.register("rule", "-", block_test=lambda block: True)
+        self.assertEqual(block_type_paragraph, classifier.classify("---"))
+
+    def test_raise_without_tests(self):
+        self.assertRaisesRegex(
+            ValueError,
+            "needs a block test or a line test",
+            lambda: BlockClassifier().register("rule", "-"),
+        )
+
+    def test_register_block_type(self):
+        with patch.object(
+            block_md,
+            "default_block_classifier",
+            block_md.default_block_classifier.copy(),
+        ), patch.dict(block_md._map_block_to_transformer):
+            register_block_type(
+                "horizontal_rule",
+                lambda _: LeafNode(tag="hr", value=""),
+                "-",
+                block_test=lambda block: block == "---",
+            )
+            result = markdown_to_html_node("a\n\n---\n\n- b").to_html()
+        self.assertEqual(result, "<div><p>a</p><hr></hr><ul><li>b</li></ul></div>")
+
+
 class TestQuoteBlockToHTMLNode(unittest.TestCase):
 
     def test_basic_quote(self):
@@ -202,6 +260,49 @@ class TestCodeBlockToHTML(unittest.TestCase):
         result = code_block_to_htmlnode(input)
         self.assertEqual(expected, result)
 
+    def test_indentation_is_kept(self):
+        input = """
+        ```
+        if x:
+            y()
+        ```
+        """
+        expected = ParentNode(
+            tag="pre",
+            children=[LeafNode(tag="code", value="if x:\n    y()")],
+        )
+        self.assertEqual(expected, code_block_to_htmlnode(input))
+
+    def test_language_tag(self):
+        input = "```brainfuck\n+[-]\n```"
+        expected = ParentNode(
+            tag="pre",
+            children=[
+                LeafNode(tag="code", value="+[-]", props={"class": "language-brainfuck"})
+            ],
+        )
+        self.assertEqual(expected, code_block_to_htmlnode(input))
+
+    def test_highlighted_code(self):
+        self.addCleanup(set_cache_dir, set_cache_dir(None))
+        input = '```python\nprint("hi")\n```'
+        expected = ParentNode(
+            tag="pre",
+            children=[
+                ParentNode(
+                    tag="code",
+                    children=[
+                        LeafNode("span", "print", {"class": "tok-builtin"}),
+                        LeafNode(None, "("),
+                        LeafNode("span", '"hi"', {"class": "tok-string"}),
+                        LeafNode(None, ")"),
+                    ],
+                    props={"class": "language-python"},
+                )
+            ],
+        )
+        self.assertEqual(expected, code_block_to_htmlnode(input))
+
 
 class TestHeadingBlockToHTML(unittest.TestCase):
 
@@ -407,6 +508,7 @@ class TestMarkdownToHTML(unittest.TestCase):
                 ParentNode(
                     tag="h1",
                     children=[LeafNode(tag=None, value="A simple markdown document")],
+                    props={"id": "a-simple-markdown-document"},
                 ),
                 ParentNode(
                     tag="p",
@@ -459,6 +561,7 @@ class TestMarkdownToHTML(unittest.TestCase):
                 ParentNode(
                     tag="h1",
                     children=[LeafNode(tag=None, value="A simple markdown document")],
+                    props={"id": "a-simple-markdown-document"},
                 ),
                 ParentNode(
                     tag="p",
@@ -559,7 +662,9 @@ this is paragraph text
         node = markdown_to_html_node(md)
         html = node.to_html()
         self.assertEqual(
-            "<div><h1>this is an h1</h1><p>this is paragraph text</p><h2>this is an h2</h2></div>",
+            '<div><h1 id="this-is-an-h1">this is an h1</h1>'
+            "<p>this is paragraph text</p>"
+            '<h2 id="this-is-an-h2">this is an h2</h2></div>',
             html,
         )
 
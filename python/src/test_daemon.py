@@ -0,0 +1,98 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from daemon import BuildServer, request
+
+
+class TestBuildServer(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        root = self.dir.name
+        os.makedirs(os.path.join(root, "content", "blog"))
+        os.makedirs(os.path.join(root, "static"))
+        with open(os.path.join(root, "content", "index.md"), "w") as handle:
+            handle.write("# Home\n\nWelcome")
+        with open(os.path.join(root, "content", "blog", "post.md"), "w") as handle:
+            handle.write("# Post\n\nA **post**")
+        with open(os.path.join(root, "static", "index.css"), "w") as handle:
+            handle.write("body {}")
+        with open(os.path.join(root, "template.html"), "w") as handle:
+            handle.write("<title>{{ Title }}</title>{{ Content }}")
+        self.environ = patch.dict(os.environ, {"SSG_CACHE_DIR": root})
+        self.environ.start()
+        self.socket_path = os.path.join(root, "ssg.sock")
+        self.server = BuildServer(self.socket_path)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={"poll_interval": 0.01}
+        )
+        self.thread.start()
+        self.payload = {
+            "command": "build",
+            "content": os.path.join(root, "content"),
+            "template": os.path.join(root, "template.html"),
+            "static": os.path.join(root, "static"),
+            "dest": os.path.join(root, "public"),
+        }
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+        self.environ.stop()
+        self.dir.cleanup()
+
+    def test_build(self):
+        events = list(request(self.socket_path, self.payload))
+        self.assertEqual(events[-1]["event"], "done")
+        # Two pages and the generated index of the blog section
+        self.assertEqual(len([e for e in events if e["event"] == "log"]), 3)
+        with open(os.path.join(self.dir.name, "public", "blog", "post.html")) as f:
+            self.assertEqual(
+                f.read(),
+                '<title>Post</title><div><h1 id="post">Post</h1>'
+                "<p>A <b>post</b></p></div>",
+            )
+        self.assertTrue(
+            os.path.exists(os.path.join(self.dir.name, "public", "index.css"))
+        )
+
+    def test_second_build_reuses_pages(self):
+        first = list(request(self.socket_path, self.payload))[-1]
+        post = os.path.join(self.dir.name, "content", "blog", "post.md")
+        with open(post, "a") as handle:
+            handle.write("\n\nMore")
+        events = list(request(self.socket_path, self.payload))
+        self.assertEqual(first["cache_misses"], 3)
+        self.assertEqual(events[-1]["cache_misses"], 1)
+        self.assertEqual(events[-1]["cache_hits"], 1)
+        self.assertEqual(len([e for e in events if e["event"] == "log"]), 1)
+
+    def test_dry_run(self):
+        self.payload["dry_run"] = True
+        events = list(request(self.socket_path, self.payload))
+        self.assertEqual(
+            events[-2]["message"], "4 new, 0 changed, 0 deleted, 0 unchanged"
+        )
+        self.assertFalse(os.path.exists(os.path.join(self.dir.name, "public")))
+
+    def test_error(self):
+        self.payload["template"] = os.path.join(self.dir.name, "missing.html")
+        events = list(request(self.socket_path, self.payload))
+        self.assertEqual(events[-1]["event"], "error")
+        self.assertIn("does not exist", events[-1]["message"])
+
+    def test_relative_paths_are_rejected(self):
+        self.payload["dest"] = "public"
+        event = list(request(self.socket_path, self.payload))[-1]
+        self.assertEqual(event["event"], "error")
+        self.assertIn("absolute path", event["message"])
+
+    def test_stop(self):
+        event = list(request(self.socket_path, {"command": "stop"}))[-1]
+        self.assertEqual(event["event"], "done")
+        self.thread.join(timeout=5)
+        self.assertFalse(self.thread.is_alive())
@@ -0,0 +1,138 @@
+import os
+import sys
+import tempfile
+import unittest
+
+from discovery import LAYOUT_NAME, discover_pages, page_dest
+
+
+class TestDiscovery(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.root = self.dir.name
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def touch(self, *paths: str):
+        for relative in paths:
+            path = os.path.join(self.root, relative)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as handle:
+                handle.write("# page")
+
+    def relatives(self, **kwargs):
+        return [job.relative for job in discover_pages(self.root, **kwargs)]
+
+    def test_only_markdown_files_are_pages(self):
+        self.touch("index.md", "images/logo.png", "blog/post.md", "notes.txt")
+        self.assertEqual(
+            self.relatives(), ["index.md", os.path.join("blog", "post.md")]
+        )
+
+    def test_order_is_deterministic(self):
+        self.touch("b.md", "a.md", "z/a.md", "c/b.md", "c/a.md", "c/d/a.md")
+        expected = ["a.md", "b.md", "c/a.md", "c/b.md", "c/d/a.md", "z/a.md"]
+        self.assertEqual(
+            self.relatives(), [path.replace("/", os.sep) for path in expected]
+        )
+
+    def test_hidden_files_are_excluded_by_default(self):
+        self.touch("index.md", ".draft.md", ".git/readme.md")
+        self.assertEqual(self.relatives(), ["index.md"])
+
+    def test_layouts_are_inherited(self):
+        self.touch(
+            "index.md",
+            f"blog/{LAYOUT_NAME}",
+            "blog/post.md",
+            "blog/2024/old.md",
+            f"blog/drafts/{LAYOUT_NAME}",
+            "blog/drafts/idea.md",
+        )
+        blog = os.path.join(self.root, "blog", LAYOUT_NAME)
+        drafts = os.path.join(self.root, "blog", "drafts", LAYOUT_NAME)
+        layouts = {}
+        jobs = discover_pages(self.root, layouts=layouts)
+        self.assertEqual(
+            {job.relative: job.layout for job in jobs},
+            {
+                "index.md": None,
+                os.path.join("blog", "post.md"): blog,
+                os.path.join("blog", "2024", "old.md"): blog,
+                os.path.join("blog", "drafts", "idea.md"): drafts,
+            },
+        )
+        self.assertEqual(
+            layouts,
+            {
+                "": None,
+                "blog": blog,
+                os.path.join("blog", "2024"): blog,
+                os.path.join("blog", "drafts"): drafts,
+            },
+        )
+
+    def test_include_and_exclude(self):
+        self.touch("index.md", "page.markdown", "drafts/a.md", "blog/drafts/b.md")
+        self.assertEqual(
+            self.relatives(include=["*.md", "*.markdown"], exclude=["drafts"]),
+            ["index.md", "page.markdown"],
+        )
+        self.assertEqual(
+            self.relatives(exclude=["drafts/*"]),
+            ["index.md", os.path.join("blog", "drafts", "b.md")],
+        )
+        self.assertEqual(
+            self.relatives(include=["blog/*/*.md"]),
+            [os.path.join("blog", "drafts", "b.md")],
+        )
+        self.assertEqual(self.relatives(include=[]), [])
+
+    def test_symlink_loops_are_walked_once(self):
+        self.touch("a/page.md")
+        os.symlink(self.root, os.path.join(self.root, "a", "loop"))
+        os.symlink(os.path.join(self.root, "a"), os.path.join(self.root, "b"))
+        self.assertEqual(self.relatives(), [os.path.join("a", "page.md")])
+
+    def test_symlinks_are_not_followed_on_request(self):
+        self.touch("a/page.md")
+        os.symlink(os.path.join(self.root, "a"), os.path.join(self.root, "0"))
+        self.assertEqual(
+            self.relatives(follow_symlinks=False), [os.path.join("a", "page.md")]
+        )
+        self.assertEqual(self.relatives(), [os.path.join("0", "page.md")])
+
+    def test_deep_trees_do_not_recurse(self):
+        depth = sys.getrecursionlimit() + 10
+        path = self.root
+        # os.makedirs itself recurses
+        for _ in range(depth):
+            path = os.path.join(path, "d")
+            os.mkdir(path)
+        with open(os.path.join(path, "deep.md"), "w"):
+            pass
+        jobs = list(discover_pages(self.root))
+        self.assertEqual(len(jobs), 1)
+        # shutil.rmtree recurses too
+        os.remove(os.path.join(path, "deep.md"))
+        while path != self.root:
+            os.rmdir(path)
+            path = os.path.dirname(path)
+
+    def test_dest(self):
+        self.touch("blog/post.md")
+        (job,) = discover_pages(self.root)
+        self.assertEqual(
+            job.dest("public"), os.path.join("public", "blog", "post.html")
+        )
+        self.assertEqual(
+            page_dest("public", "index.md"), os.path.join("public", "index.html")
+        )
+
+    def test_raise_if_missing(self):
+        self.assertRaises(
+            FileNotFoundError,
+            lambda: list(discover_pages(os.path.join(self.root, "missing"))),
+        )
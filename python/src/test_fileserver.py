@@ -0,0 +1,231 @@
+import http.client
+import os
+import tempfile
+import threading
+import unittest
+from email.parser import BytesParser
+
+from fileserver import (
+    MAX_RANGES,
+    CachedFileHandler,
+    FileCache,
+    make_server,
+    parse_ranges,
+)
+
+
+class TestParseRanges(unittest.TestCase):
+
+    def test_single_range(self):
+        self.assertEqual(parse_ranges("bytes=0-99", 1000), [(0, 99)])
+
+    def test_open_and_suffix_ranges(self):
+        self.assertEqual(parse_ranges("bytes=900-", 1000), [(900, 999)])
+        self.assertEqual(parse_ranges("bytes=-100", 1000), [(900, 999)])
+        self.assertEqual(parse_ranges("bytes=-5000", 1000), [(0, 999)])
+
+    def test_end_past_the_file_is_clamped(self):
+        self.assertEqual(parse_ranges("bytes=990-2000", 1000), [(990, 999)])
+
+    def test_several_ranges_keep_their_order(self):
+        self.assertEqual(
+            parse_ranges("bytes=500-599, 0-9", 1000), [(500, 599), (0, 9)]
+        )
+
+    def test_unsatisfiable_ranges(self):
+        self.assertEqual(parse_ranges("bytes=1000-", 1000), [])
+        self.assertEqual(parse_ranges("bytes=-0", 1000), [])
+        self.assertEqual(parse_ranges("bytes=-10", 0), [])
+
+    def test_invalid_headers_are_ignored(self):
+        self.assertIsNone(parse_ranges("items=0-1", 1000))
+        self.assertIsNone(parse_ranges("bytes=5-1", 1000))
+        self.assertIsNone(parse_ranges("bytes=a-b", 1000))
+        self.assertIsNone(parse_ranges("bytes=-", 1000))
+        many = ",".join(f"{i}-{i}" for i in range(MAX_RANGES + 1))
+        self.assertIsNone(parse_ranges(f"bytes={many}", 1000))
+
+
+class TestFileCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write(self, name: str, content: bytes) -> str:
+        path = os.path.join(self.dir.name, name)
+        with open(path, "wb") as handle:
+            handle.write(content)
+        return path
+
+    def test_second_get_is_a_hit(self):
+        path = self.write("a.html", b"hello")
+        cache = FileCache()
+        first, hit = cache.get(path)
+        self.assertFalse(hit)
+        second, hit = cache.get(path)
+        self.assertTrue(hit)
+        self.assertIs(first, second)
+        self.assertEqual(bytes(second.data), b"hello")
+
+    def test_changed_file_is_reloaded(self):
+        path = self.write("a.html", b"hello")
+        cache = FileCache()
+        cache.get(path)
+        os.remove(path)
+        self.write("a.html", b"changed")
+        served, hit = cache.get(path)
+        self.assertFalse(hit)
+        self.assertEqual(bytes(served.data), b"changed")
+        self.assertEqual(cache.stats()["cached_bytes"], len(b"changed"))
+
+    def test_least_recently_used_files_are_evicted(self):
+        cache = FileCache(max_bytes=10)
+        a = self.write("a", b"aaaa")
+        b = self.write("b", b"bbbb")
+        c = self.write("c", b"cccc")
+        cache.get(a)
+        cache.get(b)
+        cache.get(a)
+        cache.get(c)
+        self.assertEqual(cache.evictions, 1)
+        self.assertTrue(cache.get(a)[1])
+        self.assertFalse(cache.get(b)[1])
+
+    def test_large_files_are_mapped(self):
+        path = self.write("video.mp4", b"x" * 64)
+        cache = FileCache(mmap_threshold=32)
+        served, _ = cache.get(path)
+        self.assertTrue(served.mapped)
+        self.assertEqual(cache.stats()["cached_bytes"], 0)
+        self.assertEqual(cache.stats()["mapped_files"], 1)
+        self.assertTrue(cache.get(path)[1])
+
+    def test_info_does_not_read(self):
+        path = self.write("a.html", b"hello")
+        cache = FileCache()
+        served = cache.info(path)
+        self.assertIsNone(served.data)
+        self.assertEqual(served.size, 5)
+        self.assertEqual(cache.misses, 0)
+
+
+class QuietHandler(CachedFileHandler):
+    def log_message(self, *args):
+        pass
+
+
+class TestCachedFileHandler(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.content = bytes(range(256)) * 4
+        with open(os.path.join(self.dir.name, "data.bin"), "wb") as handle:
+            handle.write(self.content)
+        with open(os.path.join(self.dir.name, "index.html"), "wb") as handle:
+            handle.write(b"<p>home</p>")
+        self.cache = FileCache(mmap_threshold=512)
+        self.server = make_server(self.dir.name, 0, self.cache, QuietHandler)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, args=(0.01,)
+        )
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.dir.cleanup()
+
+    def request(self, method: str, path: str, **headers):
+        connection = http.client.HTTPConnection(
+            "localhost", self.server.server_address[1]
+        )
+        connection.request(method, path, headers=headers)
+        response = connection.getresponse()
+        body = response.read()
+        connection.close()
+        return response, body
+
+    def test_whole_file(self):
+        response, body = self.request("GET", "/data.bin")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("Accept-Ranges"), "bytes")
+        self.assertEqual(body, self.content)
+
+    def test_directory_index(self):
+        response, body = self.request("GET", "/")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, b"<p>home</p>")
+        self.assertEqual(response.getheader("Content-Type"), "text/html")
+
+    def test_missing_file(self):
+        response, _ = self.request("GET", "/missing.html")
+        self.assertEqual(response.status, 404)
+
+    def test_single_range(self):
+        response, body = self.request("GET", "/data.bin", Range="bytes=10-19")
+        self.assertEqual(response.status, 206)
+        self.assertEqual(response.getheader("Content-Range"), "bytes 10-19/1024")
+        self.assertEqual(body, self.content[10:20])
+
+    def test_several_ranges(self):
+        response, body = self.request("GET", "/data.bin", Range="bytes=0-3,-4")
+        self.assertEqual(response.status, 206)
+        content_type = response.getheader("Content-Type")
+        self.assertTrue(content_type.startswith("multipart/byteranges"))
+        self.assertEqual(int(response.getheader("Content-Length")), len(body))
+        message = BytesParser().parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + body
+        )
+        parts = message.get_payload()
+        self.assertEqual(len(parts), 2)
+        self.assertEqual(parts[0]["Content-Range"], "bytes 0-3/1024")
+        self.assertEqual(parts[0].get_payload(decode=True), self.content[:4])
+        self.assertEqual(parts[1]["Content-Range"], "bytes 1020-1023/1024")
+        self.assertEqual(parts[1].get_payload(decode=True), self.content[-4:])
+
+    def test_unsatisfiable_range(self):
+        response, body = self.request("GET", "/data.bin", Range="bytes=5000-")
+        self.assertEqual(response.status, 416)
+        self.assertEqual(response.getheader("Content-Range"), "bytes */1024")
+        self.assertEqual(body, b"")
+
+    def test_stale_if_range_gives_the_whole_file(self):
+        response, body = self.request(
+            "GET", "/data.bin", Range="bytes=0-9", **{"If-Range": '"stale"'}
+        )
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, self.content)
+
+    def test_head_does_not_read_the_file(self):
+        response, body = self.request("HEAD", "/data.bin")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("Content-Length"), "1024")
+        self.assertEqual(body, b"")
+        self.assertEqual(self.cache.misses, 0)
+
+    def test_not_modified(self):
+        response, _ = self.request("GET", "/index.html")
+        etag = response.getheader("ETag")
+        response, body = self.request(
+            "GET", "/index.html", **{"If-None-Match": etag}
+        )
+        self.assertEqual(response.status, 304)
+        self.assertEqual(body, b"")
+
+    def test_byte_counters(self):
+        self.request("GET", "/data.bin")
+        self.request("GET", "/data.bin", Range="bytes=0-99")
+        stats = self.cache.stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["miss_bytes"], 1024)
+        self.assertEqual(stats["hit_bytes"], 100)
+        self.assertEqual(stats["mapped_files"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
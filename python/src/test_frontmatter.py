@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+
+from frontmatter import (
+    MAX_FRONT_MATTER_SIZE,
+    read_front_matter,
+    scan_front_matter,
+    split_front_matter,
+)
+
+
+class TestSplitFrontMatter(unittest.TestCase):
+
+    def test_no_front_matter(self):
+        input = "# A title\n\nSome paragraph"
+        self.assertEqual(split_front_matter(input), ({}, input))
+
+    def test_front_matter(self):
+        input = "---\ntitle: A title\ndate: 2024-07-01\ntags: a, b\n---\n# Heading"
+        expected = {"title": "A title", "date": "2024-07-01", "tags": "a, b"}
+        self.assertEqual(split_front_matter(input), (expected, "# Heading"))
+
+    def test_value_with_colon(self):
+        input = "---\nlink: https://boot.dev\n---\n"
+        self.assertEqual(split_front_matter(input), ({"link": "https://boot.dev"}, ""))
+
+    def test_ignores_blank_and_comment_lines(self):
+        input = "---\n\n# a comment\ntitle: x\n---\nbody"
+        self.assertEqual(split_front_matter(input), ({"title": "x"}, "body"))
+
+    def test_raise_if_unclosed(self):
+        self.assertRaisesRegex(
+            ValueError,
+            "Unclosed front matter",
+            lambda: split_front_matter("---\ntitle: x\n# Heading"),
+        )
+
+    def test_raise_if_invalid_line(self):
+        self.assertRaisesRegex(
+            ValueError,
+            "Invalid front matter line",
+            lambda: split_front_matter("---\nnot a pair\n---\n"),
+        )
+
+
+class TestReadFrontMatter(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write(self, name: str, content: str) -> str:
+        path = os.path.join(self.dir.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as handle:
+            handle.write(content)
+        return path
+
+    def test_reads_header(self):
+        path = self.write("page.md", "---\ntitle: A title\n---\n# Heading\n")
+        self.assertEqual(read_front_matter(path), {"title": "A title"})
+
+    def test_no_header(self):
+        path = self.write("page.md", "# Heading\n")
+        self.assertEqual(read_front_matter(path), {})
+
+    def test_raise_if_unclosed_within_limit(self):
+        path = self.write("page.md", "---\n" + "a: b\n" * MAX_FRONT_MATTER_SIZE)
+        self.assertRaisesRegex(
+            ValueError, "Unclosed front matter", lambda: read_front_matter(path)
+        )
+
+    def test_scan(self):
+        self.write("index.md", "---\ntitle: Home\n---\n")
+        self.write("posts/one.md", "---\ntitle: One\n---\n")
+        self.write("posts/image.png", "not markdown")
+        result = [
+            (os.path.relpath(path, self.dir.name), metadata)
+            for path, metadata in scan_front_matter(self.dir.name)
+        ]
+        self.assertEqual(
+            result,
+            [
+                ("index.md", {"title": "Home"}),
+                (os.path.join("posts", "one.md"), {"title": "One"}),
+            ],
+        )
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import highlight
+from highlight import (
+    HIGHLIGHTER_VERSION,
+    is_supported,
+    set_cache_dir,
+    tokenize,
+)
+
+
+class TestTokenize(unittest.TestCase):
+
+    def test_tokens_cover_the_code(self):
+        code = 'def f(x):\n    # comment\n    return "a" + 1\n'
+        tokens = tokenize("python", code)
+        self.assertEqual("".join(text for _, text in tokens), code)
+
+    def test_token_types(self):
+        tokens = tokenize("py", 'return "a"  # done')
+        self.assertEqual(
+            tokens,
+            [
+                ("keyword", "return"),
+                (None, " "),
+                ("string", '"a"'),
+                (None, "  "),
+                ("comment", "# done"),
+            ],
+        )
+
+    def test_keywords_inside_words_are_plain(self):
+        self.assertEqual(tokenize("js", "format"), [(None, "format")])
+
+    def test_language_is_case_insensitive(self):
+        self.assertTrue(is_supported("Python"))
+        self.assertFalse(is_supported("brainfuck"))
+
+    def test_raise_if_unsupported(self):
+        self.assertRaisesRegex(
+            ValueError, "Unsupported language", lambda: tokenize("cobol", "")
+        )
+
+
+class TestHighlightCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.previous = set_cache_dir(self.dir.name)
+
+    def tearDown(self):
+        set_cache_dir(self.previous)
+        self.dir.cleanup()
+
+    def test_tokens_are_written_to_disk(self):
+        highlight.highlight("rust", "fn main() {}")
+        version_dir = os.path.join(self.dir.name, f"v{HIGHLIGHTER_VERSION}", "rust")
+        self.assertEqual(len(list(os.walk(version_dir))[-1][2]), 1)
+
+    def test_cached_tokens_are_not_tokenized_again(self):
+        expected = highlight.highlight("go", "func main() {}")
+        set_cache_dir(self.dir.name)
+        with patch.object(highlight, "tokenize") as tokenize_mock:
+            self.assertEqual(highlight.highlight("go", "func main() {}"), expected)
+            tokenize_mock.assert_not_called()
+
+    def test_version_change_ignores_cache(self):
+        highlight.highlight("go", "func main() {}")
+        set_cache_dir(self.dir.name)
+        with patch.object(highlight, "HIGHLIGHTER_VERSION", HIGHLIGHTER_VERSION + 1):
+            with patch.object(highlight, "tokenize", return_value=[]) as mock:
+                highlight.highlight("go", "func main() {}")
+                mock.assert_called_once()
@@ -1,6 +1,6 @@
 import unittest
 
-from htmlnode import HTMLNode, LeafNode, ParentNode
+from htmlnode import HTMLNode, LeafNode, ParentNode, escape_attribute, escape_text
 
 
 class TestHTMLNode(unittest.TestCase):
@@ -242,5 +242,41 @@ class TestParentNode(unittest.TestCase):
         )
 
 
+
+class TestEscaping(unittest.TestCase):
+
+    def test_escape_text(self):
+        self.assertEqual(escape_text("a < b && c > d"), "a &lt; b &amp;&amp; c &gt; d")
+
+    def test_escape_text_keeps_quotes(self):
+        self.assertEqual(escape_text('say "hi"'), 'say "hi"')
+
+    def test_escape_text_without_special_characters_is_the_same(self):
+        text = "nothing to escape here"
+        self.assertIs(escape_text(text), text)
+
+    def test_escape_attribute(self):
+        self.assertEqual(escape_attribute('/a?b=1&c="2"'), "/a?b=1&amp;c=&quot;2&quot;")
+
+    def test_leaf_value_is_escaped(self):
+        node = LeafNode("code", "if a < b:")
+        self.assertEqual(node.to_html(), "<code>if a &lt; b:</code>")
+
+    def test_text_leaf_is_escaped(self):
+        self.assertEqual(LeafNode(None, "R&D").to_html(), "R&amp;D")
+
+    def test_props_are_escaped(self):
+        node = LeafNode("a", "link", {"href": 'https://x.com/"><script>'})
+        self.assertEqual(
+            node.to_html(),
+            '<a href="https://x.com/&quot;&gt;&lt;script&gt;">link</a>',
+        )
+
+    def test_opening_tag(self):
+        node = ParentNode("p", [LeafNode(None, "a")], {"class": "x"})
+        self.assertEqual(node.opening_tag(), '<p class="x">')
+        self.assertEqual(ParentNode("p", []).opening_tag(), "<p>")
+
+
 if __name__ == "__main__":
     unittest.main()
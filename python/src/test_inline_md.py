@@ -72,14 +72,26 @@ class TestSplitDelimiter(unittest.TestCase):
         ]
         self.assertSequenceEqual(new_nodes, result)
 
-    def test_raise_if_unbalanced_delimiter(self):
+    def test_unbalanced_delimiter_stays_in_the_text(self):
         node = TextNode(
-            "I'm umbalanced on purpose `code starts but does not end", "text"
+            "I'm umbalanced on purpose `code` starts `but does not end", "text"
         )
-        self.assertRaisesRegex(
-            ValueError,
-            "Invalid markdown syntax. Unclosed formatting delimiter",
-            lambda: _split_nodes_delimiter([node], "`", "code"),
+        new_nodes = _split_nodes_delimiter([node], "`", "code")
+        result = [
+            TextNode("I'm umbalanced on purpose ", "text"),
+            TextNode("code", "code"),
+            TextNode(" starts `but does not end", "text"),
+        ]
+        self.assertSequenceEqual(new_nodes, result)
+
+    def test_unclosed_bold_is_not_read_as_empty_italic(self):
+        text = "a **b and `c` *d*"
+        self.assertEqual(
+            "".join(node.text for node in text_to_text_nodes(text)), "a **b and c d"
+        )
+        self.assertEqual(
+            [node.text_type for node in text_to_text_nodes(text)],
+            ["text", "code", "text", "italic"],
         )
 
 
@@ -141,6 +153,11 @@ class TestExtractLinks(unittest.TestCase):
         expected = []
         self.assertEqual(_extract_markdown_links(input), expected)
 
+    def test_brackets_and_parentheses_are_balanced(self):
+        input = "See [a] or [the [b] page](https://w.org/B_(c)) and [d](e"
+        expected = [("the [b] page", "https://w.org/B_(c)")]
+        self.assertEqual(_extract_markdown_links(input), expected)
+
     def test_does_not_extract_images(self):
         input = "There is no link in this but theres an image ![here](https://some-image-here)"
         expected = []
@@ -360,5 +377,23 @@ class TestSplitNodes(unittest.TestCase):
         self.assertEqual(text_to_text_nodes(input), expected)
 
 
+class TestSpans(unittest.TestCase):
+
+    def test_nodes_are_spans_of_the_source(self):
+        text = "A **bold** and *italic* `code` with a [link](https://boot.dev)"
+        nodes = text_to_text_nodes(text)
+        self.assertEqual(len(nodes), 8)
+        self.assertTrue(all(node.source is text for node in nodes))
+
+    def test_untouched_node_is_not_copied(self):
+        text = "nothing to split here"
+        [node] = text_to_text_nodes(text)
+        self.assertIs(node.text, text)
+
+    def test_span_text(self):
+        node = TextNode.span("some **bold** text", 7, 11, "bold")
+        self.assertEqual(node, TextNode("bold", "bold"))
+
+
 if __name__ == "__main__":
     unittest.main()
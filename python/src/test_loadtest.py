@@ -0,0 +1,119 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from fileserver import CachedFileHandler, FileCache, make_server
+from loadtest import compare, percentile, run_load, site_urls
+
+
+class TestSiteUrls(unittest.TestCase):
+
+    def test_files_and_directory_indexes(self):
+        with tempfile.TemporaryDirectory() as root:
+            os.makedirs(os.path.join(root, "blog"))
+            for name in ("index.html", "index.css", "blog/index.html", "blog/a b.html"):
+                open(os.path.join(root, name), "w").close()
+            self.assertEqual(
+                site_urls(root),
+                [
+                    "/",
+                    "/blog/",
+                    "/blog/a%20b.html",
+                    "/blog/index.html",
+                    "/index.css",
+                    "/index.html",
+                ],
+            )
+
+
+class TestPercentile(unittest.TestCase):
+
+    def test_nearest_rank(self):
+        values = [float(value) for value in range(1, 101)]
+        self.assertEqual(percentile(values, 50), 50.0)
+        self.assertEqual(percentile(values, 99), 99.0)
+        self.assertEqual(percentile(values, 100), 100.0)
+        self.assertEqual(percentile([3.0], 95), 3.0)
+        self.assertEqual(percentile([], 50), 0.0)
+
+
+class QuietHandler(CachedFileHandler):
+    def log_message(self, *args):
+        pass
+
+
+class TestRunLoad(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        for name in ("index.html", "a.html"):
+            with open(os.path.join(self.dir.name, name), "w") as handle:
+                handle.write(f"<p>{name}</p>")
+        self.server = make_server(self.dir.name, 0, FileCache(), QuietHandler)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, args=(0.01,)
+        )
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.dir.cleanup()
+
+    def test_report(self):
+        for keep_alive in (True, False):
+            with self.subTest(keep_alive=keep_alive):
+                report = run_load(
+                    self.url,
+                    site_urls(self.dir.name),
+                    duration=0.2,
+                    concurrency=2,
+                    keep_alive=keep_alive,
+                    skew=1.0,
+                )
+                self.assertGreater(report["requests"], 0)
+                self.assertGreater(report["requests_per_second"], 0)
+                self.assertEqual(report["errors"], {})
+                latency = report["latency_ms"]
+                self.assertLessEqual(latency["p50"], latency["p95"])
+                self.assertLessEqual(latency["p95"], latency["p99"])
+                self.assertLessEqual(latency["p99"], latency["max"])
+                self.assertEqual(report["settings"]["keep_alive"], keep_alive)
+
+    def test_errors_are_counted_by_status(self):
+        report = run_load(self.url, ["/missing.html"], duration=0.1, concurrency=1)
+        self.assertEqual(report["errors"], {"404": report["requests"]})
+
+    def test_remote_hosts_are_refused(self):
+        with self.assertRaises(ValueError):
+            run_load("http://example.com", ["/"], duration=0.1)
+
+
+class TestCompare(unittest.TestCase):
+
+    def test_relative_changes(self):
+        before = {
+            "requests_per_second": 100.0,
+            "bytes_per_second": 1000,
+            "latency_ms": {"p50": 2.0, "p95": 4.0, "p99": 8.0, "max": 10.0},
+            "errors": {"404": 1},
+        }
+        after = {
+            "requests_per_second": 150.0,
+            "bytes_per_second": 1000,
+            "latency_ms": {"p50": 1.0, "p95": 4.0, "p99": 8.0, "max": 20.0},
+            "errors": {},
+        }
+        changes = compare(before, after)
+        self.assertEqual(changes["requests_per_second"], 0.5)
+        self.assertEqual(changes["bytes_per_second"], 0.0)
+        self.assertEqual(changes["latency_p50"], -0.5)
+        self.assertEqual(changes["latency_max"], 1.0)
+        self.assertEqual(changes["errors"], -1)
+
+
+if __name__ == "__main__":
+    unittest.main()
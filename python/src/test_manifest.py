@@ -0,0 +1,130 @@
+import os
+import unittest
+from unittest.mock import patch
+
+import manifest
+from build import build_site
+from manifest import (
+    diff_manifests,
+    hash_tree,
+    load_manifest,
+    manifest_path,
+    save_manifest,
+)
+from site_testcase import SiteTestCase
+
+
+class TestManifest(SiteTestCase):
+
+    def site(self, name: str):
+        self.write(f"{name}/index.html", "home")
+        self.write(f"{name}/blog/post.html", "post")
+        self.write(f"{name}/blog/2024/old.html", "old")
+        self.write(f"{name}/index.css", "body {}")
+
+    def test_root_hash_only_depends_on_contents(self):
+        self.site("a")
+        self.site("b")
+        first = hash_tree(self.path("a"))
+        second = hash_tree(self.path("b"))
+        self.assertEqual(first["root"]["hash"], second["root"]["hash"])
+        self.write("b/blog/post.html", "changed")
+        changed = hash_tree(self.path("b"))
+        self.assertNotEqual(first["root"]["hash"], changed["root"]["hash"])
+        entries, changed_entries = first["root"]["entries"], changed["root"]["entries"]
+        self.assertEqual(
+            entries["index.html"]["hash"], changed_entries["index.html"]["hash"]
+        )
+        self.assertEqual(
+            entries["blog"]["entries"]["2024"]["hash"],
+            changed_entries["blog"]["entries"]["2024"]["hash"],
+        )
+        self.assertNotEqual(entries["blog"]["hash"], changed_entries["blog"]["hash"])
+
+    def test_unchanged_files_are_not_read_again(self):
+        self.site("a")
+        previous = hash_tree(self.path("a"))
+        self.write("a/index.css", "body { margin: 0 }")
+        read = []
+
+        def digest(path: str) -> str:
+            read.append(os.path.relpath(path, self.path("a")))
+            return "digest"
+
+        with patch.object(manifest, "file_digest", digest):
+            hash_tree(self.path("a"), previous)
+        self.assertEqual(read, ["index.css"])
+
+    def test_diff(self):
+        self.site("a")
+        old = hash_tree(self.path("a"))
+        self.write("a/blog/post.html", "changed")
+        self.write("a/about/index.html", "about")
+        self.write("a/about/team/index.html", "team")
+        os.remove(self.path("a/blog/2024/old.html"))
+        os.rmdir(self.path("a/blog/2024"))
+        # A file replaced by a directory
+        os.remove(self.path("a/index.css"))
+        self.write("a/index.css/index.html", "odd")
+        diff = diff_manifests(old, hash_tree(self.path("a")))
+        self.assertEqual(
+            diff.added,
+            ["about/index.html", "about/team/index.html", "index.css/index.html"],
+        )
+        self.assertEqual(diff.changed, ["blog/post.html"])
+        self.assertEqual(diff.removed, ["blog/2024/old.html", "index.css"])
+        self.assertEqual(list(diff.describe())[-1], "3 added, 1 changed, 2 removed")
+
+    def test_diff_skips_identical_directories(self):
+        self.site("a")
+        old = hash_tree(self.path("a"))
+        self.write("a/index.html", "changed")
+        new = hash_tree(self.path("a"))
+        # Entries of a directory whose hash did not change are never read
+        old["root"]["entries"]["blog"]["entries"] = None
+        new["root"]["entries"]["blog"]["entries"] = None
+        diff = diff_manifests(old, new)
+        self.assertEqual(diff.changed, ["index.html"])
+        self.assertFalse(diff_manifests(new, new))
+
+    def test_save_and_load(self):
+        self.site("a")
+        tree = hash_tree(self.path("a"))
+        save_manifest(tree, self.path("manifests", "a.json"))
+        self.assertEqual(load_manifest(self.path("manifests", "a.json")), tree)
+        self.assertIsNone(load_manifest(self.path("missing.json")))
+
+
+class TestBuildManifest(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write("content/index.md", "# Home")
+        self.write("content/blog/post.md", "# Post")
+        self.write("static/index.css", "body {}")
+        self.write("template.html", "{{ Content }}")
+        self.stat_cache_path = self.path("stat.sqlite")
+
+    def build(self):
+        build_site(
+            self.path("content"),
+            self.path("template.html"),
+            self.path("static"),
+            self.path("public"),
+            log=lambda _: None,
+            stat_cache_path=self.stat_cache_path,
+        )
+        return load_manifest(manifest_path(self.stat_cache_path))
+
+    def test_build_writes_the_manifest_of_the_site(self):
+        first = self.build()
+        self.assertEqual(first, hash_tree(self.path("public")))
+        with open(self.path("content/blog/post.md"), "w") as handle:
+            handle.write("# Post\n\nMore")
+        diff = diff_manifests(first, self.build())
+        self.assertEqual(diff.changed, ["blog/post.html"])
+        self.assertEqual(diff.added + diff.removed, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+import http.client
+import os
+import threading
+import unittest
+
+from build import build_site
+from fileserver import MemoryFileHandler, make_memory_server
+from memsite import MemorySite
+from site_testcase import SiteTestCase
+from stream import memory_site
+
+
+class QuietHandler(MemoryFileHandler):
+    def log_message(self, *args):
+        pass
+
+
+class TestMemorySite(unittest.TestCase):
+
+    def test_add_bytes(self):
+        site = MemorySite(mtime=0)
+        site.add_bytes(os.path.join("blog", "post.html"), b"old")
+        site.add_bytes("blog/post.html", b"post")
+        served = site.get("blog/post.html")
+        assert served is not None
+        self.assertEqual(served.data, b"post")
+        self.assertEqual(served.last_modified, "Thu, 01 Jan 1970 00:00:00 GMT")
+        self.assertEqual(len(served.etag), 66)
+        self.assertEqual((site.entries, site.size), (1, 4))
+        self.assertTrue(site.is_directory("blog"))
+        self.assertFalse(site.is_directory("blog/post.html"))
+
+    def test_same_content_gives_the_same_etag(self):
+        site = MemorySite()
+        site.add_bytes("a.html", b"same")
+        site.add_bytes("b.html", b"same")
+        site.add_bytes("c.html", b"other")
+        etags = {name: site.get(name).etag for name in site}  # type: ignore
+        self.assertEqual(etags["a.html"], etags["b.html"])
+        self.assertNotEqual(etags["a.html"], etags["c.html"])
+
+
+class TestMemoryBuild(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write("content/index.md", "# Home\n\nWelcome")
+        self.write("content/blog/post.md", "# Post\n\nA **post**")
+        self.write("content/blog/second.md", "# Second")
+        self.write("static/index.css", "body {}")
+        self.write("static/index.html", "static")
+        self.write(
+            "template.html",
+            "<title>{{ Title }}</title>{{ Breadcrumbs }}{{ Content }}{{ Prev }}",
+        )
+        self.arguments = [
+            self.path("content"),
+            self.path("template.html"),
+            self.path("static"),
+        ]
+
+    def test_same_files_as_build_site_without_writing(self):
+        before = sorted(os.listdir(self.root))
+        site = memory_site(*self.arguments, log=lambda _: None, workers=2)
+        self.assertEqual(sorted(os.listdir(self.root)), before)
+        build_site(*self.arguments, self.path("public"), log=lambda _: None)
+        expected = self.read_tree(self.path("public"))
+        self.assertIn(b'rel="prev"', expected["blog/second.html"])
+        self.assertIn("blog/index.html", expected)
+        files = {name: site.get(name).data for name in site}  # type: ignore
+        self.assertEqual(files, expected)
+
+    def test_serves_generated_section_indexes(self):
+        site = memory_site(*self.arguments, log=lambda _: None)
+        server = make_memory_server(site, 0, QuietHandler)
+        thread = threading.Thread(target=server.serve_forever, args=(0.01,))
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        connection = http.client.HTTPConnection("localhost", server.server_address[1])
+        self.addCleanup(connection.close)
+        connection.request("GET", "/blog/")
+        response = connection.getresponse()
+        body = response.read()
+        self.assertEqual(response.status, 200)
+        self.assertIn(b'<nav class="breadcrumbs"><a href="/">Home</a>', body)
+        self.assertIn(b'<a href="/blog/second.html">Second</a>', body)
+
+
+class TestMemoryFileHandler(unittest.TestCase):
+
+    def setUp(self):
+        self.site = MemorySite()
+        self.content = bytes(range(256)) * 4
+        self.site.add_bytes("data.bin", self.content)
+        self.site.add_bytes("index.html", b"<p>home</p>")
+        self.site.add_bytes("blog/index.html", b"<p>blog</p>")
+        self.site.add_bytes("blog/my post.html", b"<p>post</p>")
+        self.server = make_memory_server(self.site, 0, QuietHandler)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, args=(0.01,)
+        )
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def request(self, method: str, path: str, **headers):
+        connection = http.client.HTTPConnection(
+            "localhost", self.server.server_address[1]
+        )
+        connection.request(method, path, headers=headers)
+        response = connection.getresponse()
+        body = response.read()
+        connection.close()
+        return response, body
+
+    def test_files_and_indexes(self):
+        for path, body in [
+            ("/", b"<p>home</p>"),
+            ("/blog/", b"<p>blog</p>"),
+            ("/blog/my%20post.html?q=1", b"<p>post</p>"),
+            ("/blog/../data.bin", self.content),
+        ]:
+            with self.subTest(path):
+                response, content = self.request("GET", path)
+                self.assertEqual(response.status, 200)
+                self.assertEqual(content, body)
+        response, _ = self.request("HEAD", "/index.html")
+        self.assertEqual(response.getheader("Content-Type"), "text/html")
+        self.assertEqual(response.getheader("Content-Length"), "11")
+
+    def test_directory_is_redirected(self):
+        response, _ = self.request("GET", "/blog?page=2")
+        self.assertEqual(response.status, 301)
+        self.assertEqual(response.getheader("Location"), "/blog/?page=2")
+
+    def test_missing_file(self):
+        response, _ = self.request("GET", "/missing.html")
+        self.assertEqual(response.status, 404)
+        self.assertEqual(self.site.stats()["misses"], 1)
+
+    def test_range_and_not_modified(self):
+        response, body = self.request("GET", "/data.bin", Range="bytes=10-19")
+        self.assertEqual(response.status, 206)
+        self.assertEqual(body, self.content[10:20])
+        etag = response.getheader("ETag")
+        self.assertEqual(etag, self.site.get("data.bin").etag)  # type: ignore
+        response, body = self.request("GET", "/data.bin", **{"If-None-Match": etag})
+        self.assertEqual(response.status, 304)
+        self.assertEqual(body, b"")
+        self.assertEqual(self.site.stats()["hit_bytes"], 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
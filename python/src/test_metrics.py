@@ -0,0 +1,99 @@
+import json
+import os
+import tempfile
+import unittest
+
+from build import build_site
+from metrics import BuildMetrics, html_elements, metrics_path, write_metrics
+from site_testcase import SiteTestCase
+
+
+class TestBuildMetrics(unittest.TestCase):
+
+    def test_html_elements(self):
+        html = '<!DOCTYPE html><p>a <a href="b">&lt;b&gt;</a><br></p><!-- c -->'
+        self.assertEqual(html_elements(html), 3)
+
+    def test_formats(self):
+        metrics = BuildMetrics()
+        with metrics.stage("pages"):
+            metrics.add("pages_built", 2)
+        metrics.cache("pages", 3, 1)
+        metrics.finish()
+        values = metrics.to_dict()
+        self.assertEqual(values["counts"], {"pages_built": 2})
+        self.assertEqual(values["caches"]["pages"]["hit_ratio"], 0.75)
+        self.assertGreater(values["peak_memory_bytes"], 0)
+        lines = metrics.to_prometheus().splitlines()
+        self.assertIn("# TYPE ssg_build_pages_built gauge", lines)
+        self.assertIn("ssg_build_pages_built 2", lines)
+        self.assertIn('ssg_build_cache_hit_ratio{cache="pages"} 0.75', lines)
+        stage = 'ssg_build_stage_duration_seconds{stage="pages"} '
+        self.assertTrue(any(line.startswith(stage) for line in lines))
+
+    def test_write_by_extension(self):
+        metrics = BuildMetrics()
+        metrics.finish()
+        with tempfile.TemporaryDirectory() as root:
+            write_metrics(metrics, os.path.join(root, "ssg.prom"))
+            write_metrics(metrics, os.path.join(root, "metrics/ssg.json"))
+            self.assertEqual(sorted(os.listdir(root)), ["metrics", "ssg.prom"])
+            with open(os.path.join(root, "ssg.prom")) as handle:
+                self.assertTrue(handle.read().startswith("# HELP ssg_build_"))
+            with open(os.path.join(root, "metrics/ssg.json")) as handle:
+                self.assertEqual(json.load(handle), metrics.to_dict())
+
+
+class TestBuildSiteMetrics(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write("content/index.md", "# Home\n\nWelcome")
+        self.write("content/blog/post.md", "# Post")
+        self.write("static/index.css", "body {}")
+        self.write("template.html", "<main>{{ Content }}</main>")
+        self.stat_cache_path = self.path("stat.sqlite")
+
+    def build(self) -> dict:
+        build_site(
+            self.path("content"),
+            self.path("template.html"),
+            self.path("static"),
+            self.path("public"),
+            log=lambda _: None,
+            stat_cache_path=self.stat_cache_path,
+        )
+        with open(metrics_path(self.stat_cache_path)) as handle:
+            return json.load(handle)
+
+    def test_every_build_writes_its_metrics(self):
+        first = self.build()
+        pages = ["index.html", "blog/post.html", "blog/index.html"]
+        written = sum(
+            os.path.getsize(self.path("public", page)) for page in pages
+        )
+        self.assertEqual(
+            first["counts"],
+            {
+                "bytes_read": 7 + 15 + 6,
+                "bytes_written": written + 7,
+                "files_copied": 1,
+                "html_elements": 13,
+                "indexes_built": 1,
+                "outputs_deleted": 0,
+                "outputs_skipped": 0,
+                "pages_built": 3,
+            },
+        )
+        self.assertEqual(
+            set(first["stages"]),
+            {"plan", "copy", "pages", "publish", "record", "manifest"},
+        )
+        self.assertEqual(first["caches"]["pages"]["misses"], 3)
+        second = self.build()
+        self.assertEqual(second["counts"]["outputs_skipped"], 4)
+        self.assertNotIn("pages_built", second["counts"])
+
+
+if __name__ == "__main__":
+    unittest.main()
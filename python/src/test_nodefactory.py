@@ -0,0 +1,61 @@
+import unittest
+
+from block_md import markdown_to_html_node
+from htmlnode import LeafNode, ParentNode
+from nodefactory import NodeFactory
+
+
+class TestNodeFactory(unittest.TestCase):
+
+    def test_same_leaf_is_shared(self):
+        factory = NodeFactory()
+        first = factory.leaf("a", "link", {"href": "/"})
+        second = factory.leaf("a", "link", {"href": "/"})
+        self.assertIs(first, second)
+        self.assertEqual((factory.hits, factory.misses), (1, 1))
+
+    def test_different_props_are_not_shared(self):
+        factory = NodeFactory()
+        first = factory.leaf("a", "link", {"href": "/"})
+        second = factory.leaf("a", "link", {"href": "/other"})
+        self.assertIsNot(first, second)
+
+    def test_same_subtree_is_shared(self):
+        factory = NodeFactory()
+        tree = ParentNode("p", [LeafNode("b", "bold"), LeafNode(None, " text")])
+        first = factory.intern(tree)
+        second = factory.intern(
+            ParentNode("p", [LeafNode("b", "bold"), LeafNode(None, " text")])
+        )
+        self.assertIs(first, second)
+        self.assertEqual(first, tree)
+        self.assertEqual(len(factory), 3)
+
+    def test_interned_html(self):
+        factory = NodeFactory()
+        tree = ParentNode("p", [LeafNode("a", "x", {"href": "/"})])
+        interned = factory.intern(tree)
+        self.assertEqual(interned.to_html(), tree.to_html())
+        self.assertIs(interned.to_html(), interned.to_html())
+
+    def test_interned_nodes_are_immutable(self):
+        node = NodeFactory().leaf("b", "bold")
+
+        def mutate():
+            node.value = "other"
+
+        self.assertRaisesRegex(AttributeError, "immutable", mutate)
+
+    def test_interned_props_are_copied(self):
+        props = {"href": "/"}
+        node = NodeFactory().leaf("a", "link", props)
+        props["href"] = "/other"
+        self.assertEqual(node.to_html(), '<a href="/">link</a>')
+
+    def test_markdown_with_factory(self):
+        factory = NodeFactory()
+        markdown = "Some **bold** text\n\n* a **bold** item"
+        first = markdown_to_html_node(markdown, factory)
+        second = markdown_to_html_node(markdown, factory)
+        self.assertIs(first, second)
+        self.assertEqual(first.to_html(), markdown_to_html_node(markdown).to_html())
@@ -0,0 +1,35 @@
+import unittest
+
+from page import convert_markdown, extract_title, render_page
+from template import compile_template
+
+
+class TestExtractTitle(unittest.TestCase):
+
+    def test_title(self):
+        self.assertEqual(extract_title("# A title\n\nSome text"), "A title")
+
+    def test_raise_if_missing_title(self):
+        self.assertRaisesRegex(
+            ValueError, "Missing title", lambda: extract_title("Some text")
+        )
+
+
+class TestRenderPage(unittest.TestCase):
+
+    def test_front_matter_cannot_leave_an_attribute(self):
+        document = convert_markdown(
+            '---\ndescription: x" onload="alert(1)\n---\n# A "quoted" <title>'
+        )
+        template = compile_template(
+            '<meta content="{{ description }}"><title>{{ Title }}</title>'
+        )
+        self.assertEqual(
+            render_page(document, template),
+            '<meta content="x&quot; onload=&quot;alert(1)">'
+            "<title>A &quot;quoted&quot; &lt;title&gt;</title>",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
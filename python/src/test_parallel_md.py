@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import parallel_md
+from block_md import markdown_to_html_node
+from highlight import cache_dir, set_cache_dir
+from parallel_md import markdown_to_html
+from toc import TableOfContents
+
+_section = """## Reference
+
+A paragraph with **bold**, *italic* and a [link](https://boot.dev).
+
+## Reference
+
+```python
+def f():
+    return "f"
+```
+
+- an item
+- another
+
+> a quote
+
+1. one
+2. two
+"""
+
+
+class TestParallelMarkdown(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # One directory for the whole class, as every cache directory gets
+        # its own pools
+        cls.dir = tempfile.TemporaryDirectory()
+        cls.previous = set_cache_dir(cls.dir.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        set_cache_dir(cls.previous)
+        cls.dir.cleanup()
+
+    def convert(self, markdown: str) -> tuple:
+        toc = TableOfContents()
+        return markdown_to_html(markdown, toc, workers=2), toc.entries
+
+    def test_same_html_and_headings_as_the_serial_conversion(self):
+        markdown = "# Title\n\n" + _section * 200 + "\n\n\n\n"
+        expected_toc = TableOfContents()
+        expected = markdown_to_html_node(markdown, toc=expected_toc).to_html()
+        with (
+            patch.object(parallel_md, "PARALLEL_THRESHOLD", 0),
+            patch.object(parallel_md, "CHUNK_SIZE", 500),
+        ):
+            html, entries = self.convert(markdown)
+        self.assertEqual(html, expected)
+        self.assertEqual(entries, expected_toc.entries)
+        self.assertEqual(entries[2][1], "reference-1")
+
+    def test_pools_are_kept_per_worker_count(self):
+        pool = parallel_md._get_executor(2)
+        self.assertIsNot(parallel_md._get_executor(3), pool)
+        self.assertIs(parallel_md._get_executor(2), pool)
+        # Not forked from a process whose other threads may hold locks
+        self.assertNotEqual(pool._mp_context.get_start_method(), "fork")
+        self.assertEqual(pool.submit(len, "ab").result(), 2)
+
+    def test_workers_use_the_cache_directory_of_the_caller(self):
+        pool = parallel_md._get_executor(2)
+        expected = os.path.abspath(self.dir.name)
+        self.assertEqual(pool.submit(cache_dir).result(), expected)
+        previous = set_cache_dir(None)
+        try:
+            disabled = parallel_md._get_executor(2)
+            self.assertIsNot(disabled, pool)
+            self.assertIsNone(disabled.submit(cache_dir).result())
+        finally:
+            set_cache_dir(previous)
+
+    def test_small_documents_are_converted_serially(self):
+        with patch.object(parallel_md, "_get_executor") as get_executor:
+            html, _ = self.convert("# Title\n\nSmall")
+        get_executor.assert_not_called()
+        self.assertEqual(html, "<div><h1 id=\"title\">Title</h1><p>Small</p></div>")
+
+
+if __name__ == "__main__":
+    unittest.main()
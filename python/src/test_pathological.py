@@ -0,0 +1,107 @@
+import os
+import time
+import unittest
+from typing import Callable
+
+from block_md import markdown_to_html_node
+from highlight import tokenize
+from inline_md import text_to_text_nodes
+
+# Every input is parsed at two sizes. Linear parsing takes about _SCALE times
+# longer on the larger one and quadratic parsing _SCALE ** 2 times, so a
+# ratio above _MAX_RATIO fails whatever the speed of the machine.
+# Below a few thousand characters fixed costs dominate, so the smaller size
+# is not too small.
+_SCALE = 8
+_MAX_RATIO = 24
+# Shorter durations are mostly noise. A quadratic parser still takes seconds
+# on the larger size
+_MIN_DURATION = 0.005
+_SIZE = 16_000
+# Set SSG_SLOW_TESTS to parse paragraphs of 5 MB
+_BIG_SIZE = 5_000_000 if os.environ.get("SSG_SLOW_TESTS") else 200_000
+_BIG_BUDGET = 5.0
+
+
+def _duration(parse: Callable[[str], object], text: str) -> float:
+    best = float("inf")
+    for _ in range(2):
+        started = time.perf_counter()
+        parse(text)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _markdown(text: str) -> str:
+    return markdown_to_html_node(text).to_html()
+
+
+def _repeat(unit: str) -> Callable[[int], str]:
+    """gives a function making a text of the given size out of a unit"""
+    return lambda size: (unit * (size // len(unit) + 1))[:size]
+
+
+_inputs = {
+    "unmatched brackets": "[",
+    "unmatched bracketed words": "[a ",
+    "unmatched images": "![a",
+    "unclosed urls": "[a](",
+    "nested brackets": "[[a]",
+    "asterisks": "*",
+    "double asterisks": "**a ",
+    "backticks": "`a ",
+    "underscores and stars": "_*",
+    "spaces": " ",
+}
+
+
+class TestPathologicalInput(unittest.TestCase):
+
+    def assertLinear(
+        self, parse: Callable[[str], object], make: Callable[[int], str]
+    ):
+        # A first run warms up the caches of the regular expressions
+        parse(make(_SIZE // _SCALE))
+        small = _duration(parse, make(_SIZE))
+        large = _duration(parse, make(_SIZE * _SCALE))
+        self.assertLess(large, _MAX_RATIO * max(small, _MIN_DURATION))
+
+    def test_inline_parsing_is_linear(self):
+        for name, unit in _inputs.items():
+            with self.subTest(name):
+                self.assertLinear(text_to_text_nodes, _repeat(unit))
+
+    def test_block_parsing_is_linear(self):
+        for name, unit in _inputs.items():
+            with self.subTest(name):
+                self.assertLinear(_markdown, _repeat(unit))
+        with self.subTest("many short lines"):
+            self.assertLinear(_markdown, _repeat("a  \n  "))
+        with self.subTest("many blocks"):
+            self.assertLinear(_markdown, _repeat("# a\n\n- b\n\n> c\n\n"))
+
+    def test_highlighting_is_linear(self):
+        for language, unit in [
+            ("c", "/*"),
+            ("c", '"\\"'),
+            ("python", '"""\\'),
+            ("python", "'\\'"),
+            ("javascript", "`\\`"),
+            ("css", "/* *"),
+        ]:
+            with self.subTest(language=language, unit=unit):
+                self.assertLinear(
+                    lambda code: tokenize(language, code), _repeat(unit)
+                )
+
+    def test_big_paragraphs_are_parsed_in_time(self):
+        for name, unit in _inputs.items():
+            with self.subTest(name):
+                text = _repeat(unit)(_BIG_SIZE)
+                started = time.perf_counter()
+                _markdown(text)
+                self.assertLess(time.perf_counter() - started, _BIG_BUDGET)
+
+
+if __name__ == "__main__":
+    unittest.main()
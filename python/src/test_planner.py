@@ -0,0 +1,213 @@
+import os
+import time
+
+from build import build_site
+from planner import StatCache, plan_build
+from site_testcase import SiteTestCase
+
+
+class TestPlanner(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write("content/index.md", "# Home")
+        self.write("content/blog/post.md", "# Post")
+        self.write("static/index.css", "body {}")
+        self.write("template.html", "{{ Content }}")
+        self.stat_cache_path = self.path("stat.sqlite")
+
+    def build(self, dry_run: bool = False):
+        return build_site(
+            self.path("content"),
+            self.path("template.html"),
+            self.path("static"),
+            self.path("public"),
+            log=lambda _: None,
+            dry_run=dry_run,
+            stat_cache_path=self.stat_cache_path,
+        )
+
+    def plan(self):
+        with StatCache(self.stat_cache_path) as stat_cache:
+            return plan_build(
+                self.path("content"),
+                self.path("template.html"),
+                self.path("static"),
+                self.path("public"),
+                stat_cache,
+            )
+
+    def test_first_build_is_full(self):
+        plan = self.build()
+        self.assertTrue(plan.full)
+        # Two pages, a static file and the generated index of the blog
+        self.assertEqual(len(plan.new), 4)
+        self.assertTrue(os.path.exists(self.path("public/blog/post.html")))
+        self.assertTrue(os.path.exists(self.path("public/blog/index.html")))
+
+    def test_unchanged_site_has_nothing_to_do(self):
+        self.build()
+        plan = self.plan()
+        self.assertFalse(plan.full)
+        self.assertEqual(list(plan.actions()), [])
+        self.assertEqual(plan.unchanged, 4)
+
+    def test_changed_page(self):
+        self.build()
+        self.write("content/blog/post.md", "# Post\n\nMore")
+        plan = self.build()
+        self.assertEqual(
+            [a.dest for a in plan.changed], [self.path("public/blog/post.html")]
+        )
+        with open(self.path("public/blog/post.html")) as handle:
+            self.assertEqual(
+                handle.read(), '<div><h1 id="post">Post</h1><p>More</p></div>'
+            )
+
+    def test_changed_title_changes_navigation(self):
+        self.build()
+        self.write("content/blog/post.md", "# Another post")
+        plan = self.build()
+        self.assertEqual(
+            [a.dest for a in plan.changed],
+            [
+                self.path("public/blog/index.html"),
+                self.path("public/blog/post.html"),
+                self.path("public/index.html"),
+            ],
+        )
+        self.assertEqual(list(self.plan().actions()), [])
+
+    def test_touched_file_is_not_changed(self):
+        self.build()
+        now = time.time() + 10
+        os.utime(self.path("content/index.md"), (now, now))
+        plan = self.build()
+        self.assertEqual(list(plan.actions()), [])
+        self.assertEqual(len(plan.refreshed), 1)
+        self.assertEqual(len(self.plan().refreshed), 0)
+
+    def test_new_static_file(self):
+        self.build()
+        self.write("static/images/a.png", "png")
+        plan = self.build()
+        self.assertEqual(
+            [a.dest for a in plan.new], [self.path("public/images/a.png")]
+        )
+        self.assertTrue(os.path.exists(self.path("public/images/a.png")))
+
+    def test_deleted_page_removes_orphan(self):
+        self.build()
+        os.remove(self.path("content/blog/post.md"))
+        plan = self.build()
+        self.assertEqual(
+            plan.deleted,
+            [self.path("public/blog/index.html"), self.path("public/blog/post.html")],
+        )
+        self.assertFalse(os.path.exists(self.path("public/blog")))
+        self.assertEqual(self.plan().deleted, [])
+
+    def test_template_change_rebuilds_pages(self):
+        self.build()
+        self.write("template.html", "<main>{{ Content }}</main>")
+        plan = self.build()
+        self.assertEqual(len(plan.changed), 3)
+        self.assertTrue(all(a.kind in ("page", "index") for a in plan.changed))
+
+    def test_partial_change_rebuilds_pages(self):
+        self.write("template.html", "{{> nav }}{{ Content }}")
+        self.write("partials/nav.html", "<nav></nav>")
+        self.build()
+        self.write("partials/nav.html", "<nav>home</nav>")
+        self.assertEqual(len(self.build().changed), 3)
+        with open(self.path("public/index.html")) as handle:
+            self.assertEqual(
+                handle.read(), '<nav>home</nav><div><h1 id="home">Home</h1></div>'
+            )
+        self.write("partials/footer.html", "")
+        self.assertEqual(len(self.build().changed), 3)
+        os.remove(self.path("partials/footer.html"))
+        self.assertEqual(len(self.build().changed), 3)
+        self.assertEqual(list(self.plan().actions()), [])
+
+    def read(self, relative: str) -> str:
+        with open(self.path(relative)) as handle:
+            return handle.read()
+
+    def test_layout_change_rebuilds_its_pages(self):
+        self.write("template.html", "{{> nav }}{{ Content }}")
+        self.write("partials/nav.html", "<nav></nav>")
+        self.write("content/blog/_layout.html", "<main>{{> nav }}{{ Content }}</main>")
+        self.write("content/blog/2024/old.md", "# Old")
+        self.build()
+        self.assertTrue(self.read("public/blog/post.html").startswith("<main><nav>"))
+        self.assertTrue(self.read("public/blog/2024/old.html").startswith("<main>"))
+        self.assertTrue(self.read("public/blog/index.html").startswith("<main>"))
+        self.assertTrue(self.read("public/index.html").startswith("<nav>"))
+
+        self.write("content/blog/_layout.html", "<article>{{ Content }}</article>")
+        plan = self.build()
+        blog = ["blog/2024/index.html", "blog/2024/old.html"]
+        blog += ["blog/index.html", "blog/post.html"]
+        self.assertEqual(
+            [a.dest for a in plan.changed],
+            [self.path(f"public/{relative}") for relative in blog],
+        )
+        self.assertTrue(self.read("public/blog/post.html").startswith("<article>"))
+
+        self.write("template.html", "<body>{{ Content }}</body>")
+        plan = self.build()
+        self.assertEqual(
+            [a.dest for a in plan.changed], [self.path("public/index.html")]
+        )
+
+    def test_added_and_removed_layouts_move_pages(self):
+        self.build()
+        self.write("content/blog/_layout.html", "<main>{{ Content }}</main>")
+        plan = self.build()
+        self.assertEqual(
+            [a.dest for a in plan.changed],
+            [self.path("public/blog/index.html"), self.path("public/blog/post.html")],
+        )
+        os.remove(self.path("content/blog/_layout.html"))
+        plan = self.build()
+        self.assertEqual(len(plan.changed), 2)
+        self.assertEqual(
+            self.read("public/blog/post.html"),
+            '<div><h1 id="post">Post</h1></div>',
+        )
+        self.assertEqual(list(self.plan().actions()), [])
+
+    def test_dry_run_writes_nothing(self):
+        self.build()
+        self.write("content/new.md", "# New")
+        lines = []
+        build_site(
+            self.path("content"),
+            self.path("template.html"),
+            self.path("static"),
+            self.path("public"),
+            log=lines.append,
+            dry_run=True,
+            stat_cache_path=self.stat_cache_path,
+        )
+        # A new page changes the navigation of every other page
+        self.assertEqual(
+            lines,
+            [
+                f"new: {self.path('public/new.html')}",
+                f"changed: {self.path('public/blog/index.html')}",
+                f"changed: {self.path('public/blog/post.html')}",
+                f"changed: {self.path('public/index.html')}",
+                "1 new, 3 changed, 0 deleted, 1 unchanged",
+            ],
+        )
+        self.assertFalse(os.path.exists(self.path("public/new.html")))
+
+    def test_missing_output_directory_is_full_build(self):
+        self.build()
+        # The destination is a link to the published version
+        os.remove(self.path("public"))
+        plan = self.build()
+        self.assertTrue(plan.full)
+        self.assertTrue(os.path.exists(self.path("public/index.html")))
@@ -0,0 +1,122 @@
+import os
+import tempfile
+import unittest
+
+from site_tree import SiteTree, read_title, section_source
+
+
+class TestSiteTree(unittest.TestCase):
+
+    def setUp(self):
+        self.site = SiteTree("content", "public")
+        pages = [
+            ("index.md", "Home page"),
+            ("about.md", "About"),
+            ("blog/a.md", "First"),
+            ("blog/b.md", "Second"),
+            ("blog/c.md", "Third"),
+            ("blog/2024/d.md", "Old <post>"),
+        ]
+        for relative, title in pages:
+            dest = os.path.join("public", relative.removesuffix(".md") + ".html")
+            self.site.add_page(f"content/{relative}", relative, dest, title)
+        self.site.finish()
+
+    def test_urls(self):
+        self.assertEqual(self.site.page("content/index.md").url, "/")
+        self.assertEqual(self.site.page("content/blog/a.md").url, "/blog/a.html")
+
+    def test_prev_and_next(self):
+        navigation = self.site.navigation("content/blog/b.md")
+        self.assertEqual(
+            navigation["Prev"], '<a href="/blog/a.html" rel="prev">First</a>'
+        )
+        self.assertEqual(
+            navigation["Next"], '<a href="/blog/c.html" rel="next">Third</a>'
+        )
+        self.assertEqual(self.site.navigation("content/blog/a.md")["Prev"], "")
+        self.assertEqual(self.site.navigation("content/blog/c.md")["Next"], "")
+
+    def test_breadcrumbs(self):
+        self.assertEqual(
+            self.site.navigation("content/blog/2024/d.md")["Breadcrumbs"],
+            '<nav class="breadcrumbs"><a href="/">Home page</a> / '
+            '<a href="/blog/">Blog</a> / <a href="/blog/2024/">2024</a> / '
+            "<span>Old &lt;post&gt;</span></nav>",
+        )
+        self.assertEqual(
+            self.site.navigation("content/index.md")["Breadcrumbs"],
+            '<nav class="breadcrumbs"><span>Home page</span></nav>',
+        )
+
+    def test_generated_indexes(self):
+        self.assertEqual(
+            [(page.dest, page.title) for page in self.site.generated_indexes()],
+            [
+                (os.path.join("public", "blog", "2024", "index.html"), "2024"),
+                (os.path.join("public", "blog", "index.html"), "Blog"),
+            ],
+        )
+        source = section_source("content", "blog")
+        metadata, title, html, toc = self.site.index_document(source)
+        self.assertEqual(title, "Blog")
+        self.assertEqual(
+            html,
+            '<div><h1>Blog</h1><ul class="section-index">'
+            '<li><a href="/blog/a.html">First</a></li>'
+            '<li><a href="/blog/b.html">Second</a></li>'
+            '<li><a href="/blog/c.html">Third</a></li>'
+            '<li><a href="/blog/2024/">2024</a></li></ul></div>',
+        )
+        self.assertEqual(
+            self.site.navigation(source)["Breadcrumbs"],
+            '<nav class="breadcrumbs"><a href="/">Home page</a> / '
+            "<span>Blog</span></nav>",
+        )
+
+    def test_forgotten_section_is_still_listed(self):
+        site = SiteTree("content", "public")
+        site.add_page("content/blog/a.md", "blog/a.md", "public/blog/a.html", "A")
+        index = site.finish_section("blog")
+        assert index is not None
+        self.assertEqual(index.dest, os.path.join("public", "blog", "index.html"))
+        self.assertIsNone(site.finish_section("blog"))
+        site.forget_section("blog")
+        self.assertRaises(KeyError, site.page, "content/blog/a.md")
+        self.assertRaises(KeyError, site.page, index.source)
+        site.finish_section("")
+        metadata, title, html, toc = site.index_document(section_source("content", ""))
+        self.assertIn('<li><a href="/blog/">Blog</a></li>', html)
+
+    def test_signature_changes_with_titles(self):
+        other = SiteTree("content", "public")
+        other.add_page("content/index.md", "index.md", "public/index.html", "Home")
+        other.finish()
+        same = SiteTree("content", "public")
+        same.add_page("content/index.md", "index.md", "public/index.html", "Home")
+        self.assertEqual(other.signature(), same.finish().signature())
+        self.assertNotEqual(other.signature(), self.site.signature())
+
+
+class TestReadTitle(unittest.TestCase):
+
+    def test_read_title(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "page.md")
+            for content, title in [
+                ("---\ntitle: From front matter\n---\n# Heading", "From front matter"),
+                ("# Heading\n\ntext", "Heading"),
+                ("no heading", "page"),
+            ]:
+                with open(path, "w") as handle:
+                    handle.write(content)
+                self.assertEqual(read_title(path), title)
+
+    def test_read_title_stops_after_the_first_block(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "page.md")
+            # Decoding the end of the file would fail
+            with open(path, "wb") as handle:
+                handle.write(b"---\ndate: today\n---\n# Heading\n\n")
+                handle.write(b"text\n" * 100_000 + b"\xff")
+            self.assertEqual(read_title(path), "Heading")
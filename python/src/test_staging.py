@@ -0,0 +1,112 @@
+import os
+from unittest.mock import patch
+
+import build
+from build import build_site
+from site_testcase import SiteTestCase
+from staging import versions_dir
+
+
+class TestStagedBuild(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write("content/index.md", "# Home")
+        self.write("content/a.md", "# A")
+        self.write("content/b.md", "# B")
+        self.write("static/index.css", "body {}")
+        self.write("template.html", "{{ Content }}")
+        self.public = self.path("public")
+
+    def read(self, path: str) -> str:
+        with open(path) as handle:
+            return handle.read()
+
+    def build(self):
+        lines = []
+        build_site(
+            self.path("content"),
+            self.path("template.html"),
+            self.path("static"),
+            self.public,
+            log=lines.append,
+        )
+        return lines
+
+    def test_destination_links_to_the_published_version(self):
+        self.build()
+        self.assertTrue(os.path.islink(self.public))
+        self.assertEqual(
+            os.path.dirname(os.path.realpath(self.public)),
+            os.path.realpath(versions_dir(self.public)),
+        )
+        self.assertEqual(
+            self.read(os.path.join(self.public, "a.html")),
+            '<div><h1 id="a">A</h1></div>',
+        )
+
+    def test_previous_version_is_kept_and_never_modified(self):
+        self.build()
+        first = os.path.realpath(self.public)
+        self.write("content/a.md", "# A\n\nchanged")
+        self.build()
+        second = os.path.realpath(self.public)
+        self.assertNotEqual(first, second)
+        self.assertEqual(
+            self.read(os.path.join(first, "a.html")), '<div><h1 id="a">A</h1></div>'
+        )
+        self.assertIn("changed", self.read(os.path.join(second, "a.html")))
+        self.write("content/a.md", "# A\n\nagain")
+        self.build()
+        self.assertFalse(os.path.exists(first))
+        third = os.path.realpath(self.public)
+        self.assertEqual(
+            sorted(os.listdir(versions_dir(self.public))),
+            sorted(os.path.basename(path) for path in (second, third)),
+        )
+
+    def test_build_without_changes_publishes_nothing(self):
+        self.build()
+        published = os.readlink(self.public)
+        versions = os.listdir(versions_dir(self.public))
+        # A touched source is refreshed in the stat cache, not rebuilt
+        os.utime(self.path("content/a.md"), (0, 0))
+        lines = self.build()
+        self.assertEqual(lines, [])
+        self.assertEqual(os.readlink(self.public), published)
+        self.assertEqual(os.listdir(versions_dir(self.public)), versions)
+
+    def test_killed_build_is_resumed(self):
+        self.build()
+        published = os.path.realpath(self.public)
+        self.write("content/a.md", "# A\n\nnew")
+        self.write("content/b.md", "# B\n\nnew")
+        generate_page = build.generate_page
+        calls = []
+
+        def fail_on_second_page(*args, **kwargs):
+            calls.append(args[0])
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return generate_page(*args, **kwargs)
+
+        with patch.object(build, "generate_page", fail_on_second_page):
+            with self.assertRaises(KeyboardInterrupt):
+                self.build()
+        # The published site did not change
+        self.assertEqual(os.path.realpath(self.public), published)
+        self.assertEqual(
+            self.read(os.path.join(self.public, "a.html")),
+            '<div><h1 id="a">A</h1></div>',
+        )
+        lines = self.build()
+        self.assertEqual(lines[0], "Resuming an interrupted build, 1 outputs done")
+        self.assertEqual(len([line for line in lines if "Generating" in line]), 1)
+        self.assertIn("new", self.read(os.path.join(self.public, "a.html")))
+        self.assertIn("new", self.read(os.path.join(self.public, "b.html")))
+
+    def test_plain_directory_is_replaced(self):
+        self.write("public/stale.html", "stale")
+        self.build()
+        self.assertTrue(os.path.islink(self.public))
+        self.assertFalse(os.path.exists(os.path.join(self.public, "stale.html")))
@@ -0,0 +1,192 @@
+import os
+import shutil
+import threading
+import time
+import tracemalloc
+import unittest
+from typing import Tuple
+
+from build import build_site
+from site_testcase import SiteTestCase
+from stream import bounded_map, render_pages, stream_site
+from template import compile_template
+
+# Set SSG_SLOW_TESTS to check the memory ceiling and the memory of a
+# streaming build on 100k page sites
+_slow = bool(os.environ.get("SSG_SLOW_TESTS"))
+_synthetic_pages = 100_000 if _slow else 5_000
+_memory_ceiling = 512 * 1024
+_site_pages = 100_000 if _slow else 1_000
+_directory_pages = 25
+# Discovery remembers every directory it walked, to skip one linked twice
+_directory_bytes = 256
+_memory_slack = 32 * 1024
+_template = "<title>{{ Title }}</title>{{ Content }}"
+# The directory of the site template of the repository and its partials
+_site_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestBoundedMap(unittest.TestCase):
+
+    def test_order(self):
+        def slow_square(n: int) -> int:
+            time.sleep(0.001 * (n % 3))
+            return n * n
+
+        self.assertEqual(
+            list(bounded_map(slow_square, range(50), workers=4)),
+            [n * n for n in range(50)],
+        )
+
+    def test_items_are_pulled_lazily(self):
+        lock = threading.Lock()
+        live = [0, 0]
+
+        def items():
+            for n in range(200):
+                with lock:
+                    live[0] += 1
+                    live[1] = max(live[1], live[0])
+                yield n
+
+        for _ in bounded_map(lambda n: n, items(), workers=2, max_in_flight=3):
+            with lock:
+                live[0] -= 1
+        self.assertLessEqual(live[1], 3)
+
+    def test_errors_propagate(self):
+        def fail(n: int) -> int:
+            if n == 5:
+                raise ValueError("five")
+            return n
+
+        with self.assertRaisesRegex(ValueError, "five"):
+            list(bounded_map(fail, range(100)))
+
+    def test_memory_does_not_grow_with_the_site(self):
+        pages = ((str(n), f"{n}.html") for n in range(_synthetic_pages))
+        tracemalloc.start()
+        try:
+            count = 0
+            for _, html in render_pages(
+                pages, compile_template(_template), lambda n: f"# {n}"
+            ):
+                count += 1
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(count, _synthetic_pages)
+        self.assertLess(peak, _memory_ceiling)
+
+
+def _write_synthetic_site(root: str, pages: int) -> int:
+    """writes a site of pages in directories of _directory_pages, nested so
+    that a directory never holds more than ten subdirectories, and gives the
+    number of directories"""
+    directories = set()
+    for n in range(pages):
+        # The digits of the directory number name its path, always four deep
+        relative = os.path.join(*f"{n // _directory_pages:04d}")
+        directory = os.path.join(root, "content", relative)
+        if relative not in directories:
+            os.makedirs(directory, exist_ok=True)
+            while relative:
+                directories.add(relative)
+                relative = os.path.dirname(relative)
+        with open(os.path.join(directory, f"{n}.md"), "w") as handle:
+            handle.write(f"# Page {n}\n\nThe *text* of page {n}\n")
+    os.makedirs(os.path.join(root, "static"))
+    with open(os.path.join(root, "template.html"), "w") as handle:
+        handle.write(_template + "{{ Breadcrumbs }}{{ Prev }}{{ Next }}")
+    return len(directories)
+
+
+class TestStreamSite(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write("content/index.md", "# Home\n\nWelcome")
+        self.write("content/blog/post.md", "# Post\n\nA **post**")
+        self.write("content/images/logo.png", "png")
+        self.write("static/index.css", "body {}")
+        self.write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+
+    def test_same_output_as_build_site(self):
+        # Neither blog nor blog/drafts has an index.md
+        self.write("content/about.md", "# About")
+        self.write("content/blog/second.md", "# Second")
+        self.write("content/blog/drafts/draft.md", "# Draft")
+        self.write(
+            "content/blog/_layout.html",
+            "<main>{{ Breadcrumbs }}{{ Content }}{{ Prev }}{{ Next }}</main>",
+        )
+        shutil.copy(
+            os.path.join(_site_dir, "template.html"), self.path("template.html")
+        )
+        shutil.copytree(os.path.join(_site_dir, "partials"), self.path("partials"))
+        arguments = [
+            self.path("content"),
+            self.path("template.html"),
+            self.path("static"),
+        ]
+        build_site(*arguments, self.path("built"), log=lambda _: None)
+        count = stream_site(*arguments, self.path("streamed"), log=lambda _: None)
+        self.assertEqual(count, 7)
+        streamed = self.read_tree(self.path("streamed"))
+        self.assertEqual(streamed, self.read_tree(self.path("built")))
+        self.assertIn(b'<nav class="breadcrumbs">', streamed["about.html"])
+        self.assertIn(b'rel="next"', streamed["blog/post.html"])
+        self.assertTrue(streamed["blog/second.html"].startswith(b"<main>"))
+        self.assertIn(b"section-index", streamed["blog/index.html"])
+        self.assertIn(b"section-index", streamed["blog/drafts/index.html"])
+
+    def peak_memory(self, pages: int) -> Tuple[int, int]:
+        root = self.path(f"site-{pages}")
+        directories = _write_synthetic_site(root, pages)
+        tracemalloc.start()
+        try:
+            count = stream_site(
+                os.path.join(root, "content"),
+                os.path.join(root, "template.html"),
+                os.path.join(root, "static"),
+                os.path.join(root, "public"),
+                log=lambda _: None,
+                workers=2,
+                max_in_flight=4,
+            )
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        # Every directory is a section with a generated index
+        self.assertEqual(count, pages + directories + 1)
+        return peak, directories
+
+    def test_memory_does_not_grow_with_the_site(self):
+        # The first build fills the caches every build shares
+        self.peak_memory(_site_pages // 8)
+        small, small_directories = self.peak_memory(_site_pages // 4)
+        large, large_directories = self.peak_memory(_site_pages)
+        directories = large_directories - small_directories
+        self.assertLess(large, small + _memory_slack + directories * _directory_bytes)
+
+    def test_next_build_is_full(self):
+        arguments = [
+            self.path("content"),
+            self.path("template.html"),
+            self.path("static"),
+            self.path("public"),
+        ]
+        build_site(*arguments, log=lambda _: None)
+        stream_site(*arguments, log=lambda _: None)
+        self.assertTrue(build_site(*arguments, log=lambda _: None).full)
+
+    def test_raise_if_content_is_missing(self):
+        self.assertRaises(
+            FileNotFoundError,
+            lambda: stream_site(
+                self.path("missing"),
+                self.path("template.html"),
+                self.path("static"),
+                self.path("public"),
+            ),
+        )
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+
+from page import PageCache
+from template import compile_template, load_template, render_template
+
+
+class TestRenderTemplate(unittest.TestCase):
+
+    def test_replaces_placeholders(self):
+        template = "<title>{{ Title }}</title><time>{{date}}</time>"
+        context = {"Title": "A title", "date": "2024-07-01"}
+        self.assertEqual(
+            render_template(template, context),
+            "<title>A title</title><time>2024-07-01</time>",
+        )
+
+    def test_missing_placeholder_is_empty(self):
+        self.assertEqual(render_template("<p>{{ tags }}</p>", {}), "<p></p>")
+
+    def test_does_not_render_inserted_values(self):
+        template = "{{ Content }}{{ Title }}"
+        context = {"Content": "{{ Title }}", "Title": "x"}
+        self.assertEqual(render_template(template, context), "{{ Title }}x")
+
+
+class TestPartials(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.partials = os.path.join(self.dir.name, "partials")
+        os.makedirs(self.partials)
+        self.write("partials/head.html", '<meta charset="utf-8" />')
+        self.write("partials/header.html", "<h1>{{ site }}</h1>{{> nav }}")
+        self.write("partials/nav.html", "<nav>{{ section }}</nav>")
+        self.write("partials/loop.html", "{{> again }}")
+        self.write("partials/again.html", "{{> loop }}")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write(self, relative: str, content: str):
+        with open(os.path.join(self.dir.name, relative), "w") as handle:
+            handle.write(content)
+
+    def test_partials_are_included(self):
+        template = compile_template(
+            "{{> head }}{{> header }}{{ Content }}", self.partials
+        )
+        self.assertEqual(
+            template.render({"site": "S", "section": "blog", "Content": "c"}),
+            '<meta charset="utf-8" /><h1>S</h1><nav>blog</nav>c',
+        )
+        self.assertEqual(template.names, {"site", "section", "Content"})
+        self.assertEqual(
+            template.dependencies,
+            tuple(
+                os.path.join(self.partials, name)
+                for name in ["head.html", "header.html", "nav.html"]
+            ),
+        )
+
+    def test_constant_partials_are_inlined(self):
+        template = compile_template("<head>{{> head }}</head>", self.partials)
+        self.assertEqual(
+            template._segments, ('<head><meta charset="utf-8" /></head>',)
+        )
+
+    def test_partial_outputs_are_cached_by_their_inputs(self):
+        template = compile_template("{{> nav }}{{ Content }}", self.partials)
+        (partial, _) = template._segments
+        for content in ["a", "b", "c"]:
+            template.render({"section": "blog", "Content": content})
+        template.render({"section": "about", "Content": "d"})
+        self.assertEqual((partial.hits, partial.misses), (2, 2))
+
+    def test_raise_if_partial_is_missing(self):
+        self.assertRaisesRegex(
+            FileNotFoundError,
+            "does not exist",
+            lambda: compile_template("{{> footer }}", self.partials),
+        )
+
+    def test_raise_if_partial_includes_itself(self):
+        self.assertRaisesRegex(
+            ValueError,
+            "loop -> again -> loop",
+            lambda: compile_template("{{> loop }}", self.partials),
+        )
+
+    def test_load_template_reads_partials_next_to_it(self):
+        self.write("template.html", "{{> nav }}")
+        template = load_template(os.path.join(self.dir.name, "template.html"))
+        self.assertEqual(template.render({"section": "x"}), "<nav>x</nav>")
+
+    def test_page_cache_compiles_again_when_a_partial_changes(self):
+        path = os.path.join(self.dir.name, "template.html")
+        self.write("template.html", "{{> nav }}")
+        cache = PageCache()
+        self.assertEqual(cache.template(path).render({}), "<nav></nav>")
+        self.assertIs(cache.template(path), cache.template(path))
+        self.write("partials/nav.html", "<ul>{{ section }}</ul>")
+        self.assertEqual(cache.template(path).render({}), "<ul></ul>")
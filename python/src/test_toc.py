@@ -0,0 +1,88 @@
+import unittest
+
+from arena import markdown_to_arena
+from block_md import markdown_to_html_node
+from page import convert_markdown
+from toc import TableOfContents, slugify
+
+
+class TestSlugify(unittest.TestCase):
+
+    def test_slugify(self):
+        self.assertEqual(slugify("Hello, World!"), "hello-world")
+        self.assertEqual(
+            slugify("  snake_case and -dashes- "), "snake-case-and-dashes"
+        )
+        self.assertEqual(slugify("Ünïcode wörds"), "ünïcode-wörds")
+        self.assertEqual(slugify("?!"), "section")
+
+
+class TestTableOfContents(unittest.TestCase):
+
+    def test_ids_are_unique(self):
+        toc = TableOfContents()
+        ids = [toc.add(2, text) for text in ["Intro", "Intro", "Intro 1", "Intro"]]
+        self.assertEqual(ids, ["intro", "intro-1", "intro-1-1", "intro-2"])
+
+    def test_nested_lists(self):
+        toc = TableOfContents()
+        for level, text in [(1, "A"), (2, "B"), (3, "C"), (2, "D"), (1, "E")]:
+            toc.add(level, text)
+        self.assertEqual(
+            toc.to_html(),
+            '<ul class="toc"><li><a href="#a">A</a><ul>'
+            '<li><a href="#b">B</a><ul><li><a href="#c">C</a></li></ul></li>'
+            '<li><a href="#d">D</a></li></ul></li>'
+            '<li><a href="#e">E</a></li></ul>',
+        )
+
+    def test_skipped_levels(self):
+        toc = TableOfContents()
+        for level, text in [(2, "A"), (1, "B"), (1, "C"), (4, "D"), (3, "E")]:
+            toc.add(level, text)
+        self.assertEqual(
+            toc.to_html(),
+            '<ul class="toc"><li><a href="#a">A</a></li><li><a href="#b">B</a></li>'
+            '<li><a href="#c">C</a><ul><li><a href="#d">D</a></li>'
+            '<li><a href="#e">E</a></li></ul></li></ul>',
+        )
+
+    def test_empty(self):
+        self.assertEqual(TableOfContents().to_html(), "")
+
+    def test_text_is_escaped(self):
+        toc = TableOfContents()
+        toc.add(1, "a < b")
+        self.assertEqual(
+            toc.to_html(), '<ul class="toc"><li><a href="#a-b">a &lt; b</a></li></ul>'
+        )
+
+
+class TestHeadingAnchors(unittest.TestCase):
+
+    markdown = "# A *title*\n\nText\n\n## [Link](/x) `code`\n\n## A title"
+
+    def test_headings_are_collected_while_converting(self):
+        toc = TableOfContents()
+        html = markdown_to_html_node(self.markdown, toc=toc).to_html()
+        self.assertEqual(
+            toc.entries,
+            [
+                (1, "a-title", "A title"),
+                (2, "link-code", "Link code"),
+                (2, "a-title-1", "A title"),
+            ],
+        )
+        self.assertIn('<h1 id="a-title">A <i>title</i></h1>', html)
+        self.assertIn('<h2 id="a-title-1">A title</h2>', html)
+
+    def test_arena_has_the_same_ids(self):
+        self.assertEqual(
+            markdown_to_arena(self.markdown).to_html(),
+            markdown_to_html_node(self.markdown).to_html(),
+        )
+
+    def test_convert_markdown_gives_the_toc(self):
+        _, title, _, toc = convert_markdown(self.markdown)
+        self.assertEqual(title, "A *title*")
+        self.assertTrue(toc.startswith('<ul class="toc"><li><a href="#a-title">'))
@@ -0,0 +1,105 @@
+import os
+import stat
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import tree
+from tree import copy_file_tree, copy_files, fast_copy, get_files, remove_file
+
+
+class TestCopy(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.dir.name, "static")
+        self.dest = os.path.join(self.dir.name, "public")
+        self.files = {
+            "index.css": b"body {}",
+            "empty.txt": b"",
+            os.path.join("images", "a.png"): os.urandom(3 * 1024 * 1024 + 7),
+            os.path.join("images", "deep", "er", "b.png"): b"b",
+        }
+        for relative, content in self.files.items():
+            path = os.path.join(self.source, relative)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as handle:
+                handle.write(content)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def assertCopied(self):
+        for relative, content in self.files.items():
+            with open(os.path.join(self.dest, relative), "rb") as handle:
+                self.assertEqual(handle.read(), content, relative)
+
+    def test_copy_file_tree(self):
+        copy_file_tree(self.source, self.dest)
+        self.assertCopied()
+
+    def test_copy_file_tree_replaces_destination(self):
+        os.makedirs(os.path.join(self.dest, "stale"))
+        copy_file_tree(self.source, self.dest, workers=1)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "stale")))
+        self.assertCopied()
+
+    def test_raise_if_source_is_missing(self):
+        self.assertRaisesRegex(
+            FileNotFoundError,
+            "does not exist",
+            lambda: copy_file_tree(os.path.join(self.dir.name, "nope"), self.dest),
+        )
+
+    def test_buffered_fallback(self):
+        with patch.object(tree, "_use_copy_file_range", False), patch.object(
+            tree, "_use_sendfile", False
+        ):
+            copy_file_tree(self.source, self.dest)
+        self.assertCopied()
+
+    def test_sendfile_fallback(self):
+        with patch.object(tree, "_use_copy_file_range", False):
+            copy_file_tree(self.source, self.dest)
+        self.assertCopied()
+
+    def test_permissions_are_copied(self):
+        source = os.path.join(self.source, "index.css")
+        os.chmod(source, 0o640)
+        dest = os.path.join(self.dir.name, "copy.css")
+        fast_copy(source, dest)
+        self.assertEqual(stat.S_IMODE(os.stat(dest).st_mode), 0o640)
+
+    def test_copy_files(self):
+        pairs = [
+            (os.path.join(self.source, relative), os.path.join(self.dest, relative))
+            for relative in self.files
+        ]
+        copy_files(pairs)
+        self.assertCopied()
+
+    def test_symlink_loop_ends(self):
+        os.symlink(os.pardir, os.path.join(self.source, "images", "loop"))
+        os.symlink(
+            os.path.join(self.source, "images", "deep"),
+            os.path.join(self.source, "deep"),
+        )
+        copy_file_tree(self.source, self.dest)
+        self.assertCopied()
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.dest, "images"))), ["a.png", "deep"]
+        )
+        # A link to a directory outside the walk is still copied
+        with open(os.path.join(self.dest, "deep", "er", "b.png"), "rb") as handle:
+            self.assertEqual(handle.read(), b"b")
+
+    def test_get_files(self):
+        expected = {os.path.join(self.source, relative) for relative in self.files}
+        self.assertEqual(get_files(self.source), expected)
+        self.assertEqual(get_files(self.source), expected)
+
+    def test_remove_file_prunes_empty_directories(self):
+        copy_file_tree(self.source, self.dest)
+        remove_file(os.path.join(self.dest, "images", "deep", "er", "b.png"), self.dest)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "images", "deep")))
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "images", "a.png")))
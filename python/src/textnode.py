@@ -7,6 +7,10 @@ TextType = Literal["text", "bold", "italic", "code", "link", "image"]
 class TextNode:
     """A TextNode is a representation of some text in a document.
 
+    The text of a node is a span of a source string, so splitting a text into
+    nodes does not copy it. The span is only turned into a new string when the
+    text of the node is read, which happens when it is converted to HTML.
+
     Attributes
     ----------
 
@@ -19,18 +23,56 @@ class TextNode:
 
     url : str, optional
         The external resource URI
+
+    source : str
+        The string holding the text of the node
+
+    start, end : int
+        The offsets of the text of the node in its source
+
+    Methods
+    -------
+    span(source, start, end, text_type, url)
+        creates a node whose text is a span of a source string
     """
 
+    __slots__ = ("source", "start", "end", "text_type", "url")
+
     def __init__(
         self,
         text: str,
         text_type: TextType,
         url: Optional[str] = None,
     ):
-        self.text = text
+        self.source = text
+        self.start = 0
+        self.end = len(text)
         self.text_type: TextType = text_type
         self.url = url
 
+    @classmethod
+    def span(
+        cls,
+        source: str,
+        start: int,
+        end: int,
+        text_type: TextType,
+        url: Optional[str] = None,
+    ) -> "TextNode":
+        node = cls.__new__(cls)
+        node.source = source
+        node.start = start
+        node.end = end
+        node.text_type = text_type
+        node.url = url
+        return node
+
+    @property
+    def text(self) -> str:
+        if self.start == 0 and self.end == len(self.source):
+            return self.source
+        return self.source[self.start : self.end]
+
     def __eq__(self, value) -> bool:
         return (
             self.text == value.text
@@ -0,0 +1,96 @@
+""" Heading anchors and the table of contents of a page
+
+A TableOfContents is filled while the blocks of a page are converted: every
+heading is given a unique id, derived from its text, and is recorded as an
+entry. Nothing walks the converted document again, so the cost is linear in
+the number of headings.
+"""
+
+import re
+from typing import Dict, List, Tuple
+
+from htmlnode import HTMLNode, LeafNode, ParentNode
+
+_non_slug_characters = re.compile(r"[^\w\s-]")
+_slug_separators = re.compile(r"[\s_-]+")
+
+
+def slugify(text: str) -> str:
+    """turns the text of a heading into an id: lowercase words separated by
+    '-'. Text without any word character gives "section"
+    """
+    slug = _non_slug_characters.sub("", text.lower())
+    slug = _slug_separators.sub("-", slug).strip("-")
+    return slug or "section"
+
+
+class TableOfContents:
+    """The headings of a page, in document order.
+
+    Attributes
+    ----------
+    entries : list of tuple of int, str and str
+        The level, id and text of every heading.
+
+    Methods
+    -------
+    add(level, text)
+        records a heading and gives its id. Ids are unique within the table:
+        a repeated slug gets a "-1", "-2"... suffix
+
+    to_html_node()
+        gives nested lists of links to the headings
+
+    to_html()
+        gives the HTML of to_html_node(), or an empty string if there are no
+        headings
+    """
+
+    def __init__(self):
+        self.entries: List[Tuple[int, str, str]] = []
+        self._ids: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, level: int, text: str) -> str:
+        slug = slugify(text)
+        heading_id = slug
+        while heading_id in self._ids:
+            self._ids[slug] += 1
+            heading_id = f"{slug}-{self._ids[slug]}"
+        self._ids[heading_id] = 0
+        self.entries.append((level, heading_id, text))
+        return heading_id
+
+    def to_html_node(self) -> HTMLNode:
+        # Open lists are kept with their level. A deeper heading opens a list
+        # inside the last item, a shallower one closes the deeper lists. A
+        # list closed by a heading deeper than its parent list is kept open
+        # at the level of that heading.
+        stack: List[Tuple[int, List[HTMLNode]]] = []
+        for level, heading_id, text in self.entries:
+            while stack and stack[-1][0] > level:
+                _, items = stack.pop()
+                if not stack or stack[-1][0] < level:
+                    stack.append((level, items))
+                    break
+                _nest(stack[-1][1], items)
+            if not stack or stack[-1][0] < level:
+                stack.append((level, []))
+            link = LeafNode("a", text, {"href": f"#{heading_id}"})
+            stack[-1][1].append(ParentNode("li", [link]))
+        while len(stack) > 1:
+            _, items = stack.pop()
+            _nest(stack[-1][1], items)
+        return ParentNode("ul", stack[0][1] if stack else [], {"class": "toc"})
+
+    def to_html(self) -> str:
+        if not self.entries:
+            return ""
+        return self.to_html_node().to_html()
+
+
+def _nest(parent_items: List[HTMLNode], items: List[HTMLNode]):
+    """appends a list to the last item of its parent list"""
+    parent_items[-1].children.append(ParentNode("ul", items))  # type: ignore
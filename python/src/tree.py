@@ -1,29 +1,225 @@
+""" Functions for copying trees of static files
+
+Directories are walked iteratively with os.scandir, reusing the type and stat
+information of each directory entry. Copies run in a thread pool, and file
+contents are copied by the kernel with os.copy_file_range or os.sendfile when
+the platform has them, falling back to a buffered copy otherwise.
+"""
+
+import errno
 import os
 import shutil
-from typing import Set
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Set, Tuple, TypeAlias
+
+_CHUNK_SIZE = 1 << 30
+_kernel_copy_errors = {errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP}
+_use_copy_file_range = hasattr(os, "copy_file_range")
+_use_sendfile = hasattr(os, "sendfile")
+
+
+def default_workers() -> int:
+    """gives the number of copy threads used when none is given"""
+    return min(32, (os.cpu_count() or 1) * 4)
+
+
+def scan_tree(path: str) -> Iterator[Tuple[str, os.DirEntry]]:
+    """yields every file under a directory, with its path relative to the
+    directory and its directory entry. The walk is iterative, so deep trees
+    do not hit the recursion limit. Symbolic links to directories are
+    followed, except to a directory the walk is already in, so a link loop
+    ends"""
+    root_stat = os.stat(path)
+    # Every directory is pushed with the directories above it, itself included
+    stack = [("", frozenset([(root_stat.st_dev, root_stat.st_ino)]))]
+    while stack:
+        relative_dir, ancestors = stack.pop()
+        with os.scandir(os.path.join(path, relative_dir)) as entries:
+            for entry in entries:
+                relative = os.path.join(relative_dir, entry.name)
+                if entry.is_dir():
+                    status = entry.stat()
+                    key = (status.st_dev, status.st_ino)
+                    if key not in ancestors:
+                        stack.append((relative, ancestors | {key}))
+                else:
+                    yield relative, entry
+
+
+def _kernel_copy(source_fd: int, dest_fd: int, size: int) -> int:
+    """copies a file inside the kernel, from the current offsets of both file
+    descriptors, and gives how many bytes were copied. It copies less than
+    size, possibly nothing, if the platform or the file systems do not allow
+    it, leaving both offsets after the copied bytes"""
+    global _use_copy_file_range, _use_sendfile
+    copied = 0
+    if _use_copy_file_range:
+        try:
+            while copied < size:
+                done = os.copy_file_range(source_fd, dest_fd, _CHUNK_SIZE)
+                if done == 0:
+                    break
+                copied += done
+        except OSError as error:
+            if error.errno not in _kernel_copy_errors:
+                raise
+            if error.errno in (errno.ENOSYS, errno.EOPNOTSUPP):
+                _use_copy_file_range = False
+        if copied == size:
+            return copied
+    if _use_sendfile:
+        start = copied
+        try:
+            while copied < size:
+                done = os.sendfile(dest_fd, source_fd, copied, _CHUNK_SIZE)
+                if done == 0:
+                    break
+                copied += done
+        except OSError as error:
+            if error.errno not in _kernel_copy_errors:
+                raise
+            if copied == start:
+                _use_sendfile = False
+        # sendfile does not move the offset of the source
+        os.lseek(source_fd, copied, os.SEEK_SET)
+    return copied
+
+
+def _buffered_copy(source_fd: int, dest_fd: int):
+    while True:
+        chunk = os.read(source_fd, 1 << 20)
+        if not chunk:
+            return
+        view = memoryview(chunk)
+        while view:
+            view = view[os.write(dest_fd, view) :]
+
+
+def fast_copy(
+    source_path: str, dest_path: str, source_stat: Optional[os.stat_result] = None
+) -> int:
+    """copies the contents and the permission bits of a file, and gives its
+    size. The directory of the destination must exist
+
+    Parameters
+    ----------
+    source_path : str
+        The file to copy
+
+    dest_path : str
+        The path of the copy. It is replaced if it exists
+
+    source_stat : os.stat_result, optional
+        The stat of the source, if the caller already has it
+
+    Returns
+    -------
+    size : int
+        the size of the source according to its stat
+    """
+    with open(source_path, "rb", buffering=0) as source, open(
+        dest_path, "wb", buffering=0
+    ) as dest:
+        source_fd, dest_fd = source.fileno(), dest.fileno()
+        if source_stat is None:
+            source_stat = os.fstat(source_fd)
+        if _kernel_copy(source_fd, dest_fd, source_stat.st_size) < source_stat.st_size:
+            # Also covers files that grew, or whose size the stat got wrong
+            _buffered_copy(source_fd, dest_fd)
+    os.chmod(dest_path, stat.S_IMODE(source_stat.st_mode))
+    return source_stat.st_size
+
 
+CopyJob: TypeAlias = Tuple[str, str, Optional[os.stat_result]]
 
-def copy_file_tree(source_path: str, dest_path: str):
+
+def _run_copies(jobs: List[CopyJob], workers: Optional[int]) -> int:
+    # The directory skeleton is created up front so copy threads never race
+    # on makedirs
+    for directory in sorted({os.path.dirname(dest) for _, dest, _ in jobs}):
+        os.makedirs(directory, exist_ok=True)
+    if len(jobs) < 2 or workers == 1:
+        return sum(fast_copy(*job) for job in jobs)
+    with ThreadPoolExecutor(max_workers=workers or default_workers()) as executor:
+        return sum(executor.map(lambda job: fast_copy(*job), jobs))
+
+
+def copy_files(pairs: Iterable[Tuple[str, str]], workers: Optional[int] = None) -> int:
+    """copies files to their destinations. Every destination directory is
+    created first, in a single pass, and then the files are copied by a pool
+    of threads
+
+    Parameters
+    ----------
+    pairs : iterable of tuple of str and str
+        The source and destination of every file
+
+    workers : int, optional
+        The number of copy threads. Defaults to default_workers()
+
+    Returns
+    -------
+    size : int
+        the number of bytes copied
+    """
+    return _run_copies([(source, dest, None) for source, dest in pairs], workers)
+
+
+def copy_file_tree(
+    source_path: str, dest_path: str, workers: Optional[int] = None
+) -> int:
+    """replaces dest_path with a copy of the files of source_path, and gives
+    the number of bytes copied"""
     if not os.path.exists(source_path):
         raise FileNotFoundError(f"Path {source_path} does not exist")
     if os.path.exists(dest_path):
         shutil.rmtree(dest_path)
     os.makedirs(dest_path)
-    contents_to_copy = get_files(source_path)
-    for file in contents_to_copy:
-        relative_path = file.removeprefix(source_path)
-        new_path = dest_path + relative_path
-        if not os.path.exists(os.path.dirname(new_path)):
-            os.makedirs(os.path.dirname(new_path))
-        shutil.copy(file, new_path)
-
-
-def get_files(path: str, tree: Set = set()) -> set[str]:
-    contents = os.listdir(path)
-    for content in contents:
-        fullpath = os.path.join(path, content)
-        if os.path.isfile(fullpath):
-            tree.add(fullpath)
-        else:
-            tree.update(get_files(fullpath))
+    jobs: List[CopyJob] = [
+        (entry.path, os.path.join(dest_path, relative), entry.stat())
+        for relative, entry in scan_tree(source_path)
+    ]
+    return _run_copies(jobs, workers)
+
+
+def link_file_tree(source_path: str, dest_path: str):
+    """recreates a tree of files with hard links to the files of another one.
+    Files that cannot be linked, for instance across file systems, are
+    copied. dest_path must not exist"""
+    if not os.path.exists(source_path):
+        raise FileNotFoundError(f"Path {source_path} does not exist")
+    os.makedirs(dest_path)
+    created = {dest_path}
+    for relative, entry in scan_tree(source_path):
+        target = os.path.join(dest_path, relative)
+        directory = os.path.dirname(target)
+        if directory not in created:
+            os.makedirs(directory, exist_ok=True)
+            created.add(directory)
+        try:
+            os.link(entry.path, target)
+        except OSError:
+            fast_copy(entry.path, target)
+
+
+def remove_file(path: str, root: str):
+    """removes a file and then every directory above it that became empty,
+    up to but excluding root"""
+    if os.path.exists(path):
+        os.remove(path)
+    root = os.path.abspath(root)
+    directory = os.path.dirname(os.path.abspath(path))
+    while directory != root and directory.startswith(root + os.sep):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            return
+        directory = os.path.dirname(directory)
+
+
+def get_files(path: str, tree: Optional[Set[str]] = None) -> set[str]:
+    if tree is None:
+        tree = set()
+    tree.update(entry.path for _, entry in scan_tree(path))
     return tree